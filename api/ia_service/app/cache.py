@@ -0,0 +1,179 @@
+# ia_service/app/cache.py — caché en proceso de los archivos que generan los builders
+import gzip, hashlib, json, threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:   # opcional: sin brotli no se sirven las variantes .br
+    brotli = None
+
+# Codificación -> (sufijo del archivo, descompresor para validar la variante); orden = preferencia
+ENCODINGS = {"br": (".br", brotli.decompress if brotli else None), "gzip": (".gz", gzip.decompress)}
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    data: Any
+    etag: str                 # ETag fuerte: hash del contenido entre comillas
+    stamp: Tuple[int, int]    # (st_mtime_ns, st_size) con el que se parseó
+
+
+def _load_json(raw: bytes) -> Any:
+    return json.loads(raw.decode("utf-8"))
+
+
+class FileCache:
+    """
+    Parsea cada archivo una sola vez y lo vuelve a leer únicamente cuando
+    cambia su (mtime, tamaño), es decir, cuando un builder lo reescribe.
+    Un stat por request en lugar de read + json.loads.
+    """
+
+    def __init__(self, loader: Callable[[bytes], Any] = _load_json):
+        self._loader = loader
+        self._entries: Dict[Path, CacheEntry] = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0   # misses = lecturas de disco (para /metrics)
+
+    def get(self, path: Path) -> CacheEntry:
+        """Lanza FileNotFoundError si el archivo no existe."""
+        st = path.stat()
+        stamp = (st.st_mtime_ns, st.st_size)
+        entry = self._entries.get(path)
+        if entry is not None and entry.stamp == stamp:
+            self.hits += 1
+            return entry
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.stamp == stamp:
+                self.hits += 1
+                return entry
+            self.misses += 1
+            raw = path.read_bytes()
+            entry = CacheEntry(
+                data=self._loader(raw),
+                etag=f'"{hashlib.sha1(raw).hexdigest()}"',
+                stamp=stamp,
+            )
+            self._entries[path] = entry
+            return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+@dataclass(frozen=True)
+class RawEntry:
+    bodies: Dict[str, bytes]   # "identity" / "gzip" / "br" -> bytes listos para enviar
+    etags: Dict[str, str]      # un ETag fuerte por codificación (son representaciones distintas)
+    stamp: Tuple
+
+
+class PrecompressedCache:
+    """
+    Bytes crudos de un archivo y de sus variantes .gz / .br escritas por los builders
+    (tools/precompress.py). Al recargar, cada variante se descomprime una vez y se descarta si no
+    coincide con el archivo plano (build a medias o variante vieja).
+    """
+
+    def __init__(self):
+        self._entries: Dict[Path, RawEntry] = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    @staticmethod
+    def _stamp(path: Path) -> Tuple:
+        st = path.stat()   # FileNotFoundError si falta el plano
+        out = [(st.st_mtime_ns, st.st_size)]
+        for suffix, _ in ENCODINGS.values():
+            try:
+                v = path.with_name(path.name + suffix).stat()
+                out.append((v.st_mtime_ns, v.st_size))
+            except FileNotFoundError:
+                out.append(None)
+        return tuple(out)
+
+    def get(self, path: Path) -> RawEntry:
+        stamp = self._stamp(path)
+        entry = self._entries.get(path)
+        if entry is not None and entry.stamp == stamp:
+            self.hits += 1
+            return entry
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.stamp == stamp:
+                self.hits += 1
+                return entry
+            self.misses += 1
+            raw = path.read_bytes()
+            digest = hashlib.sha1(raw).hexdigest()
+            bodies, etags = {"identity": raw}, {"identity": f'"{digest}"'}
+            for enc, (suffix, decompress) in ENCODINGS.items():
+                variant = path.with_name(path.name + suffix)
+                if decompress is None or not variant.exists():
+                    continue
+                body = variant.read_bytes()
+                try:
+                    ok = decompress(body) == raw
+                except Exception:
+                    ok = False
+                if ok:
+                    bodies[enc], etags[enc] = body, f'"{digest}-{enc}"'
+            entry = RawEntry(bodies=bodies, etags=etags, stamp=stamp)
+            self._entries[path] = entry
+            return entry
+
+
+def pick_encoding(accept_encoding: Optional[str], available: Iterable[str]) -> str:
+    """
+    Codificación a usar según Accept-Encoding (RFC 9110 §12.5.3): la de mayor q > 0 entre las
+    disponibles, con empates resueltos por el orden de ENCODINGS; "identity" si ninguna aplica.
+    """
+    if not accept_encoding:
+        return "identity"
+    q = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        if name:
+            q[name.strip().lower()] = weight
+    best, best_q = "identity", 0.0
+    for enc in ENCODINGS:
+        if enc in available:
+            w = q.get(enc, q.get("*", 0.0))
+            if w > best_q:
+                best, best_q = enc, w
+    return best
+
+
+def combine_etags(etags: Iterable[str], extra: str = "") -> str:
+    """ETag fuerte para una respuesta armada a partir de varios archivos."""
+    h = hashlib.sha1()
+    for e in etags:
+        h.update(e.encode("ascii"))
+    h.update(extra.encode("utf-8"))
+    return f'"{h.hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparación débil de If-None-Match (RFC 7232 §3.2)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
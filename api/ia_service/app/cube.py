@@ -0,0 +1,108 @@
+# ia_service/app/cube.py — consultas sobre el cubo (municipio × día × hora) que escribe
+# tools/build_mineria_cache.py en data_cache/mineria/cubo/ (consumo.npy, costo.npy, n.npy, meta.json)
+import hashlib, json, threading
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import numpy as np
+
+VARIABLES = ["consumo", "costo", "n"]
+META_FILE = "meta.json"
+
+
+@dataclass(frozen=True)
+class CubeView:
+    municipios: Dict[str, int]
+    inicio: np.datetime64          # día 0 del eje de días
+    arrays: Dict[str, np.ndarray]  # (municipios, días, 24), memmap de solo lectura
+    etag: str
+    stamp: Tuple
+
+    @property
+    def n_dias(self) -> int:
+        return self.arrays["n"].shape[1]
+
+
+class CubeStore:
+    """
+    Abre el cubo con mmap y lo vuelve a abrir solo cuando cambia meta.json o algún .npy
+    (el builder escribe meta.json al final). Un stat por archivo por request.
+    """
+
+    def __init__(self, path: Path, mmap: bool = True):
+        self.path = Path(path)
+        self.mmap = mmap
+        self._view: Optional[CubeView] = None
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def _stamp(self) -> Tuple:
+        """Lanza FileNotFoundError si falta algún archivo."""
+        files = [META_FILE] + [f"{v}.npy" for v in VARIABLES]
+        return tuple((s.st_mtime_ns, s.st_size) for s in ((self.path / f).stat() for f in files))
+
+    def get(self) -> CubeView:
+        stamp = self._stamp()
+        view = self._view
+        if view is not None and view.stamp == stamp:
+            self.hits += 1
+            return view
+        with self._lock:
+            if self._view is not None and self._view.stamp == stamp:
+                self.hits += 1
+                return self._view
+            self.misses += 1
+            raw = (self.path / META_FILE).read_bytes()
+            meta = json.loads(raw.decode("utf-8"))
+            arrays = {v: np.load(self.path / f"{v}.npy", mmap_mode="r" if self.mmap else None) for v in VARIABLES}
+            self._view = CubeView(
+                municipios={m: i for i, m in enumerate(meta["municipios"])},
+                inicio=np.datetime64(meta["fecha_inicio"], "D"),
+                arrays=arrays,
+                etag=f'"{hashlib.sha1(raw + repr(stamp).encode()).hexdigest()}"',
+                stamp=stamp,
+            )
+            return self._view
+
+
+def query_cube(view: CubeView, municipio: Optional[str] = None, desde: Optional[date] = None,
+               hasta: Optional[date] = None, agrupar: str = "hora") -> dict:
+    """
+    Sumas de consumo / costo / n para un municipio (o todos) en [desde, hasta], agrupadas por
+    hora del día, día o mes. `municipio` debe existir en view.municipios (KeyError si no).
+    """
+    d0 = 0 if desde is None else max(0, int((np.datetime64(desde, "D") - view.inicio).astype(int)))
+    d1 = view.n_dias if hasta is None else min(view.n_dias, int((np.datetime64(hasta, "D") - view.inicio).astype(int)) + 1)
+    d1 = max(d0, d1)
+    m = view.municipios[municipio] if municipio else None
+
+    out = {}
+    for v in VARIABLES:
+        a = view.arrays[v]
+        sub = a[m, d0:d1] if m is not None else a[:, d0:d1].sum(axis=0, dtype=np.float64)
+        out[v] = np.asarray(sub, dtype=np.float64)          # (días, 24)
+
+    dias = view.inicio + np.arange(d0, d1)
+    if agrupar == "hora":
+        labels = [f"{h:02d}" for h in range(24)]
+        red = {v: a.sum(axis=0) for v, a in out.items()}
+    elif agrupar == "dia":
+        labels = [str(d) for d in dias]
+        red = {v: a.sum(axis=1) for v, a in out.items()}
+    else:  # mes
+        meses = dias.astype("datetime64[M]")
+        starts = np.r_[0, np.flatnonzero(meses[1:] != meses[:-1]) + 1] if len(dias) else np.empty(0, np.intp)
+        labels = [str(meses[s]) for s in starts]
+        red = {v: np.add.reduceat(a.sum(axis=1), starts) if len(starts) else np.empty(0) for v, a in out.items()}
+
+    return {
+        "municipio": municipio,
+        "desde": str(dias[0]) if len(dias) else None,
+        "hasta": str(dias[-1]) if len(dias) else None,
+        "agrupar": agrupar,
+        "labels": labels,
+        "consumo": [round(float(x), 3) for x in red["consumo"]],
+        "costo": [round(float(x), 3) for x in red["costo"]],
+        "n": [int(x) for x in red["n"]],
+    }
@@ -0,0 +1,121 @@
+# ia_service/app/encoder.py — codificador de features precompilado (sin pandas)
+from typing import Dict, List, Mapping, Optional, Sequence
+import numpy as np
+
+
+def _is_na(v) -> bool:
+    return v is None or (isinstance(v, float) and v != v)
+
+
+class FeatureEncoder:
+    """
+    Reemplazo de `_coerce_inputs` + `pd.get_dummies(drop_first=True)` + `reindex(train_columns)`.
+
+    Se construye una sola vez a partir de `train_columns` y escribe cada registro directo
+    en una matriz NumPy preasignada (n, len(train_columns)) por índice de columna.
+    Reproduce exactamente la semántica del camino con pandas, incluidas sus rarezas:
+      - si alguna fila trae nulo en una categórica, toda la columna toma el default;
+      - `drop_first` descarta la categoría *menor presente en el lote* (orden de texto),
+        así que en un lote de una fila ninguna dummy queda encendida.
+    Con `fixed=True` (pronóstico) cada fila se codifica sola contra las categorías de
+    train_columns: la descartada es la del entrenamiento y no depende del resto del lote.
+    """
+
+    # default por fila de cada categórica en modo fixed (los mismos que Registro)
+    DEFAULTS = {"estado": "activo", "hora_dia": "00:00", "dia_semana": "lunes", "casa_id": "Puebla"}
+
+    def __init__(self, train_columns: Sequence[str], features_num: Sequence[str],
+                 features_cat: Sequence[str], estados: Sequence[str],
+                 dias_semana: Sequence[str], municipios: Sequence[str]):
+        self.columns: List[str] = list(train_columns)
+        self.index: Dict[str, int] = {c: i for i, c in enumerate(self.columns)}
+        self.features_num = list(features_num)
+        self.features_cat = list(features_cat)
+        self._estados = frozenset(estados)
+        self._dias = frozenset(dias_semana)
+        self._municipios = frozenset(municipios)
+        self._num_idx = [(c, self.index.get(c)) for c in self.features_num]
+        self._modo_idx = self.index.get("modo_ecologico_activado")
+
+    # ---------- coerción por valor (se aplica solo a valores únicos) ----------
+    def _coerce_value(self, col: str, v):
+        if col == "estado":
+            return v if v in self._estados else "activo"
+        if col == "dia_semana":
+            v = str(v).lower().strip()
+            return v if v in self._dias else "lunes"
+        if col == "hora_dia":
+            return str(v)[:5]
+        if col == "casa_id":
+            return v if v in self._municipios else "Puebla"
+        return v
+
+    @staticmethod
+    def _unique_inverse(vals: Sequence):
+        arr = np.empty(len(vals), dtype=object)
+        arr[:] = list(vals)
+        try:
+            return np.unique(arr, return_inverse=True)
+        except TypeError:  # tipos mezclados: factoriza a mano
+            memo: Dict[object, int] = {}
+            inv = np.fromiter((memo.setdefault(v, len(memo)) for v in vals), dtype=np.intp, count=len(vals))
+            uniq = np.empty(len(memo), dtype=object)
+            uniq[:] = list(memo)
+            return uniq, inv
+
+    @staticmethod
+    def _to_float(vals: Sequence) -> np.ndarray:
+        try:
+            x = np.asarray(vals, dtype=np.float64)
+        except (TypeError, ValueError):
+            import pandas as pd
+            x = pd.to_numeric(pd.Series(list(vals), dtype=object), errors="coerce").to_numpy(dtype=np.float64)
+        return np.where(np.isnan(x), 0.0, x)
+
+    def _fill_dummies(self, X: np.ndarray, col: str, vals: Optional[Sequence]):
+        if vals is None or any(_is_na(v) for v in vals):
+            return  # columna constante -> drop_first la elimina completa
+        uniq, inv = self._unique_inverse(vals)
+        coerced = [self._coerce_value(col, u) for u in uniq]
+        levels = sorted(set(coerced))
+        if len(levels) < 2:
+            return
+        level_of = {lv: k for k, lv in enumerate(levels)}
+        # columna destino por nivel; el nivel 0 (drop_first) y los ausentes en train_columns -> -1
+        dest = np.array([-1] + [self.index.get(f"{col}_{lv}", -1) for lv in levels[1:]], dtype=np.intp)
+        row_dest = dest[np.array([level_of[c] for c in coerced], dtype=np.intp)[inv]]
+        rows = np.flatnonzero(row_dest >= 0)
+        X[rows, row_dest[rows]] = 1.0
+
+    def _fill_fixed(self, X: np.ndarray, col: str, vals: Optional[Sequence]):
+        default = self.DEFAULTS[col]
+        if vals is None:
+            vals = [default] * len(X)
+        uniq, inv = self._unique_inverse([default if _is_na(v) else v for v in vals])
+        # la categoría descartada en el entrenamiento (y las desconocidas) no tienen columna -> fila en 0
+        dest = np.array([self.index.get(f"{col}_{self._coerce_value(col, u)}", -1) for u in uniq], dtype=np.intp)
+        row_dest = dest[inv]
+        rows = np.flatnonzero(row_dest >= 0)
+        X[rows, row_dest[rows]] = 1.0
+
+    def encode_columns(self, cols: Mapping[str, Sequence], n: int, fixed: bool = False) -> np.ndarray:
+        """`cols`: feature -> secuencia de n valores (las ausentes toman su default)."""
+        X = np.zeros((n, len(self.columns)), dtype=np.float64)
+        if n == 0:
+            return X
+        for c, j in self._num_idx:
+            if j is not None and cols.get(c) is not None:
+                X[:, j] = self._to_float(cols[c])
+        if self._modo_idx is not None and cols.get("modo_ecologico_activado") is not None:
+            X[:, self._modo_idx] = np.trunc(self._to_float(cols["modo_ecologico_activado"]))
+        fill = self._fill_fixed if fixed else self._fill_dummies
+        for c in self.features_cat:
+            if c != "modo_ecologico_activado":
+                fill(X, c, cols.get(c))
+        return X
+
+    def encode_records(self, records: Sequence) -> np.ndarray:
+        """Registros Pydantic (o cualquier objeto con los atributos de las features)."""
+        feats = self.features_num + self.features_cat
+        cols = {c: [getattr(r, c, None) for r in records] for c in feats}
+        return self.encode_columns(cols, len(records))
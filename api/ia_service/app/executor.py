@@ -0,0 +1,111 @@
+# ia_service/app/executor.py — pool dedicado para el trabajo del modelo (encode + predict), con
+# cola acotada. Así un pico de /predict_batch no ocupa el threadpool de Starlette que atiende al
+# resto, y cuando la cola se llena se rechaza de inmediato (429) en lugar de acumular latencia.
+import asyncio, contextvars, math, threading, time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+
+class QueueFull(Exception):
+    """La cola del executor está llena; `retry_after` = segundos sugeridos para reintentar."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"cola de inferencia llena (reintentar en {retry_after}s)")
+        self.retry_after = retry_after
+
+
+class InferenceExecutor:
+    """
+    `workers` hilos + hasta `max_queue` trabajos esperando. Las tareas corren con una copia del
+    contexto del que las envía (las etapas de app/metrics.py siguen atribuidas al request).
+    `observer(espera_s, ejecucion_s)` se llama al terminar cada tarea.
+    """
+
+    def __init__(self, workers: int, max_queue: int,
+                 observer: Optional[Callable[[float, float], None]] = None):
+        self.workers = max(1, int(workers))
+        self.max_queue = max(0, int(max_queue))
+        self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="inferencia")
+        self._observer = observer
+        self._lock = threading.Lock()
+        self._pending = 0        # en cola + ejecutándose (baja al resolverse el Future)
+        self._running = 0
+        self._completed = 0
+        self._cancelled = 0
+        self._rejected = 0
+        self._wait_sum = 0.0
+        self._run_sum = 0.0
+
+    def _job(self, t_submit: float, ctx: contextvars.Context, fn, args):
+        t_start = time.perf_counter()
+        with self._lock:
+            self._running += 1
+        try:
+            return ctx.run(fn, *args)
+        finally:
+            t_end = time.perf_counter()
+            wait, run = t_start - t_submit, t_end - t_start
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+                self._wait_sum += wait
+                self._run_sum += run
+            if self._observer is not None:
+                self._observer(wait, run)
+
+    def retry_after(self) -> int:
+        """Segundos estimados para vaciar la cola actual con el tiempo medio por tarea."""
+        with self._lock:
+            avg = self._run_sum / self._completed if self._completed else 0.1
+            return max(1, math.ceil(self._pending * avg / self.workers))
+
+    def saturated(self) -> bool:
+        return self._pending >= self.workers + self.max_queue
+
+    def submit(self, fn, *args, admit: bool = True) -> Future:
+        """
+        Encola `fn(*args)`. Con admit=True lanza QueueFull si ya hay workers + max_queue tareas;
+        admit=False es para la continuación de un request ya admitido (bloques de /predict_stream).
+        """
+        with self._lock:
+            full = self._pending >= self.workers + self.max_queue
+            if full and admit:
+                self._rejected += 1
+            else:
+                self._pending += 1
+        if full and admit:
+            raise QueueFull(self.retry_after())
+        try:
+            fut = self._pool.submit(self._job, time.perf_counter(), contextvars.copy_context(), fn, args)
+        except BaseException:
+            self._release(None)
+            raise
+        # el lugar se libera al resolverse el Future, también si se cancela en cola (cliente que
+        # se desconecta): en ese caso el pool nunca llama a _job
+        fut.add_done_callback(self._release)
+        return fut
+
+    def _release(self, fut: Optional[Future]):
+        with self._lock:
+            self._pending -= 1
+            if fut is not None and fut.cancelled():
+                self._cancelled += 1
+
+    async def run(self, fn, *args, admit: bool = True):
+        """Versión async de submit: espera el resultado sin ocupar el event loop."""
+        return await asyncio.wrap_future(self.submit(fn, *args, admit=admit))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            done = self._completed
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queued": self._pending - self._running,
+                "completed": done,
+                "cancelled": self._cancelled,
+                "rejected": self._rejected,
+                "avg_wait_ms": round(self._wait_sum / done * 1000, 3) if done else 0.0,
+                "avg_run_ms": round(self._run_sum / done * 1000, 3) if done else 0.0,
+            }
@@ -0,0 +1,98 @@
+# ia_service/app/forecast.py — pronóstico recursivo de varios pasos (una hora por paso) para
+# /forecast. Todos los registros iniciales avanzan juntos: N pasos = N llamadas a model.predict.
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+from .cube import CubeView
+
+
+def _parse_hora(v) -> Tuple[int, str]:
+    """'HH:MM' (o 'H') -> (hora, ':MM'); ValueError si no es una hora válida."""
+    s = "00:00" if v is None else str(v).strip()
+    h, _, mm = s.partition(":")
+    if not h.isdigit() or not 0 <= int(h) <= 23:
+        raise ValueError(f"hora_dia inválida: {v!r}")
+    hora = int(h)
+    return hora, ":" + (mm[:2] or "00")
+
+
+def rollout(predict: Callable[[Dict[str, list], int], np.ndarray], seeds: Dict[str, list], n: int,
+            horizon: int, dias_semana: Sequence[str]) -> dict:
+    """
+    `seeds`: columnas de n registros (mismas features que /predict_batch/columnar). Cada paso
+    predice la hora siguiente de todos los registros con `predict(columnas, n) -> (n, 2)` y
+    arma el siguiente lote con esa salida: consumo_kwh y costo_estimado toman la predicción,
+    consumo_pico y promedio_hora se escalan con la proporción que traía cada registro inicial,
+    hora_dia avanza una hora y dia_semana cambia al pasar de 23 a 00. Las demás columnas quedan fijas.
+    Devuelve arreglos (n, horizon) y la hora / día de cada paso pronosticado.
+    """
+    cols = {k: list(v) if v is not None else None for k, v in seeds.items()}
+    consumo = np.asarray(cols["consumo_kwh"], dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratios = {c: np.where(consumo > 0, np.asarray(cols[c], dtype=np.float64) / consumo, 1.0)
+                  for c in ("consumo_pico", "promedio_hora")}
+    parsed = [_parse_hora(v) for v in (cols.get("hora_dia") or [None] * n)]
+    hora = np.fromiter((h for h, _ in parsed), dtype=np.int64, count=n)
+    minutos = [mm for _, mm in parsed]
+    idx_dia = {d: i for i, d in enumerate(dias_semana)}
+    dia = np.fromiter((idx_dia.get(str(d).lower().strip(), 0) if d is not None else 0
+                       for d in (cols.get("dia_semana") or [None] * n)), dtype=np.int64, count=n)
+
+    out_consumo = np.empty((n, horizon), dtype=np.float64)
+    out_costo = np.empty((n, horizon), dtype=np.float64)
+    horas: List[List[str]] = []
+    dias: List[List[str]] = []
+    for k in range(horizon):
+        y = np.asarray(predict(cols, n), dtype=np.float64)
+        out_consumo[:, k], out_costo[:, k] = y[:, 0], y[:, 1]
+        dia = (dia + (hora == 23)) % 7
+        hora = (hora + 1) % 24
+        horas.append([f"{h:02d}{mm}" for h, mm in zip(hora.tolist(), minutos)])
+        dias.append([dias_semana[d] for d in dia.tolist()])
+        cols["consumo_kwh"] = y[:, 0].tolist()
+        cols["costo_estimado"] = y[:, 1].tolist()
+        for c, r in ratios.items():
+            cols[c] = (y[:, 0] * r).tolist()
+        cols["hora_dia"], cols["dia_semana"] = horas[-1], dias[-1]
+    return {"consumo": out_consumo, "costo": out_costo, "horas": horas, "dias": dias}
+
+
+def seeds_from_cube(view: CubeView, municipios: Optional[Sequence[str]], dias_semana: Sequence[str],
+                    ventana: int = 24) -> Tuple[List[str], Dict[str, list]]:
+    """
+    Registro inicial por municipio a partir de su última hora con datos en el cubo: consumo y
+    costo medios de esa hora; promedio_hora y consumo_pico = media y máximo de los promedios
+    horarios de las últimas `ventana` horas. Municipios sin datos se omiten.
+    """
+    nombres = list(municipios) if municipios else sorted(view.municipios, key=view.municipios.get)
+    idx = np.asarray([view.municipios[m] for m in nombres], dtype=np.intp)
+    n_cells = view.n_dias * 24
+    cnt = np.asarray(view.arrays["n"][idx], dtype=np.float64).reshape(len(idx), n_cells)
+    con = np.asarray(view.arrays["consumo"][idx], dtype=np.float64).reshape(len(idx), n_cells)
+    cos = np.asarray(view.arrays["costo"][idx], dtype=np.float64).reshape(len(idx), n_cells)
+    has = cnt > 0
+    ok = has.any(axis=1)
+    last = n_cells - 1 - np.argmax(has[:, ::-1], axis=1)               # última celda con datos
+    win = np.clip(last[:, None] - np.arange(ventana)[::-1][None, :], 0, n_cells - 1)
+    rows = np.arange(len(idx))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        media_win = np.where(has[rows[:, None], win], con[rows[:, None], win] / cnt[rows[:, None], win], np.nan)
+        consumo = con[rows, last] / cnt[rows, last]
+        costo = cos[rows, last] / cnt[rows, last]
+    fechas = view.inicio + (last // 24)
+    # 1970-01-01 fue jueves: (días desde época + 3) % 7 -> 0 = lunes
+    dow = (fechas.astype("datetime64[D]").astype(np.int64) + 3) % 7
+
+    sel = np.flatnonzero(ok)
+    seeds = {
+        "consumo_kwh": [round(float(consumo[i]), 4) for i in sel],
+        "consumo_pico": [round(float(np.nanmax(media_win[i])), 4) for i in sel],
+        "promedio_hora": [round(float(np.nanmean(media_win[i])), 4) for i in sel],
+        "costo_estimado": [round(float(costo[i]), 4) for i in sel],
+        "estado": ["activo"] * len(sel),
+        "hora_dia": [f"{int(last[i] % 24):02d}:00" for i in sel],
+        "dia_semana": [dias_semana[int(dow[i])] for i in sel],
+        "casa_id": [nombres[i] for i in sel],
+        "modo_ecologico_activado": [0] * len(sel),
+    }
+    return [nombres[i] for i in sel], seeds
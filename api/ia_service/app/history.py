@@ -0,0 +1,127 @@
+# ia_service/app/history.py — páginas de /dash/historico sobre historico.npy, el historial completo
+# de ancho fijo (fecha desc) que escribe tools/build_dashboard_cache.py junto a historico_meta.json
+# (diccionarios de texto + una fecha cada `paso_indice` filas). Una página lee solo sus filas del
+# memmap: la latencia no depende del tamaño del archivo.
+import hashlib, json, threading
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+DATA_FILE = "historico.npy"
+META_FILE = "historico_meta.json"
+SCAN_BLOCK = 8192   # filas por bloque al filtrar por estado
+
+
+@dataclass(frozen=True)
+class HistoryView:
+    rows: np.ndarray                 # registros HIST_DTYPE, memmap de solo lectura
+    dicts: Dict[str, np.ndarray]     # código -> texto (último elemento None para el código -1)
+    estados: Dict[str, int]
+    indice: np.ndarray               # fecha (ns) de las filas 0, paso, 2·paso, ...
+    paso: int
+    etag: str
+    stamp: Tuple
+
+    @property
+    def n(self) -> int:
+        return len(self.rows)
+
+
+class HistoryStore:
+    """Abre historico.npy con mmap; lo vuelve a abrir solo cuando cambia el meta o el .npy."""
+
+    def __init__(self, path: Path, mmap: bool = True):
+        self.path = Path(path)
+        self.mmap = mmap
+        self._view: Optional[HistoryView] = None
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def _stamp(self) -> Tuple:
+        """Lanza FileNotFoundError si falta algún archivo."""
+        return tuple((s.st_mtime_ns, s.st_size) for s in ((self.path / f).stat() for f in (META_FILE, DATA_FILE)))
+
+    def get(self) -> HistoryView:
+        stamp = self._stamp()
+        view = self._view
+        if view is not None and view.stamp == stamp:
+            self.hits += 1
+            return view
+        with self._lock:
+            if self._view is not None and self._view.stamp == stamp:
+                self.hits += 1
+                return self._view
+            self.misses += 1
+            raw = (self.path / META_FILE).read_bytes()
+            meta = json.loads(raw.decode("utf-8"))
+            dicts = {c: np.array(v + [None], dtype=object) for c, v in meta["diccionarios"].items()}
+            self._view = HistoryView(
+                rows=np.load(self.path / DATA_FILE, mmap_mode="r" if self.mmap else None),
+                dicts=dicts,
+                estados={e: i for i, e in enumerate(meta["diccionarios"]["estado"])},
+                indice=np.asarray(meta["indice"], dtype=np.int64),
+                paso=int(meta["paso_indice"]),
+                etag=f'"{hashlib.sha1(raw + repr(stamp).encode()).hexdigest()}"',
+                stamp=stamp,
+            )
+            return self._view
+
+
+def _first_before(view: HistoryView, ns: int) -> int:
+    """Primera fila con fecha < ns: índice disperso para ubicar el bloque y búsqueda dentro de él."""
+    k = int(np.searchsorted(-view.indice, -ns, side="right"))
+    lo = max(0, (k - 1) * view.paso)
+    hi = min(view.n, k * view.paso)
+    return lo + int(np.searchsorted(-view.rows["fecha"][lo:hi], -ns, side="right"))
+
+
+def _day_ns(d: date) -> int:
+    return int(np.datetime64(d, "D").astype("datetime64[ns]").astype(np.int64))
+
+
+def _to_records(view: HistoryView, rows: np.ndarray) -> List[dict]:
+    """Mismas claves y formato que historico.json."""
+    if not len(rows):
+        return []
+    fechas = np.char.replace(np.datetime_as_string(rows["fecha"].astype("datetime64[ns]"), unit="s"), "T", " ")
+    cols = {c: view.dicts[c][rows[c]] for c in ("dispositivo", "usuario", "estado")}
+    return [{"fecha": str(f), "dispositivo": d, "usuario": u, "consumo": float(c), "costo": float(k), "estado": e}
+            for f, d, u, c, k, e in zip(fechas, cols["dispositivo"], cols["usuario"],
+                                        rows["consumo"].tolist(), rows["costo"].tolist(), cols["estado"])]
+
+
+def history_page(view: HistoryView, limit: int, offset: int = 0, cursor: Optional[int] = None,
+                 estado: Optional[str] = None, desde: Optional[date] = None,
+                 hasta: Optional[date] = None) -> Tuple[List[dict], Optional[int]]:
+    """
+    Hasta `limit` filas (fecha desc) dentro de [desde, hasta] y con ese estado, saltando `offset`
+    coincidencias a partir de `cursor` (posición de fila devuelta por la página anterior).
+    Devuelve (filas, siguiente cursor o None si no hay más).
+    """
+    start = 0 if hasta is None else _first_before(view, _day_ns(hasta + timedelta(days=1)))
+    end = view.n if desde is None else _first_before(view, _day_ns(desde))
+    start = max(start, cursor or 0)
+
+    if estado is None:
+        start += offset
+        stop = min(end, start + limit)
+        rows = view.rows[start:stop] if start < stop else view.rows[:0]
+        return _to_records(view, rows), (stop if stop < end else None)
+
+    code = view.estados.get(estado)
+    if code is None:
+        return [], None
+    # recorrido por bloques hasta juntar offset + limit + 1 coincidencias (la extra dice si hay más)
+    want, found, total = offset + limit + 1, [], 0
+    pos = start
+    while pos < end and total < want:
+        blk = view.rows["estado"][pos:min(end, pos + SCAN_BLOCK)]
+        found.append(pos + np.flatnonzero(blk == code))
+        total += len(found[-1])
+        pos += len(blk)
+    hits = np.concatenate(found)[offset:want] if found else np.empty(0, np.intp)
+    page = hits[:limit]
+    nxt = int(hits[limit]) if len(hits) > limit else None
+    return _to_records(view, view.rows[page]), nxt
@@ -1,19 +1,78 @@
 # ia_service/main.py  — API FastAPI (debe existir "app")
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from typing import Optional, List
-import joblib, json, os
-import pandas as pd
+from fastapi.responses import JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional, List, Literal
+from datetime import date
+import asyncio, json, os, threading, time, warnings
+import numpy as np
 from pathlib import Path
+# pandas/joblib/sklearn se importan bajo demanda: con el bosque compilado no se cargan nunca
 from . import MODEL_DIR, DATA_CACHE_DIR
+from .cache import FileCache, PrecompressedCache, combine_etags, etag_matches, pick_encoding
+from .cube import CubeStore, query_cube
+from .encoder import FeatureEncoder
+from .executor import InferenceExecutor, QueueFull
+from .forecast import rollout, seeds_from_cube
+from .forest import CompiledForest, META_FILE
+from .history import HistoryStore, history_page
+from .metrics import Metrics, MetricsMiddleware, observe_batch, render_simple, stage, track
+from .microbatch import MicroBatcher
+from .model_store import ModelStore
+from .streaming import DuplexStreamingResponse, LineTooLong, iter_row_chunks, valid_subset
+
+# El encoder entrega ndarray en el orden exacto de train_columns; sklearn solo avisaría por los nombres.
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
 
 
 # ---------------- Config ----------------
 MODEL_PATH = os.getenv("MODEL_PATH", "model_assets/modelo_rf_multioutput_ligero.pkl")
 TRAIN_COLUMNS_PATH = os.getenv("TRAIN_COLUMNS_PATH", "model_assets/train_columns.json")
+# Bosque exportado con tools/compile_forest.py; MODEL_ENGINE = auto | sklearn | compiled
+COMPILED_MODEL_DIR = os.getenv("COMPILED_MODEL_DIR", "model_assets/modelo_rf_compilado")
+MODEL_ENGINE = os.getenv("MODEL_ENGINE", "auto")
+# Almacén versionado (tools/publish_model.py): si se define manda sobre MODEL_ENGINE. Los workers del
+# host comparten el bosque por mmap y cambian de versión cuando se publica otra (revisan cada N s).
+MODEL_STORE = os.getenv("MODEL_STORE", "")
+MODEL_STORE_CHECK_S = float(os.getenv("MODEL_STORE_CHECK_S", "1"))
+# Arranque: eager = carga al importar (bloquea); background = carga + predicción dummy en un hilo
+STARTUP_MODE = os.getenv("STARTUP_MODE", "eager")
+MODEL_MMAP_MODE = os.getenv("MODEL_MMAP_MODE", "r") or None     # joblib.load(mmap_mode=...)
+MODEL_READY_TIMEOUT = float(os.getenv("MODEL_READY_TIMEOUT", "10"))   # espera máx. de /predict* en background
 DASH_CACHE = Path(os.getenv("DASH_CACHE", "data_cache"))          # /ia_service/data_cache
 MINERIA_CACHE = DASH_CACHE / "mineria"                             # /ia_service/data_cache/mineria
+# Cubo de /mineria/query con mmap; en Windows un archivo mapeado no se puede reemplazar, ahí conviene 0
+CUBE_MMAP = os.getenv("CUBE_MMAP", "1") == "1"
+# /dash/historico paginado sobre historico.npy (si no existe se usa historico.json)
+HIST_MMAP = os.getenv("HIST_MMAP", "1") == "1"
+HIST_PAGE_MAX = int(os.getenv("DASH_HIST_PAGE_MAX", "1000"))
+# /dash/* y /mineria_cache: bytes tal cual escribieron los builders (+ .gz/.br según Accept-Encoding)
+CACHE_PRECOMPRESSED = os.getenv("CACHE_PRECOMPRESSED", "1") == "1"
+
+# /metrics (Prometheus) + middleware de latencias por endpoint / etapa; METRICS_ENABLED=0 lo apaga
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+# Pool dedicado para encode + predict, con cola acotada: lleno -> 429 con Retry-After
+INFER_WORKERS = int(os.getenv("INFER_WORKERS", str(min(4, os.cpu_count() or 1))))
+INFER_QUEUE = int(os.getenv("INFER_QUEUE", "16"))
+
+# Micro-batching de /predict (opt-in): junta requests concurrentes en un solo model.predict
+MICROBATCH = os.getenv("MICROBATCH", "0") == "1"
+MICROBATCH_MAX_SIZE = int(os.getenv("MICROBATCH_MAX_SIZE", "32"))
+MICROBATCH_MAX_WAIT_MS = float(os.getenv("MICROBATCH_MAX_WAIT_MS", "3"))
+# requests esperando lote; llena -> 429 como el executor (cada lote corre en el executor)
+MICROBATCH_QUEUE = int(os.getenv("MICROBATCH_QUEUE", str(MICROBATCH_MAX_SIZE * 8)))
+
+# /predict_stream: filas por bloque (acota la memoria sin importar el tamaño del cuerpo)
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "5000"))
+# Largo máximo de una línea (NDJSON/CSV): más largo -> 413 (o corte del stream si ya empezó)
+STREAM_MAX_LINE_BYTES = int(os.getenv("STREAM_MAX_LINE_BYTES", str(1 << 20)))
+
+# /forecast: pasos (horas) y registros iniciales máximos por request
+FORECAST_MAX_HORIZON = int(os.getenv("FORECAST_MAX_HORIZON", "168"))
+FORECAST_MAX_ROWS = int(os.getenv("FORECAST_MAX_ROWS", "1000"))
 
 FEATURES_NUM = ['consumo_kwh', 'consumo_pico', 'promedio_hora', 'costo_estimado']
 FEATURES_CAT = ['estado', 'hora_dia', 'dia_semana', 'casa_id', 'modo_ecologico_activado']
@@ -32,27 +91,59 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], allow_credentials=True,
     allow_methods=["*"], allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
+metrics = Metrics() if METRICS_ENABLED else None
+if metrics is not None:
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
 
 # ---------------- Modelo ----------------
 model = None
 train_columns = None
+encoder = None
+MODEL_VERSION = None
+_model_store = ModelStore(Path(MODEL_STORE), MODEL_STORE_CHECK_S) if MODEL_STORE else None
+
+def _use_compiled() -> bool:
+    if MODEL_ENGINE == "compiled":
+        return True
+    return MODEL_ENGINE == "auto" and (Path(COMPILED_MODEL_DIR) / META_FILE).exists()
 
 def _load_model_and_columns():
-    global model, train_columns
-    if not Path(MODEL_PATH).exists():
-        raise FileNotFoundError(f"No se encontró el modelo en: {MODEL_PATH}")
-    model = joblib.load(MODEL_PATH)
-    if Path(TRAIN_COLUMNS_PATH).exists():
+    global model, train_columns, encoder, MODEL_VERSION
+    if _model_store is not None:
+        MODEL_VERSION, model = _model_store.get()
+    elif _use_compiled():
+        model = CompiledForest.load(Path(COMPILED_MODEL_DIR), mmap=True)
+    else:
+        if not Path(MODEL_PATH).exists():
+            raise FileNotFoundError(f"No se encontró el modelo en: {MODEL_PATH}")
+        import joblib
+        model = joblib.load(MODEL_PATH, mmap_mode=MODEL_MMAP_MODE)
+    if _model_store is not None and model.train_columns is not None:
+        train_columns = model.train_columns   # cada versión trae las suyas
+    elif Path(TRAIN_COLUMNS_PATH).exists():
         train_columns = json.loads(Path(TRAIN_COLUMNS_PATH).read_text(encoding="utf-8"))
     else:
-        train_columns = None
+        train_columns = getattr(model, "train_columns", None)
+    encoder = FeatureEncoder(train_columns, FEATURES_NUM, FEATURES_CAT, ESTADOS, DIAS_SEMANA, MUNICIPIOS) \
+        if train_columns is not None else None
+
+MODEL_OK, MODEL_MSG = False, "loading"
+MODEL_LOAD_SECONDS = None
+model_ready = threading.Event()   # se marca al terminar la carga (con éxito o no)
+
+_wait_hist = metrics.histogram("inference_queue_wait_seconds", "Espera en la cola de inferencia.") \
+    if metrics is not None else None
+executor = InferenceExecutor(INFER_WORKERS, INFER_QUEUE,
+                             (lambda wait, run: _wait_hist.observe((), wait)) if _wait_hist is not None else None)
 
-try:
-    _load_model_and_columns()
-    MODEL_OK, MODEL_MSG = True, "loaded"
-except Exception as e:
-    MODEL_OK, MODEL_MSG = False, f"error: {e}"
+def _batch_predict(X):
+    """Lote del micro-batching: el model.predict corre en el executor (cuenta en cola y en vuelo)."""
+    return executor.submit(lambda: model.predict(X), admit=False).result()
+
+batcher = MicroBatcher(_batch_predict, MICROBATCH_MAX_SIZE, MICROBATCH_MAX_WAIT_MS / 1000, MICROBATCH_QUEUE,
+                       executor.retry_after) if MICROBATCH else None
 
 # ---------------- Schemas ----------------
 class Registro(BaseModel):
@@ -69,9 +160,34 @@ class Registro(BaseModel):
 class Lote(BaseModel):
     registros: List[Registro]
 
+class LoteColumnar(BaseModel):
+    """Un arreglo por feature; se valida por arreglo completo, sin crear un Registro por fila."""
+    consumo_kwh: List[float]
+    consumo_pico: List[float]
+    promedio_hora: List[float]
+    costo_estimado: List[float]
+    estado: Optional[List[Optional[str]]] = None
+    hora_dia: Optional[List[Optional[str]]] = None
+    dia_semana: Optional[List[Optional[str]]] = None
+    casa_id: Optional[List[Optional[str]]] = None
+    modo_ecologico_activado: Optional[List[Optional[int]]] = None
+
+    @model_validator(mode="after")
+    def _mismo_largo(self):
+        n = len(self.consumo_kwh)
+        for c in FEATURES_NUM + FEATURES_CAT:
+            v = getattr(self, c)
+            if v is not None and len(v) != n:
+                raise ValueError(f"'{c}' tiene {len(v)} valores y 'consumo_kwh' {n}")
+        return self
+
 # ---------------- Utils ----------------
-def _coerce_inputs(df: pd.DataFrame) -> pd.DataFrame:
+def _coerce_inputs(df: "pd.DataFrame", fixed: bool = False) -> "pd.DataFrame":
+    import pandas as pd
     df = df.copy()
+    if fixed:   # nulos por fila (no por columna), como FeatureEncoder(fixed=True)
+        for c, v in FeatureEncoder.DEFAULTS.items():
+            df[c] = df[c].fillna(v) if c in df else v
     # categóricas
     if 'estado' not in df or df['estado'].isna().any(): df['estado'] = 'activo'
     df['estado'] = df['estado'].where(df['estado'].isin(ESTADOS), 'activo')
@@ -95,27 +211,197 @@ def _coerce_inputs(df: pd.DataFrame) -> pd.DataFrame:
         df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0.0)
 
     df = df[FEATURES_NUM + FEATURES_CAT]
+    if fixed:   # todas las categorías en orden de texto: drop_first descarta la misma que en el entrenamiento
+        for c, cats in (("estado", ESTADOS), ("dia_semana", DIAS_SEMANA), ("casa_id", MUNICIPIOS),
+                        ("hora_dia", [f"{h:02d}:00" for h in range(24)])):
+            df[c] = pd.Categorical(df[c], categories=sorted(cats))
     X = pd.get_dummies(df, drop_first=True)
     if train_columns is not None:
         X = X.reindex(columns=train_columns, fill_value=0)
     return X
 
+_json_cache = FileCache()
+_raw_cache = PrecompressedCache()
+
+def _encode_registros(registros: List["Registro"]):
+    """Matriz lista para model.predict; sin train_columns se usa el camino con pandas."""
+    if encoder is not None:
+        return encoder.encode_records(registros)
+    import pandas as pd
+    return _coerce_inputs(pd.DataFrame([r.dict() for r in registros]))
+
+def _encode_columns(cols: dict, n: int, fixed: bool = False):
+    """
+    Igual que _encode_registros pero con entrada columnar (feature -> lista de n valores).
+    fixed=True: categorías fijas del entrenamiento, cada fila independiente del lote (pronóstico).
+    """
+    if encoder is not None:
+        return encoder.encode_columns(cols, n, fixed)
+    import pandas as pd
+    return _coerce_inputs(pd.DataFrame(cols), fixed)
+
 def _read_json_cache(path: Path):
-    if not path.exists():
+    """Entrada cacheada (data + etag); se re-parsea solo si el builder reescribió el archivo."""
+    try:
+        with stage("cache_read"):
+            return _json_cache.get(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"No existe {path}")
+
+def _etag_response(request: Request, etag: str, build, extra_headers: Optional[dict] = None):
+    """304 si el cliente ya tiene esta versión; si no, JSON con ETag fuerte."""
+    headers = {"ETag": etag, "Cache-Control": "no-cache", **(extra_headers or {})}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    with stage("serialize"):
+        return JSONResponse(build(), headers=headers)
+
+def _raw_response(request: Request, path: Path):
+    """Archivo del builder sin parsear: variante según Accept-Encoding, ETag por codificación."""
+    try:
+        with stage("cache_read"):
+            entry = _raw_cache.get(path)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail=f"No existe {path}")
-    return json.loads(path.read_text(encoding="utf-8"))
+    enc = pick_encoding(request.headers.get("accept-encoding"), entry.bodies)
+    headers = {"ETag": entry.etags[enc], "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match"), entry.etags[enc]):
+        return Response(status_code=304, headers=headers)
+    if enc != "identity":
+        headers["Content-Encoding"] = enc
+    return Response(entry.bodies[enc], media_type="application/json", headers=headers)
+
+# ---------------- Arranque ----------------
+_DUMMY = Registro(consumo_kwh=0.0, consumo_pico=0.0, promedio_hora=0.0, costo_estimado=0.0)
+
+def _warmup():
+    """Carga el modelo y hace una predicción dummy para dejar listo todo el camino de /predict."""
+    global MODEL_OK, MODEL_MSG, MODEL_LOAD_SECONDS
+    t0 = time.perf_counter()
+    try:
+        _load_model_and_columns()
+        model.predict(_encode_registros([_DUMMY]))
+        MODEL_OK, MODEL_MSG = True, "loaded"
+    except Exception as e:
+        MODEL_OK, MODEL_MSG = False, f"error: {e}"
+    finally:
+        MODEL_LOAD_SECONDS = round(time.perf_counter() - t0, 4)
+        model_ready.set()
+
+_swap_lock = threading.Lock()
+_rejected_version = None
+MODEL_SWAPS = 0
+
+def _refresh_model():
+    """
+    Con MODEL_STORE: si CURRENT apunta a otra versión, la valida con la predicción dummy y la pone
+    en lugar de la actual (también sirve de primera carga si el worker arrancó antes de publicar).
+    """
+    global model, train_columns, encoder, MODEL_VERSION, MODEL_OK, MODEL_MSG, MODEL_SWAPS, _rejected_version
+    try:
+        version, new = _model_store.get()
+    except Exception as e:   # aún no hay versión publicada
+        if not MODEL_OK:
+            MODEL_MSG = f"error: {e}"
+        return
+    if new is model or version == _rejected_version:
+        return
+    with _swap_lock:
+        if new is model:
+            return
+        cols = new.train_columns
+        try:
+            if cols is None:
+                raise ValueError("la versión no trae train_columns en meta.json")
+            enc = encoder if encoder is not None and cols == train_columns else \
+                FeatureEncoder(cols, FEATURES_NUM, FEATURES_CAT, ESTADOS, DIAS_SEMANA, MUNICIPIOS)
+            new.predict(enc.encode_records([_DUMMY]))
+        except Exception as e:
+            _rejected_version = version
+            _model_store.error = f"versión {version} rechazada: {e}"
+            return
+        # Si cambian las train_columns, un request que esté justo entre encode y predict puede mezclar
+        # versiones: falla ese request (columnas de más/menos), no el worker.
+        MODEL_SWAPS += model is not None
+        encoder, train_columns, model, MODEL_VERSION = enc, cols, new, version
+        MODEL_OK, MODEL_MSG = True, "loaded"
+
+def _model_refresher():
+    """
+    Con MODEL_STORE: revisa CURRENT cada MODEL_STORE_CHECK_S en su propio hilo. La carga mmap y la
+    predicción de validación de una versión nueva no pasan por el event loop ni frenan requests.
+    """
+    model_ready.wait()
+    while True:
+        try:
+            _refresh_model()
+        except Exception as e:   # el hilo sigue vivo; se reintenta en la siguiente revisión
+            _model_store.error = f"{type(e).__name__}: {e}"
+        time.sleep(max(MODEL_STORE_CHECK_S, 0.05))
+
+def _require_model():
+    """503 si no hay modelo; en arranque background espera un poco a que termine de cargar."""
+    if not model_ready.is_set():
+        model_ready.wait(MODEL_READY_TIMEOUT)
+    if not MODEL_OK:
+        raise HTTPException(status_code=503, detail=f"Modelo no disponible: {MODEL_MSG}")
+
+async def _await_model():
+    """Como _require_model pero sin bloquear el event loop mientras el modelo termina de cargar."""
+    if not model_ready.is_set():
+        await run_in_threadpool(model_ready.wait, MODEL_READY_TIMEOUT)
+    _require_model()
+
+async def _infer(fn, *args):
+    """Corre fn en el executor de inferencia; 429 + Retry-After si la cola está llena."""
+    try:
+        return await executor.run(fn, *args)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+if STARTUP_MODE == "background":
+    threading.Thread(target=_warmup, name="model-warmup", daemon=True).start()
+else:
+    _warmup()
+if _model_store is not None:
+    threading.Thread(target=_model_refresher, name="model-refresh", daemon=True).start()
 
 # ---------------- Endpoints básicos ----------------
 @app.get("/")
-def root():
+async def root():
     return {"msg": "IA Consumo/Costo API OK. Revisa /health y /docs"}
 
 @app.get("/health")
-def health():
-    return {"status": "ok" if MODEL_OK else "error", "model_loaded": MODEL_OK, "detail": MODEL_MSG}
+async def health():
+    """live: el proceso responde (los endpoints de caché ya sirven); ready: el modelo está cargado."""
+    ready = model_ready.is_set() and MODEL_OK
+    status = "ok" if ready else ("loading" if not model_ready.is_set() else "error")
+    return {"status": status, "live": True, "ready": ready, "model_loaded": MODEL_OK, "detail": MODEL_MSG,
+            "engine": None if model is None else ("compiled" if isinstance(model, CompiledForest) else "sklearn"),
+            "startup_mode": STARTUP_MODE, "load_seconds": MODEL_LOAD_SECONDS, "model_version": MODEL_VERSION,
+            "model_store": None if _model_store is None else {
+                "root": MODEL_STORE, "swaps": MODEL_SWAPS, "error": _model_store.error}}
+
+@app.get("/health/live")
+async def health_live():
+    return {"live": True}
+
+@app.get("/health/ready")
+async def health_ready():
+    # un worker que arrancó antes de la primera publicación queda listo cuando el hilo model-refresh la ve
+    if not (model_ready.is_set() and MODEL_OK):
+        return JSONResponse({"ready": False, "detail": MODEL_MSG}, status_code=503)
+    return {"ready": True}
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Métricas en formato de texto de Prometheus (404 con METRICS_ENABLED=0)."""
+    if metrics is None:
+        raise HTTPException(status_code=404, detail="Métricas deshabilitadas (METRICS_ENABLED=0)")
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.get("/schema")
-def schema():
+async def schema():
     return {
         "features_numeric": FEATURES_NUM, "features_categorical": FEATURES_CAT,
         "estados": ESTADOS, "dias_semana": DIAS_SEMANA, "municipios": MUNICIPIOS,
@@ -123,53 +409,405 @@ def schema():
     }
 
 # ---------------- Predicción ----------------
+# Los handlers son async: validan en el event loop y mandan encode + predict (y el armado de
+# respuestas grandes) al executor de inferencia, sin ocupar el threadpool de Starlette.
+def _predict_one(item: Registro):
+    with stage("encode"):
+        return _encode_registros([item])
+
+def _predict_rows(item: Registro):
+    X = _predict_one(item)
+    with stage("infer"):
+        return model.predict(X)[0]  # [consumo_next, costo_next]
+
 @app.post("/predict")
-def predict(item: Registro):
-    if not MODEL_OK:
-        raise HTTPException(status_code=503, detail=f"Modelo no disponible: {MODEL_MSG}")
-    df = pd.DataFrame([item.dict()])
-    X = _coerce_inputs(df)
-    y = model.predict(X)[0]  # [consumo_next, costo_next]
+@track
+async def predict(item: Registro):
+    await _await_model()
+    if batcher is not None:
+        X = await _infer(_predict_one, item)
+        with stage("infer"):
+            try:
+                fut = batcher.submit(X)
+            except QueueFull as e:
+                raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+            y = (await asyncio.wrap_future(fut))[0]
+    else:
+        y = await _infer(_predict_rows, item)
+    observe_batch(1)
     return {"consumo_kwh_next": float(y[0]), "costo_mx_next": float(y[1])}
 
+@app.get("/predict/stats")
+async def predict_stats():
+    """Tamaños de lote del micro-batching de /predict y estado del executor de inferencia."""
+    return {"microbatch": MICROBATCH, **(batcher.stats() if batcher is not None else {}),
+            "executor": executor.stats()}
+
+def _predict_batch(registros: List[Registro]):
+    with stage("encode"):
+        X = _encode_registros(registros)
+    with stage("infer"):
+        y = model.predict(X)  # (n,2)
+    observe_batch(len(y))
+    with stage("serialize"):
+        return JSONResponse({
+            "n": int(len(y)),
+            "predicciones": [{"consumo_kwh_next": float(a), "costo_mx_next": float(b)} for a, b in y]
+        })
+
 @app.post("/predict_batch")
-def predict_batch(items: Lote):
-    if not MODEL_OK:
-        raise HTTPException(status_code=503, detail=f"Modelo no disponible: {MODEL_MSG}")
-    df = pd.DataFrame([r.dict() for r in items.registros])
-    X = _coerce_inputs(df)
-    y = model.predict(X)  # (n,2)
-    return {
-        "n": int(len(y)),
-        "predicciones": [{"consumo_kwh_next": float(a), "costo_mx_next": float(b)} for a, b in y]
-    }
+@track
+async def predict_batch(items: Lote):
+    await _await_model()
+    return await _infer(_predict_batch, items.registros)
+
+def _predict_columnar(items: LoteColumnar):
+    n = len(items.consumo_kwh)
+    # columnas omitidas -> None: el encoder aplica el mismo default que Registro
+    with stage("encode"):
+        X = _encode_columns({c: getattr(items, c) for c in FEATURES_NUM + FEATURES_CAT}, n)
+    with stage("infer"):
+        y = np.asarray(model.predict(X), dtype=np.float64) if n else np.empty((0, 2))
+    observe_batch(n)
+    with stage("serialize"):
+        return JSONResponse({"n": n, "consumo_kwh_next": y[:, 0].tolist(), "costo_mx_next": y[:, 1].tolist()})
+
+@app.post("/predict_batch/columnar")
+@track
+async def predict_batch_columnar(items: LoteColumnar):
+    """Como /predict_batch pero columnar de entrada y de salida."""
+    await _await_model()
+    return await _infer(_predict_columnar, items)
+
+def _score_chunk(chunk) -> bytes:
+    """Codifica y predice un bloque; devuelve sus líneas NDJSON (una por fila de entrada)."""
+    cols, n_ok, ok = valid_subset(chunk)
+    lines = [None] * chunk.n
+    if n_ok:
+        with stage("encode"):
+            X = _encode_columns(cols, n_ok)
+        with stage("infer"):
+            y = model.predict(X)
+        observe_batch(n_ok)
+        for i, (a, b) in zip(ok, y):
+            lines[i] = json.dumps({"consumo_kwh_next": float(a), "costo_mx_next": float(b)})
+    for i, err in enumerate(chunk.errores):
+        if err is not None:
+            lines[i] = json.dumps({"error": err}, ensure_ascii=False)
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+@app.post("/predict_stream")
+@track
+async def predict_stream(request: Request, formato: Optional[str] = None):
+    """
+    Scoring masivo en streaming: NDJSON o CSV (con encabezado) de entrada, NDJSON de salida.
+    Se procesa por bloques de STREAM_CHUNK_ROWS y se responde mientras se sigue leyendo;
+    la última línea es {"resumen": {...}} con filas/s. La admisión al executor se decide al
+    inicio (429 si está lleno); los bloques siguientes del mismo request ya no se rechazan.
+    El primer bloque se lee antes de responder: si una línea de más de STREAM_MAX_LINE_BYTES
+    llega antes que cualquier fila es 413; si no, se puntúan las filas previas y el stream
+    termina con "error" en el resumen (el 200 ya se envió). Cada fila se valida como Registro
+    (numéricos obligatorios y finitos, modo_ecologico_activado entero); las inválidas salen
+    como {"error": ...} en su posición.
+    """
+    await _await_model()
+    if executor.saturated():
+        raise HTTPException(status_code=429, detail="cola de inferencia llena",
+                            headers={"Retry-After": str(executor.retry_after())})
+    if formato is None:
+        formato = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    if formato not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="formato debe ser 'ndjson' o 'csv'")
+
+    t0 = time.perf_counter()
+    chunks = iter_row_chunks(request.stream(), formato, FEATURES_NUM + FEATURES_CAT, STREAM_CHUNK_ROWS,
+                             STREAM_MAX_LINE_BYTES, required=FEATURES_NUM, ints=["modo_ecologico_activado"])
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except LineTooLong as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    async def _gen():
+        n, n_err, error = 0, 0, None
+        chunk = first
+        while chunk is not None:
+            yield await executor.run(_score_chunk, chunk, admit=False)
+            n += chunk.n
+            n_err += sum(e is not None for e in chunk.errores)
+            try:
+                chunk = await chunks.__anext__()
+            except StopAsyncIteration:
+                chunk = None
+            except LineTooLong as e:
+                chunk, error = None, str(e)
+        dt = time.perf_counter() - t0
+        resumen = {"n": n, "errores": n_err, "segundos": round(dt, 4),
+                   "filas_por_segundo": round(n / dt, 1) if dt > 0 else 0.0}
+        if error is not None:
+            resumen["error"] = error
+        yield (json.dumps({"resumen": resumen}, ensure_ascii=False) + "\n").encode("utf-8")
+
+    return DuplexStreamingResponse(_gen(), media_type="application/x-ndjson")
 
 # ---------------- Dashboard cache ----------------
+# Handlers async: con la caché caliente son lecturas en memoria (~decenas de µs), más baratas que el
+# salto al threadpool; solo un miss (archivo cambiado) lee de disco en el event loop.
+def _dash_file(request: Request, name: str):
+    if CACHE_PRECOMPRESSED:
+        return _raw_response(request, DASH_CACHE / name)
+    entry = _read_json_cache(DASH_CACHE / name)
+    return _etag_response(request, entry.etag, lambda: entry.data)
+
 @app.get("/dash/cards")
-def dash_cards():
-    return _read_json_cache(DASH_CACHE / "cards.json")
+@track
+async def dash_cards(request: Request):
+    return _dash_file(request, "cards.json")
 
 @app.get("/dash/mensual")
-def dash_mensual():
-    return _read_json_cache(DASH_CACHE / "mensual.json")
+@track
+async def dash_mensual(request: Request):
+    return _dash_file(request, "mensual.json")
 
 @app.get("/dash/semanal")
-def dash_semanal():
-    return _read_json_cache(DASH_CACHE / "semanal.json")
+@track
+async def dash_semanal(request: Request):
+    return _dash_file(request, "semanal.json")
+
+_history = HistoryStore(DASH_CACHE, mmap=HIST_MMAP)
+
+def _historico_json(request: Request, n: int, offset: int, estado, desde, hasta):
+    """Respaldo sin historico.npy: filtra las filas de historico.json (solo las más recientes)."""
+    entry = _read_json_cache(DASH_CACHE / "historico.json")
+    data = entry.data
+    if estado is not None or desde is not None or hasta is not None:
+        data = [r for r in data if (estado is None or r.get("estado") == estado)
+                and (desde is None or (r.get("fecha") or "")[:10] >= str(desde))
+                and (hasta is None or (r.get("fecha") or "")[:10] <= str(hasta))]
+    etag = combine_etags([entry.etag], f"limit={n}|offset={offset}|{estado}|{desde}|{hasta}")
+    return _etag_response(request, etag, lambda: data[offset:offset + n])
 
 @app.get("/dash/historico")
-def dash_historico(limit: int = 100):
-    data = _read_json_cache(DASH_CACHE / "historico.json")
-    return data[:max(1, min(limit, len(data)))]
+@track
+async def dash_historico(request: Request, limit: int = 100, offset: int = Query(0, ge=0),
+                         cursor: Optional[int] = Query(None, ge=0), estado: Optional[str] = None,
+                         desde: Optional[date] = None, hasta: Optional[date] = None):
+    """
+    Registros más recientes primero. Paginación por `cursor` (el valor de X-Next-Cursor de la página
+    anterior; válido mientras no cambie el ETag) u `offset`; filtros opcionales por estado y fechas.
+    """
+    n = max(1, min(limit, HIST_PAGE_MAX))
+    estado = estado.lower().strip() if estado else None
+    try:
+        with stage("cache_read"):
+            view = _history.get()
+    except FileNotFoundError:
+        return _historico_json(request, n, offset, estado, desde, hasta)
+    rows, nxt = history_page(view, n, offset, cursor, estado, desde, hasta)
+    etag = combine_etags([view.etag], f"limit={n}|offset={offset}|cursor={cursor}|{estado}|{desde}|{hasta}")
+    return _etag_response(request, etag, lambda: rows, {"X-Next-Cursor": str(nxt)} if nxt is not None else None)
+
+# ---------------- Predicciones precalculadas ----------------
+@app.get("/predicciones")
+@track
+async def predicciones(request: Request, casa_id: Optional[str] = None, estado: Optional[str] = None):
+    """Siguiente periodo por (casa_id, estado), de tools/build_predicciones.py; filtros opcionales."""
+    if casa_id is None and estado is None:
+        return _dash_file(request, "predicciones.json")
+    entry = _read_json_cache(DASH_CACHE / "predicciones.json")
+    etag = combine_etags([entry.etag], f"{casa_id}|{estado}")
+
+    def _build():
+        rows = [r for r in entry.data["predicciones"]
+                if (casa_id is None or r["casa_id"] == casa_id) and (estado is None or r["estado"] == estado)]
+        return {**entry.data, "n": len(rows), "predicciones": rows}
+    return _etag_response(request, etag, _build)
 
 # ---------------- Minería cache ----------------
+MINERIA_FILES = ["resumen", "consumo_hora", "consumo_dia", "top_dispositivos", "consumo_vs_costo"]
+
+_stamp_cache = FileCache(lambda raw: raw.decode("ascii").strip())
+
+def _combined_fresh() -> bool:
+    """mineria_cache.json vale solo si su stamp coincide con el (mtime, tamaño) actual de las partes."""
+    try:
+        stamp = _stamp_cache.get(MINERIA_CACHE / "mineria_cache.stamp").data
+        stats = [(MINERIA_CACHE / f"{k}.json").stat() for k in MINERIA_FILES]
+    except FileNotFoundError:
+        return False
+    return stamp == combine_etags(f"{st.st_mtime_ns}:{st.st_size}" for st in stats)
+
 @app.get("/mineria_cache")
-def mineria_cache():
-    """Devuelve todos los JSONs que arma build_mineria_cache.py"""
-    return {
-        "resumen": _read_json_cache(MINERIA_CACHE / "resumen.json"),
-        "consumo_hora": _read_json_cache(MINERIA_CACHE / "consumo_hora.json"),
-        "consumo_dia": _read_json_cache(MINERIA_CACHE / "consumo_dia.json"),
-        "top_dispositivos": _read_json_cache(MINERIA_CACHE / "top_dispositivos.json"),
-        "consumo_vs_costo": _read_json_cache(MINERIA_CACHE / "consumo_vs_costo.json"),
-    }
+@track
+async def mineria_cache(request: Request):
+    """
+    Devuelve todos los JSONs que arma build_mineria_cache.py. El combinado precomprimido se sirve
+    solo si corresponde a las partes actuales; si no (build sin precompresión, partes reescritas
+    después), se arma desde las partes.
+    """
+    combined = MINERIA_CACHE / "mineria_cache.json"
+    if CACHE_PRECOMPRESSED and combined.exists() and _combined_fresh():
+        return _raw_response(request, combined)
+    entries = {k: _read_json_cache(MINERIA_CACHE / f"{k}.json") for k in MINERIA_FILES}
+    etag = combine_etags(e.etag for e in entries.values())
+    return _etag_response(request, etag, lambda: {k: e.data for k, e in entries.items()})
+
+@app.get("/mineria/anomalias")
+@track
+async def mineria_anomalias(request: Request):
+    """Top-N anomalías y conteos por (municipio, hora) que escribe build_mineria_cache.py"""
+    if CACHE_PRECOMPRESSED:
+        return _raw_response(request, MINERIA_CACHE / "anomalias.json")
+    entry = _read_json_cache(MINERIA_CACHE / "anomalias.json")
+    return _etag_response(request, entry.etag, lambda: entry.data)
+
+_cube = CubeStore(MINERIA_CACHE / "cubo", mmap=CUBE_MMAP)
+
+@app.get("/mineria/query")
+@track
+async def mineria_query(request: Request, municipio: Optional[str] = None, desde: Optional[date] = None,
+                        hasta: Optional[date] = None, agrupar: Literal["hora", "dia", "mes"] = "hora"):
+    """Consumo/costo filtrado por municipio y rango de fechas, desde el cubo precalculado."""
+    try:
+        with stage("cache_read"):
+            view = _cube.get()
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"No existe el cubo en {MINERIA_CACHE / 'cubo'}")
+    if municipio and municipio not in view.municipios:
+        raise HTTPException(status_code=404, detail=f"Municipio desconocido: {municipio}")
+    etag = combine_etags([view.etag], f"{municipio}|{desde}|{hasta}|{agrupar}")
+    return _etag_response(request, etag, lambda: query_cube(view, municipio, desde, hasta, agrupar))
+
+# ---------------- Pronóstico ----------------
+def _model_tag() -> str:
+    """Identifica el modelo cargado (para ETags de respuestas que dependen de él)."""
+    if MODEL_VERSION:
+        return MODEL_VERSION
+    p = Path(COMPILED_MODEL_DIR) / META_FILE if isinstance(model, CompiledForest) else Path(MODEL_PATH)
+    st = p.stat()
+    return f"{p.name}:{st.st_mtime_ns}:{st.st_size}"
+
+def _forecast(seeds: dict, n: int, horizon: int, headers: Optional[dict] = None) -> JSONResponse:
+    """
+    Rollout completo dentro del executor: un encode + un model.predict por paso para los n registros.
+    Cada paso se codifica con categorías fijas (_encode_columns fixed=True), así que la serie de un
+    municipio es la misma sola que junto a los demás.
+    """
+    def _predict(cols, k):
+        with stage("encode"):
+            X = _encode_columns(cols, k, fixed=True)
+        with stage("infer"):
+            y = model.predict(X)
+        observe_batch(k)
+        return y
+
+    r = rollout(_predict, seeds, n, horizon, DIAS_SEMANA)
+    with stage("serialize"):
+        consumo, costo = np.round(r["consumo"], 4).tolist(), np.round(r["costo"], 4).tolist()
+        return JSONResponse({"horizon": horizon, "n": n, "series": [{
+            "casa_id": (seeds.get("casa_id") or [None] * n)[i],
+            "inicio": {"hora_dia": (seeds.get("hora_dia") or ["00:00"] * n)[i],
+                       "dia_semana": (seeds.get("dia_semana") or ["lunes"] * n)[i],
+                       "consumo_kwh": seeds["consumo_kwh"][i]},
+            "hora_dia": [h[i] for h in r["horas"]],
+            "dia_semana": [d[i] for d in r["dias"]],
+            "consumo_kwh": consumo[i],
+            "costo_mx": costo[i],
+        } for i in range(n)]}, headers=headers)
+
+async def _run_forecast(seeds: dict, n: int, horizon: int, headers: Optional[dict] = None) -> JSONResponse:
+    try:
+        return await _infer(_forecast, seeds, n, horizon, headers)
+    except ValueError as e:   # hora_dia inválida
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.get("/forecast")
+@track
+async def forecast(request: Request, horizon: int = Query(24, ge=1), municipio: Optional[List[str]] = Query(None)):
+    """
+    Pronóstico de `horizon` horas por municipio (todos o los pedidos), partiendo de la última hora
+    con datos de cada uno en el cubo de minería. Cada paso es un solo model.predict para todos.
+    """
+    await _await_model()
+    if horizon > FORECAST_MAX_HORIZON:
+        raise HTTPException(status_code=422, detail=f"horizon máximo: {FORECAST_MAX_HORIZON}")
+    try:
+        with stage("cache_read"):
+            view = _cube.get()
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"No existe el cubo en {MINERIA_CACHE / 'cubo'}")
+    unknown = [m for m in municipio or [] if m not in view.municipios]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Municipio desconocido: {', '.join(unknown)}")
+    etag = combine_etags([view.etag], f"{_model_tag()}|{horizon}|{municipio}")
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    nombres, seeds = seeds_from_cube(view, municipio, DIAS_SEMANA)
+    return await _run_forecast(seeds, len(nombres), horizon, headers)
+
+@app.post("/forecast")
+@track
+async def forecast_registros(items: Lote, horizon: int = Query(24, ge=1)):
+    """Como GET /forecast pero partiendo de los registros enviados (cada paso = un model.predict del lote)."""
+    await _await_model()
+    if horizon > FORECAST_MAX_HORIZON:
+        raise HTTPException(status_code=422, detail=f"horizon máximo: {FORECAST_MAX_HORIZON}")
+    n = len(items.registros)
+    if n > FORECAST_MAX_ROWS:
+        raise HTTPException(status_code=422, detail=f"registros máximos: {FORECAST_MAX_ROWS}")
+    seeds = {c: [getattr(r, c) for r in items.registros] for c in FEATURES_NUM + FEATURES_CAT}
+    return await _run_forecast(seeds, n, horizon)
+
+# ---------------- Métricas: colectores ----------------
+if metrics is not None:
+    @metrics.collector
+    def _cache_metrics():
+        caches = {"json": _json_cache, "raw": _raw_cache, "cubo": _cube, "historico": _history}
+        return render_simple("cache_lookups_total", "counter", "Lecturas de caché; miss = se leyó de disco.",
+                             ("cache", "result"),
+                             [((k, r), v) for k, c in caches.items()
+                              for r, v in (("hit", c.hits), ("miss", c.misses))])
+
+    @metrics.collector
+    def _model_metrics():
+        lines = render_simple("model_load_seconds", "gauge", "Segundos de carga + predicción de calentamiento.",
+                              (), [((), MODEL_LOAD_SECONDS)] if MODEL_LOAD_SECONDS is not None else [])
+        lines += render_simple("model_ready", "gauge", "1 si el modelo está cargado.", (), [((), int(MODEL_OK))])
+        if _model_store is not None:
+            lines += render_simple("model_version_info", "gauge", "Versión activa de MODEL_STORE.", ("version",),
+                                   [((MODEL_VERSION,), 1)] if MODEL_VERSION else [])
+            lines += render_simple("model_swaps_total", "counter", "Cambios de versión sin reinicio.",
+                                   (), [((), MODEL_SWAPS)])
+        if batcher is not None:
+            st = batcher.stats()
+            lines += render_simple("microbatch_batches_total", "counter", "Lotes armados por el micro-batching.",
+                                   (), [((), st["batches"])])
+            lines += render_simple("microbatch_rows_total", "counter", "Filas procesadas por el micro-batching.",
+                                   (), [((), st["rows"])])
+            lines += render_simple("microbatch_queue_depth", "gauge", "Requests esperando lote.",
+                                   (), [((), st["queued"])])
+            lines += render_simple("microbatch_rejected_total", "counter",
+                                   "Requests rechazados con 429 (cola del micro-batching llena).",
+                                   (), [((), st["rejected"])])
+            lines += render_simple("microbatch_errors_total", "counter",
+                                   "Lotes que fallaron (el error se devuelve a cada request del lote).",
+                                   (), [((), st["errors"])])
+        return lines
+
+    @metrics.collector
+    def _executor_metrics():
+        st = executor.stats()
+        lines = render_simple("inference_queue_depth", "gauge", "Tareas esperando en la cola de inferencia.",
+                              (), [((), st["queued"])])
+        lines += render_simple("inference_in_flight", "gauge", "Tareas ejecutándose en el executor de inferencia.",
+                               (), [((), st["running"])])
+        lines += render_simple("inference_completed_total", "counter", "Tareas terminadas por el executor.",
+                               (), [((), st["completed"])])
+        lines += render_simple("inference_cancelled_total", "counter",
+                               "Tareas canceladas en cola (cliente desconectado) sin ejecutarse.",
+                               (), [((), st["cancelled"])])
+        lines += render_simple("inference_rejected_total", "counter", "Requests rechazados con 429 (cola llena).",
+                               (), [((), st["rejected"])])
+        return lines
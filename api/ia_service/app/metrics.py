@@ -0,0 +1,208 @@
+# ia_service/app/metrics.py — latencias por endpoint y por etapa, tamaños de lote y contadores de
+# caché en formato de texto de Prometheus (sin dependencias). Pensado para dejarse prendido:
+# cada request cuesta unos pocos perf_counter y un lock por observación.
+#
+# Etapas (label stage):
+#   validate    llegada del request -> entrada al handler (lectura del cuerpo + JSON + Pydantic)
+#   encode      filas -> matriz del modelo
+#   infer       model.predict (incluye la espera del micro-batching)
+#   serialize   salida del handler -> inicio de la respuesta (o armado explícito dentro del handler)
+#   cache_read  lectura / validación de archivos de caché
+import functools, inspect, threading, time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+NO_ROUTE = "(sin ruta)"
+
+# Registro del request en curso; lo crea el middleware. Los handlers síncronos corren en el
+# threadpool con una copia del contexto, así que ven el mismo dict.
+_current: ContextVar[Optional[dict]] = ContextVar("metrics_request", default=None)
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(v: float) -> str:
+    return repr(float(v)) if v != int(v) or abs(v) >= 1e15 else str(int(v))
+
+
+class Histogram:
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str], buckets: Sequence[float]):
+        self.name, self.doc, self.labelnames = name, doc, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[tuple, list] = {}   # labels -> [conteos por bucket (+Inf al final), suma]
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        i = bisect_left(self.buckets, value)    # primer bucket con le >= value
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            s[0][i] += 1
+            s[1] += value
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(k, list(c), s) for k, (c, s) in self._series.items()]
+        for labels, counts, total in sorted(series):
+            acc = 0
+            for le, c in zip(self.buckets + (float("inf"),), counts):
+                acc += c
+                le_label = 'le="+Inf"' if le == float("inf") else f'le="{_fmt(le)}"'
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le_label)} {acc}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_fmt(total)}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, labels)} {acc}")
+        return out
+
+
+def render_simple(name: str, kind: str, doc: str, labelnames: Sequence[str],
+                  samples: Iterable[Tuple[tuple, float]]) -> List[str]:
+    """Líneas de un counter / gauge leído al momento (colectores)."""
+    out = [f"# HELP {name} {doc}", f"# TYPE {name} {kind}"]
+    out += [f"{name}{_labels(labelnames, labels)} {_fmt(v)}" for labels, v in samples]
+    return out
+
+
+class Metrics:
+    """Histogramas de requests, etapas y lotes + colectores que se leen al renderizar /metrics."""
+
+    def __init__(self):
+        self.requests = Histogram("http_request_duration_seconds", "Latencia total por endpoint.",
+                                  ("route", "method", "status"), LATENCY_BUCKETS)
+        self.stages = Histogram("http_stage_duration_seconds", "Latencia por etapa dentro del request.",
+                                ("route", "stage"), LATENCY_BUCKETS)
+        self.batches = Histogram("predict_batch_rows", "Filas por llamada al modelo.",
+                                 ("route",), BATCH_BUCKETS)
+        self._extra: List[Histogram] = []
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def histogram(self, name: str, doc: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        """Histograma adicional (fuera del ciclo del request) que se incluye en render()."""
+        h = Histogram(name, doc, labelnames, buckets)
+        self._extra.append(h)
+        return h
+
+    def collector(self, fn: Callable[[], List[str]]):
+        """`fn()` devuelve líneas ya formateadas (render_simple); se llama en cada /metrics."""
+        self._collectors.append(fn)
+        return fn
+
+    def finish(self, scope: dict, rec: dict, status: int):
+        route = scope.get("route")
+        path = getattr(route, "path", None) or NO_ROUTE
+        t_end = time.perf_counter()
+        self.requests.observe((path, scope.get("method", ""), str(status)), t_end - rec["t0"])
+        stages = rec["stages"]
+        if "in" in rec:
+            stages.append(("validate", rec["in"] - rec["t0"]))
+        if "out" in rec and "resp" in rec and not any(name == "serialize" for name, _ in stages):
+            stages.append(("serialize", rec["resp"] - rec["out"]))
+        for name, dt in stages:
+            self.stages.observe((path, name), dt)
+        for n in rec["lotes"]:
+            self.batches.observe((path,), n)
+
+    def render(self) -> str:
+        lines = self.requests.render() + self.stages.render() + self.batches.render()
+        for h in self._extra:
+            lines += h.render()
+        for fn in self._collectors:
+            lines += fn()
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Middleware ASGI puro: abre el registro del request y lo vuelca al terminar la respuesta."""
+
+    def __init__(self, app, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        rec = {"t0": time.perf_counter(), "stages": [], "lotes": []}
+        token = _current.set(rec)
+        status = 500
+
+        async def _send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                rec["resp"] = time.perf_counter()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            _current.reset(token)
+            self.metrics.finish(scope, rec, status)
+
+
+# ---------- API para el código de la app (no-op si no hay middleware) ----------
+class stage:
+    """`with stage("encode"): ...` mide un bloque del request en curso."""
+    __slots__ = ("name", "rec", "t")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rec = _current.get()
+
+    def __enter__(self):
+        if self.rec is not None:
+            self.t = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.rec is not None:
+            self.rec["stages"].append((self.name, time.perf_counter() - self.t))
+        return False
+
+
+def observe_batch(n: int):
+    """Filas de una llamada al modelo dentro del request en curso."""
+    rec = _current.get()
+    if rec is not None:
+        rec["lotes"].append(n)
+
+
+def track(fn):
+    """Marca entrada / salida del handler (para validate y serialize). Síncrono o async."""
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def _async(*args, **kwargs):
+            rec = _current.get()
+            if rec is not None:
+                rec["in"] = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                if rec is not None:
+                    rec["out"] = time.perf_counter()
+        return _async
+
+    @functools.wraps(fn)
+    def _sync(*args, **kwargs):
+        rec = _current.get()
+        if rec is not None:
+            rec["in"] = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            if rec is not None:
+                rec["out"] = time.perf_counter()
+    return _sync
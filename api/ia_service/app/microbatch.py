@@ -0,0 +1,131 @@
+# ia_service/app/microbatch.py — agrupa /predict concurrentes en un solo model.predict
+import queue, threading, time
+from collections import Counter
+from concurrent.futures import Future, InvalidStateError
+from typing import Callable, Dict
+import numpy as np
+
+from .executor import QueueFull
+
+
+class MicroBatcher:
+    """
+    Cada request encola su fila ya codificada y espera su Future. Un hilo colector junta
+    lo que llegue dentro de `max_wait_s` (o hasta `max_batch` filas), llama una sola vez a
+    `predict_fn` y devuelve a cada quien su fila de resultados. La cola admite hasta `max_queue`
+    requests esperando; con más, submit lanza QueueFull (429 en la API) con `retry_after()`.
+    """
+
+    def __init__(self, predict_fn: Callable[[np.ndarray], np.ndarray],
+                 max_batch: int = 32, max_wait_s: float = 0.003, max_queue: int = 256,
+                 retry_after: Callable[[], int] = lambda: 1):
+        self._predict_fn = predict_fn
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait_s = max(0.0, float(max_wait_s))
+        self.max_queue = max(1, int(max_queue))
+        self._retry_after = retry_after
+        self._queue: "queue.Queue[tuple]" = queue.Queue(self.max_queue)
+        self._rejected = 0
+        self._errors = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._sizes: Counter = Counter()
+        self._batches = 0
+        self._rows = 0
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="microbatch", daemon=True)
+                    self._thread.start()
+
+    def submit(self, x: np.ndarray) -> Future:
+        """`x`: matriz (k, n_features) de un request; el Future resuelve a sus k filas de salida."""
+        self._ensure_thread()
+        fut: Future = Future()
+        try:
+            self._queue.put_nowait((x, fut))
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            raise QueueFull(self._retry_after())
+        return fut
+
+    def _take(self, batch: list, item: tuple) -> int:
+        # set_running_or_notify_cancel: a partir de aquí el Future ya no se puede cancelar;
+        # si el request se canceló mientras esperaba (cliente desconectado) se descarta
+        if item[1].set_running_or_notify_cancel():
+            batch.append(item)
+            return len(item[0])
+        return 0
+
+    def _collect(self) -> list:
+        batch: list = []
+        rows = self._take(batch, self._queue.get())
+        deadline = time.monotonic() + self.max_wait_s
+        while rows < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get_nowait() if timeout <= 0 else self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            rows += self._take(batch, item)
+        return batch
+
+    @staticmethod
+    def _resolve(fut: Future, result=None, exc: BaseException = None):
+        try:
+            if exc is not None:
+                fut.set_exception(exc)
+            else:
+                fut.set_result(result)
+        except InvalidStateError:
+            pass
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                batch = self._collect()
+                if batch:
+                    self._predict_batch(batch)
+            except Exception as e:   # un batch malo no debe tumbar el hilo colector
+                with self._lock:
+                    self._errors += 1
+                for _, fut in batch:
+                    self._resolve(fut, exc=e)
+
+    def _predict_batch(self, batch: list):
+        X = batch[0][0] if len(batch) == 1 else np.vstack([x for x, _ in batch])
+        try:
+            Y = self._predict_fn(X)
+        except Exception as e:
+            with self._lock:
+                self._errors += 1
+            for _, fut in batch:
+                self._resolve(fut, exc=e)
+            return
+        with self._lock:
+            self._sizes[len(X)] += 1
+            self._batches += 1
+            self._rows += len(X)
+        start = 0
+        for x, fut in batch:
+            self._resolve(fut, Y[start:start + len(x)])
+            start += len(x)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "max_batch": self.max_batch,
+                "max_wait_ms": round(self.max_wait_s * 1000, 3),
+                "max_queue": self.max_queue,
+                "queued": self._queue.qsize(),
+                "rejected": self._rejected,
+                "errors": self._errors,
+                "batches": self._batches,
+                "rows": self._rows,
+                "avg_batch": round(self._rows / self._batches, 3) if self._batches else 0.0,
+                "batch_sizes": {str(k): v for k, v in sorted(self._sizes.items())},
+            }
@@ -0,0 +1,130 @@
+# ia_service/app/model_store.py — almacén de modelos compilados versionados, compartido por procesos.
+#
+#   <raíz>/versions/<versión>/   arreglos .npy + meta.json de app/forest.py (train_columns incluidas)
+#   <raíz>/CURRENT               nombre de la versión activa (se reemplaza con os.replace)
+#
+# Cada worker abre los .npy con mmap de solo lectura: las páginas del bosque viven una sola vez en
+# el page cache del host sin importar cuántos procesos (uvicorn --workers, FUNCTIONS_WORKER_PROCESS_COUNT)
+# las usen. Publicar una versión nueva = escribir su directorio y luego cambiar CURRENT; los workers
+# lo notan por stat y cambian de modelo sin reiniciar.
+import hashlib, os, shutil, threading, time
+from pathlib import Path
+from typing import Optional, Tuple
+
+from .forest import ARRAYS, META_FILE, CompiledForest
+
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+MODEL_FILES = [f"{a}.npy" for a in ARRAYS] + [META_FILE]
+
+
+def _digest(src: Path) -> str:
+    h = hashlib.sha1()
+    for name in MODEL_FILES:
+        with open(src / name, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()[:12]
+
+
+def read_current(root: Path) -> Optional[str]:
+    try:
+        return (Path(root) / CURRENT_FILE).read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def publish(root: Path, src: Path, version: Optional[str] = None) -> str:
+    """
+    Copia un bosque compilado (`src`, salida de export_forest) como versión nueva y la activa.
+    Sin `version` se usa fecha + hash del contenido; publicar dos veces lo mismo reutiliza el directorio.
+    Los archivos de una versión nunca se reescriben: los workers pueden tenerlos mapeados.
+    """
+    root, src = Path(root), Path(src)
+    missing = [n for n in MODEL_FILES if not (src / n).exists()]
+    if missing:
+        raise FileNotFoundError(f"Faltan archivos del modelo en {src}: {', '.join(missing)}")
+    versions = root / VERSIONS_DIR
+    versions.mkdir(parents=True, exist_ok=True)
+    if version is None:
+        digest = _digest(src)
+        version = next((p.name for p in versions.iterdir() if p.name.endswith(f"-{digest}")),
+                       f"{time.strftime('%Y%m%d-%H%M%S')}-{digest}")
+    dst = versions / version
+    if not dst.exists():
+        tmp = versions / f".{version}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        for name in MODEL_FILES:
+            shutil.copyfile(src / name, tmp / name)
+        os.replace(tmp, dst)
+    tmp = root / f"{CURRENT_FILE}.tmp"
+    tmp.write_text(version + "\n", encoding="utf-8")
+    os.replace(tmp, root / CURRENT_FILE)
+    return version
+
+
+def prune(root: Path, keep: int = 3) -> list:
+    """Borra las versiones más viejas salvo las `keep` más recientes y la activa."""
+    root = Path(root)
+    current = read_current(root)
+    dirs = sorted((p for p in (root / VERSIONS_DIR).iterdir() if p.is_dir() and not p.name.startswith(".")),
+                  key=lambda p: p.stat().st_mtime_ns, reverse=True)
+    removed = []
+    for p in dirs[keep:]:
+        if p.name != current:
+            # en Linux un worker que aún la tenga mapeada sigue leyendo el inode hasta soltarla
+            shutil.rmtree(p, ignore_errors=True)
+            removed.append(p.name)
+    return removed
+
+
+class ModelStore:
+    """
+    Versión activa de <raíz>/CURRENT cargada con mmap. `get()` revisa CURRENT con un stat como
+    mucho cada `check_interval` segundos; si cambió, carga la versión nueva y la devuelve.
+    Si la carga falla se sigue entregando la anterior y se reintenta en la siguiente revisión.
+    """
+
+    def __init__(self, root: Path, check_interval: float = 1.0):
+        self.root = Path(root)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._next_check = 0.0
+        self._current: Optional[Tuple[str, CompiledForest]] = None   # una sola asignación al cambiar
+        self.error: Optional[str] = None
+
+    def _load(self, stamp):
+        version = read_current(self.root)
+        if version is None:
+            raise FileNotFoundError(f"{self.root / CURRENT_FILE} vacío")
+        if self._current is not None and version == self._current[0]:   # se republicó la misma
+            self._stamp = stamp
+            return
+        model = CompiledForest.load(self.root / VERSIONS_DIR / version, mmap=True)
+        self._current, self._stamp, self.error = (version, model), stamp, None
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._current[0] if self._current is not None else None
+
+    def get(self) -> Tuple[str, CompiledForest]:
+        """(versión, modelo). FileNotFoundError si todavía no hay nada publicado."""
+        now, cur = time.monotonic(), self._current
+        if cur is not None and now < self._next_check:
+            return cur
+        with self._lock:
+            if self._current is not None and now < self._next_check:
+                return self._current
+            self._next_check = now + self.check_interval
+            try:
+                st = (self.root / CURRENT_FILE).stat()
+                stamp = (st.st_mtime_ns, st.st_size)
+                if stamp != self._stamp:
+                    self._load(stamp)
+            except Exception as e:
+                if self._current is None:
+                    raise
+                self.error = f"{type(e).__name__}: {e}"
+            return self._current
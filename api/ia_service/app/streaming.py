@@ -0,0 +1,200 @@
+# ia_service/app/streaming.py — lectura por bloques de cuerpos NDJSON/CSV para /predict_stream
+import csv, json, math
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+
+class RowChunk:
+    """Un bloque de filas ya en forma columnar; `errores[i]` es None si la fila i es válida."""
+
+    __slots__ = ("columnas", "n", "errores")
+
+    def __init__(self, columnas: Dict[str, list], n: int, errores: List[Optional[str]]):
+        self.columnas = columnas
+        self.n = n
+        self.errores = errores
+
+
+class LineTooLong(ValueError):
+    """Una línea del cuerpo supera `max_bytes` (sin \n no se puede partir en filas)."""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"línea de más de {max_bytes} bytes (STREAM_MAX_LINE_BYTES)")
+        self.max_bytes = max_bytes
+
+
+async def _iter_lines(body: AsyncIterator[bytes], max_line: int) -> AsyncIterator[bytes]:
+    """
+    Parte el cuerpo en líneas sin acumularlo completo (\n nunca aparece dentro de un carácter UTF-8).
+    La línea en curso se guarda como lista de trozos y solo se busca \n en el trozo nuevo: lineal
+    aunque el cuerpo no traiga saltos. LineTooLong si una línea pasa de `max_line` bytes.
+    """
+    parts: List[bytes] = []    # trozos de la línea incompleta
+    size = 0
+    async for piece in body:
+        if not piece:
+            continue
+        last = piece.rfind(b"\n")
+        if last < 0:
+            size += len(piece)
+            if size > max_line:
+                raise LineTooLong(max_line)
+            parts.append(piece)
+            continue
+        lines = piece[:last].split(b"\n")
+        if parts:
+            parts.append(lines[0])
+            lines[0] = b"".join(parts)
+        if max(map(len, lines)) > max_line:
+            raise LineTooLong(max_line)
+        for line in lines:
+            yield line
+        rest = piece[last + 1:]
+        parts, size = ([rest], len(rest)) if rest else ([], 0)
+        if size > max_line:
+            raise LineTooLong(max_line)
+    if parts:
+        yield b"".join(parts)
+
+
+def _empty_columns(features: Sequence[str]) -> Dict[str, list]:
+    return {c: [] for c in features}
+
+
+def _parse_ndjson(line: str) -> dict:
+    obj = json.loads(line)
+    if not isinstance(obj, dict):
+        raise ValueError("cada línea debe ser un objeto JSON")
+    return obj
+
+
+def _to_float(c: str, v) -> float:
+    if isinstance(v, str):
+        try:
+            v = float(v.strip())
+        except ValueError:
+            raise ValueError(f"'{c}' no es numérico") from None
+    elif isinstance(v, (int, float)):
+        v = float(v)
+    else:
+        raise ValueError(f"'{c}' no es numérico")
+    if not math.isfinite(v):
+        raise ValueError(f"'{c}' debe ser finito")
+    return v
+
+
+def _to_int(c: str, v) -> int:
+    if isinstance(v, str):
+        try:
+            f = float(v.strip())
+        except ValueError:
+            raise ValueError(f"'{c}' debe ser entero") from None
+    elif isinstance(v, (int, float)):
+        f = v
+    else:
+        raise ValueError(f"'{c}' debe ser entero")
+    if not (math.isfinite(f) and float(f).is_integer()):
+        raise ValueError(f"'{c}' debe ser entero")
+    return int(f)
+
+
+def _check_row(row: dict, features: Sequence[str], required: Sequence[str], ints: Sequence[str]) -> dict:
+    """
+    Valida y convierte una fila como lo hace Registro: `required` son numéricos obligatorios y
+    finitos, `ints` enteros opcionales y el resto de `features` textos opcionales.
+    """
+    out = {}
+    for c in features:
+        v = row.get(c)
+        if c in required:
+            if v is None:
+                raise ValueError(f"falta '{c}'")
+            v = _to_float(c, v)
+        elif v is None:
+            pass
+        elif c in ints:
+            v = _to_int(c, v)
+        elif not isinstance(v, str):
+            raise ValueError(f"'{c}' debe ser texto")
+        out[c] = v
+    return out
+
+
+async def iter_row_chunks(body: AsyncIterator[bytes], formato: str, features: Sequence[str],
+                          chunk_rows: int, max_line: int = 1 << 20, required: Sequence[str] = (),
+                          ints: Sequence[str] = ()) -> AsyncIterator[RowChunk]:
+    """
+    Lee NDJSON (un objeto por línea) o CSV (con encabezado) y entrega bloques de a lo más
+    `chunk_rows` filas, validadas con _check_row (`required` / `ints`). Las filas inválidas
+    se conservan como hueco (valores None + error) para que la salida quede alineada 1:1
+    con la entrada. Una línea de más de `max_line` bytes corta la lectura con LineTooLong,
+    después de entregar las filas leídas antes de ella.
+    """
+    required, ints = frozenset(required), frozenset(ints)
+    header: Optional[List[str]] = None
+    cols, errores, n = _empty_columns(features), [], 0
+
+    lines = _iter_lines(body, max_line)
+    while True:
+        try:
+            raw = await lines.__anext__()
+        except StopAsyncIteration:
+            break
+        except LineTooLong:
+            if n:
+                yield RowChunk(cols, n, errores)
+            raise
+        line = raw.decode("utf-8-sig" if header is None else "utf-8", errors="replace").rstrip("\r")
+        if not line.strip():
+            continue
+        if formato == "csv" and header is None:
+            header = [h.strip() for h in next(csv.reader([line]))]
+            continue
+
+        err = None
+        try:
+            if formato == "csv":
+                values = next(csv.reader([line]))
+                if len(values) != len(header):
+                    raise ValueError(f"se esperaban {len(header)} columnas y llegaron {len(values)}")
+                # como read_csv: celdas vacías -> nulo
+                row = {h: (v if v != "" else None) for h, v in zip(header, values)}
+            else:
+                row = _parse_ndjson(line)
+            row = _check_row(row, features, required, ints)
+        except (ValueError, csv.Error) as e:
+            row, err = {}, str(e)
+
+        for c in features:
+            cols[c].append(row.get(c))
+        errores.append(err)
+        n += 1
+        if n >= chunk_rows:
+            yield RowChunk(cols, n, errores)
+            cols, errores, n = _empty_columns(features), [], 0
+
+    if n:
+        yield RowChunk(cols, n, errores)
+
+
+def valid_subset(chunk: RowChunk) -> Tuple[Dict[str, list], int, List[int]]:
+    """Columnas solo con las filas sin error, más sus posiciones dentro del bloque."""
+    ok = [i for i, e in enumerate(chunk.errores) if e is None]
+    if len(ok) == chunk.n:
+        return chunk.columnas, chunk.n, ok
+    return {c: [v[i] for i in ok] for c, v in chunk.columnas.items()}, len(ok), ok
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse cuyo generador sigue leyendo el cuerpo del request.
+    La versión estándar (ASGI < 2.4) lanza una tarea que consume `receive()` para detectar
+    desconexiones y se "come" el cuerpo; aquí solo se envía: una desconexión aparece como
+    ClientDisconnect al leer `request.stream()`.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,5 @@
+# ia_service/bench — benchmarks reproducibles (desde ia_service/):
+#   python -m bench.dataset [filas] [salida.csv]   CSV sintético tipo consumo_mx
+#   python -m bench.fixture [csv] [dir_modelo]      modelo chico de reemplazo (.pkl + compilado)
+#   python -m bench.run [filas]                     todo: datos, fixture, builders y API -> JSON
+# Los resultados se comparan contra una línea base guardada (ver bench/run.py).
@@ -0,0 +1,82 @@
+# ia_service/bench/api.py
+# Benchmarks de la API en proceso (TestClient, sin red): /predict, /predict_batch con varios
+# tamaños de lote y los endpoints de caché. La configuración de app.main se lee del entorno al
+# importar, así que bench/run.py lo corre en un proceso nuevo por motor:
+#   MODEL_PATH=... TRAIN_COLUMNS_PATH=... COMPILED_MODEL_DIR=... DASH_CACHE=... \
+#   MODEL_ENGINE=compiled python -m bench.api [repeticiones]
+import json, os, sys, time
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from bench.dataset import DIAS_SEMANA, ESTADOS, MUNICIPIOS  # noqa: E402
+
+REPEAT = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv("BENCH_REPEAT", "200"))
+BATCH_SIZES = [1, 10, 100, 1000]
+CACHE_ENDPOINTS = {
+    "dash_cards": "/dash/cards",
+    "dash_historico": "/dash/historico?limit=100",
+    "mineria_cache": "/mineria_cache",
+    "mineria_anomalias": "/mineria/anomalias",
+    "mineria_query": "/mineria/query?agrupar=dia",
+}
+
+
+def _registros(n: int, rng) -> list:
+    c = np.round(rng.gamma(1.2, 0.3, n), 3)
+    return [{
+        "consumo_kwh": float(a), "consumo_pico": round(float(a) * 1.5, 3), "promedio_hora": round(float(a) * 0.9, 3),
+        "costo_estimado": round(float(a) * 3.0, 2), "estado": ESTADOS[e], "hora_dia": f"{h:02d}:00",
+        "dia_semana": DIAS_SEMANA[d], "casa_id": MUNICIPIOS[m], "modo_ecologico_activado": int(eco),
+    } for a, e, h, d, m, eco in zip(c, rng.integers(0, len(ESTADOS), n), rng.integers(0, 24, n),
+                                    rng.integers(0, 7, n), rng.integers(0, len(MUNICIPIOS), n), rng.integers(0, 2, n))]
+
+
+def _timed(call, repeat: int) -> np.ndarray:
+    """ms por llamada (la primera es de calentamiento y no cuenta)."""
+    r = call()
+    if r.status_code != 200:
+        raise RuntimeError(f"{r.request.url}: HTTP {r.status_code} {r.text[:200]}")
+    out = np.empty(repeat)
+    for i in range(repeat):
+        t = time.perf_counter()
+        call()
+        out[i] = (time.perf_counter() - t) * 1e3
+    return out
+
+
+def run(repeat: int = REPEAT) -> dict:
+    from fastapi.testclient import TestClient
+    from app import main
+
+    main.model_ready.wait(120)
+    if not main.MODEL_OK:
+        raise RuntimeError(f"Modelo no disponible: {main.MODEL_MSG}")
+    engine = type(main.model).__name__
+    c = TestClient(main.app)
+    rng = np.random.default_rng(0)
+    out = {}
+
+    one = _registros(1, rng)[0]
+    ms = _timed(lambda: c.post("/predict", json=one), repeat)
+    out["predict.p50_ms"], out["predict.p95_ms"] = np.percentile(ms, 50), np.percentile(ms, 95)
+
+    for n in BATCH_SIZES:
+        body = {"registros": _registros(n, rng)}
+        ms = _timed(lambda: c.post("/predict_batch", json=body), max(5, repeat * 10 // (10 + n)))
+        out[f"predict_batch.{n}.p50_ms"] = np.percentile(ms, 50)
+        out[f"predict_batch.{n}.filas_s"] = n / np.percentile(ms, 50) * 1e3
+
+    for name, url in CACHE_ENDPOINTS.items():
+        ms = _timed(lambda: c.get(url, headers={"Accept-Encoding": "gzip"}), repeat)
+        out[f"cache.{name}.p50_ms"] = np.percentile(ms, 50)
+
+    return {"motor": engine, "metricas": {k: round(float(v), 4) for k, v in out.items()}}
+
+
+def main():
+    print("BENCH " + json.dumps(run()))
+
+
+if __name__ == "__main__":
+    main()
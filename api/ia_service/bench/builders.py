@@ -0,0 +1,62 @@
+# ia_service/bench/builders.py
+# Corre cada builder de tools/ en un proceso nuevo (como en producción) y mide tiempo total,
+# filas/s y pico de RSS del propio proceso. Cada caso escribe en su propio directorio de salida.
+import json, os, subprocess, sys
+from pathlib import Path
+
+TOOLS = Path(__file__).resolve().parents[1] / "tools"
+
+# nombre -> (script, variables de entorno extra, salida relativa al directorio de trabajo).
+# {csv} y {out} se reemplazan por las rutas del caso; dashboard_full + mineria dejan en cache/ el
+# mismo árbol que lee la API (DASH_CACHE y DASH_CACHE/mineria).
+CASES = {
+    "dashboard_full": ("build_dashboard_cache.py", {"DASH_CSV_PATH": "{csv}", "DASH_OUT_DIR": "{out}", "DASH_MODE": "full"}, "cache"),
+    "dashboard_stream": ("build_dashboard_cache.py", {"DASH_CSV_PATH": "{csv}", "DASH_OUT_DIR": "{out}", "DASH_MODE": "stream"}, "dashboard_stream"),
+    "mineria": ("build_mineria_cache.py", {"MINERIA_CSV_PATH": "{csv}", "MINERIA_OUT_DIR": "{out}",
+                                           "MINERIA_WORKERS": "1", "MINERIA_INCREMENTAL": "0"}, "cache/mineria"),
+    # dashboard (stream) + mineria en una sola lectura del CSV: comparar con la suma de los dos
+    "unificado": ("build_cache.py", {"BUILD_CSV_PATH": "{csv}", "BUILD_OUT_DIR": "{out}", "BUILD_AGGREGATORS": "",
+                                     "MINERIA_WORKERS": "1"}, "unificado"),
+}
+
+# Se ejecuta en el proceso del builder: corre el script como __main__ y reporta su propio pico de RSS
+PROBE = r"""
+import json, resource, runpy, sys, time
+script = sys.argv[1]
+sys.path.insert(0, sys.argv[2])
+sys.argv = [script]
+t0 = time.perf_counter()
+runpy.run_path(script, run_name="__main__")
+secs = time.perf_counter() - t0
+try:   # VmHWM es del proceso actual; ru_maxrss en Linux arrastra el pico del padre tras fork
+    with open("/proc/self/status") as f:
+        rss = next(int(l.split()[1]) for l in f if l.startswith("VmHWM:")) / 1024
+except OSError:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print("BENCH " + json.dumps({"segundos": secs, "rss_mb": rss}))
+"""
+
+
+def run_builder(name: str, csv: Path, work: Path) -> dict:
+    script, env_extra, out_rel = CASES[name]
+    out = work / out_rel
+    env = {**os.environ, "COLUMNAR_DIR": "", "PYTHONWARNINGS": "ignore"}
+    env.update({k: v.format(csv=csv, out=out) for k, v in env_extra.items()})
+    proc = subprocess.run([sys.executable, "-c", PROBE, str(TOOLS / script), str(TOOLS)],
+                          env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{name} falló:\n{proc.stderr[-2000:]}")
+    line = next(l for l in reversed(proc.stdout.splitlines()) if l.startswith("BENCH "))
+    return json.loads(line[len("BENCH "):])
+
+
+def run_all(csv: Path, work: Path, n_rows: int) -> dict:
+    """Métricas planas {nombre: valor} de todos los casos."""
+    out = {}
+    for name in CASES:
+        r = run_builder(name, csv, work)
+        out[f"builders.{name}.segundos"] = round(r["segundos"], 3)
+        out[f"builders.{name}.filas_s"] = round(n_rows / r["segundos"])
+        out[f"builders.{name}.rss_mb"] = round(r["rss_mb"], 1)
+        print(f"🏗️  {name:<18} {r['segundos']:7.2f}s | {n_rows / r['segundos']:>10,.0f} filas/s | RSS {r['rss_mb']:6.0f} MB")
+    return out
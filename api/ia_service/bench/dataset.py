@@ -0,0 +1,81 @@
+# ia_service/bench/dataset.py
+# CSV sintético con las columnas reales de consumo_mx (timestamp / fecha / hora_dia, casa_id sobre
+# MUNICIPIOS, consumo_kwh, costo_mx, estado, ...). Misma semilla -> mismo archivo, byte a byte.
+# Se escribe por bloques: la memoria no depende del número de filas.
+#   python -m bench.dataset [filas] [salida.csv]
+import os, sys, time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# Mismas listas que app/main.py (no se importa para no cargar la API)
+ESTADOS = ["activo", "inactivo", "sin conexión", "suministro cortado"]
+P_ESTADOS = [0.85, 0.05, 0.05, 0.05]
+DIAS_SEMANA = ["lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo"]
+MUNICIPIOS = [
+    "Puebla","Tehuacán","San Martín Texmelucan","San Pedro Cholula","San Andrés Cholula",
+    "Atlixco","Cuautlancingo","Huejotzingo","Amozoc","Tecamachalco","Xicotepec","Zacatlán","Huauchinango"
+]
+COLUMNS = ["timestamp", "fecha", "hora_dia", "casa_id", "consumo_kwh", "estado", "dia_semana",
+           "costo_mx", "costo_estimado", "consumo_pico", "promedio_hora", "modo_ecologico_activado"]
+
+START = np.datetime64("2019-09-01T00", "h")
+DAYS = int(os.getenv("BENCH_DAYS", "182"))
+BLOCK_ROWS = 500_000
+TARIFA = 3.1           # costo_mx = consumo_kwh * TARIFA
+
+
+def _block(rng, hours: np.ndarray) -> pd.DataFrame:
+    n = len(hours)
+    # hay DAYS*24 horas distintas: se formatean solo los valores únicos
+    u, inv = np.unique(hours, return_inverse=True)
+    ts = pd.DatetimeIndex(START + u.astype("timedelta64[h]"))
+    take = lambda arr: np.asarray(arr, dtype=object)[inv]
+    muni = rng.integers(0, len(MUNICIPIOS), n)
+    # perfil diario por hora + nivel por municipio, con ruido gamma
+    hora = (u % 24)[inv]
+    perfil = 0.6 + 0.5 * np.sin((hora - 6) / 24 * 2 * np.pi).clip(0) + 0.05 * muni
+    consumo = np.round(rng.gamma(1.2, 0.25, n) * perfil, 3)
+    df = pd.DataFrame({
+        "timestamp": take(ts.strftime("%Y-%m-%d %H:%M:%S")),
+        "fecha": take(ts.strftime("%Y-%m-%d")),
+        "hora_dia": take(ts.strftime("%H:%M")),
+        "casa_id": np.asarray(MUNICIPIOS, dtype=object)[muni],
+        "consumo_kwh": consumo,
+        "estado": np.asarray(ESTADOS, dtype=object)[rng.choice(len(ESTADOS), n, p=P_ESTADOS)],
+        "dia_semana": take(np.asarray(DIAS_SEMANA, dtype=object)[ts.dayofweek]),
+        "costo_mx": np.round(consumo * TARIFA, 4),
+        "costo_estimado": np.where(rng.random(n) < 0.1, np.nan, np.round(consumo * 3.0, 2)),
+        "consumo_pico": np.round(consumo * 1.5, 3),
+        "promedio_hora": np.round(consumo * 0.9, 3),
+        "modo_ecologico_activado": rng.integers(0, 2, n),
+    })
+    return df[COLUMNS]
+
+
+def generate(n_rows: int, out: Path, seed: int = 0) -> Path:
+    """Escribe `n_rows` filas ordenadas por timestamp en `out` (tmp + replace)."""
+    out = Path(out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    hours = np.sort(rng.integers(0, DAYS * 24, n_rows))
+    tmp = out.with_name(out.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        for i, s in enumerate(range(0, n_rows, BLOCK_ROWS)):
+            _block(rng, hours[s:s + BLOCK_ROWS]).to_csv(f, index=False, header=(i == 0))
+        if n_rows == 0:
+            f.write(",".join(COLUMNS) + "\n")
+    os.replace(tmp, out)
+    return out
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    out = Path(sys.argv[2] if len(sys.argv) > 2 else f"bench/work/consumo_mx_{n_rows}.csv")
+    t0 = time.perf_counter()
+    generate(n_rows, out)
+    print(f"✅ {n_rows:,} filas -> {out} ({out.stat().st_size / 1e6:0.1f} MB) en {time.perf_counter() - t0:0.1f}s")
+
+
+if __name__ == "__main__":
+    main()
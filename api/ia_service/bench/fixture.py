@@ -0,0 +1,67 @@
+# ia_service/bench/fixture.py
+# Modelo chico de reemplazo para los benchmarks de la API: RandomForest multi-salida entrenado con
+# una muestra del CSV sintético (objetivo: siguiente consumo / costo del mismo municipio), con las
+# mismas features y el mismo get_dummies que usa app/main.py. Escribe en <dir>:
+#   modelo.pkl, train_columns.json, compilado/ (app/forest.py)
+#   python -m bench.fixture [csv] [dir_modelo]
+import json, sys, time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.forest import export_forest  # noqa: E402
+
+# Mismas listas que app/main.py
+FEATURES_NUM = ["consumo_kwh", "consumo_pico", "promedio_hora", "costo_estimado"]
+FEATURES_CAT = ["estado", "hora_dia", "dia_semana", "casa_id", "modo_ecologico_activado"]
+
+TRAIN_ROWS = 20_000
+N_ESTIMATORS = 30
+MAX_DEPTH = 12
+
+
+def train_model(csv: Path, out_dir: Path, n_rows: int = TRAIN_ROWS, seed: int = 0) -> dict:
+    """Entrena, guarda .pkl + train_columns.json + bosque compilado; devuelve rutas y tiempos."""
+    import joblib
+    from sklearn.ensemble import RandomForestRegressor
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    df = pd.read_csv(csv, nrows=n_rows + 1000, low_memory=False)
+    nxt = df.groupby("casa_id", sort=False)[["consumo_kwh", "costo_mx"]].shift(-1)
+    df = df[nxt.notna().all(axis=1)].head(n_rows)
+    y = nxt.loc[df.index].to_numpy(dtype=np.float64)
+
+    feats = df[FEATURES_NUM + FEATURES_CAT].copy()
+    for c in FEATURES_NUM:
+        feats[c] = pd.to_numeric(feats[c], errors="coerce").fillna(0.0)
+    X = pd.get_dummies(feats, drop_first=True)
+    columns = list(X.columns)
+
+    t0 = time.perf_counter()
+    model = RandomForestRegressor(n_estimators=N_ESTIMATORS, max_depth=MAX_DEPTH, random_state=seed, n_jobs=1)
+    model.fit(X.to_numpy(dtype=np.float64), y)
+    t_fit = time.perf_counter() - t0
+
+    joblib.dump(model, out_dir / "modelo.pkl")
+    (out_dir / "train_columns.json").write_text(json.dumps(columns, ensure_ascii=False), encoding="utf-8")
+    export_forest(model, out_dir / "compilado", columns)
+    return {
+        "model_path": str(out_dir / "modelo.pkl"),
+        "train_columns_path": str(out_dir / "train_columns.json"),
+        "compiled_dir": str(out_dir / "compilado"),
+        "n_columnas": len(columns),
+        "fit_segundos": round(t_fit, 3),
+    }
+
+
+def main():
+    csv = Path(sys.argv[1] if len(sys.argv) > 1 else "bench/work/consumo_mx_2000000.csv")
+    out = Path(sys.argv[2] if len(sys.argv) > 2 else "bench/work/modelo")
+    info = train_model(csv, out)
+    print(f"✅ Modelo de prueba en {out} | {info['n_columnas']} columnas | fit {info['fit_segundos']}s")
+
+
+if __name__ == "__main__":
+    main()
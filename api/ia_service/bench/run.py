@@ -0,0 +1,132 @@
+# ia_service/bench/run.py
+# Suite completa: CSV sintético -> modelo de prueba -> builders -> API (un proceso por motor).
+# Escribe las métricas en JSON y las compara contra la línea base versionada (bench/baseline.json,
+# generada con el dataset sintético por defecto); sale con código 1 si alguna empeoró más que el
+# umbral o si no hay línea base.
+#   python -m bench.run [filas]                          (desde ia_service/)
+# Variables:
+#   BENCH_DIR            datos y salidas intermedias (bench/work; el CSV se reutiliza por tamaño)
+#   BENCH_RESULTS        resultado de esta corrida (bench/results/ultimo.json)
+#   BENCH_BASELINE       línea base (bench/baseline.json); BENCH_SAVE_BASELINE=1 la reemplaza
+#   BENCH_THRESHOLD      empeoramiento relativo tolerado (0.25); la base puede traer "umbrales"
+#                        por prefijo de métrica, p. ej. {"api.": 0.4}
+#   BENCH_ENGINES        motores para la API (sklearn,compiled)
+#   BENCH_ONLY           builders | api (por defecto ambos)
+import json, os, platform, subprocess, sys, time
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from bench import builders  # noqa: E402
+from bench.dataset import generate  # noqa: E402
+from bench.fixture import train_model  # noqa: E402
+
+N_ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv("BENCH_ROWS", "2000000"))
+WORK = Path(os.getenv("BENCH_DIR", str(ROOT / "bench" / "work"))).resolve()
+RESULTS = Path(os.getenv("BENCH_RESULTS", str(ROOT / "bench" / "results" / "ultimo.json"))).resolve()
+BASELINE = Path(os.getenv("BENCH_BASELINE", str(ROOT / "bench" / "baseline.json"))).resolve()
+THRESHOLD = float(os.getenv("BENCH_THRESHOLD", "0.25"))
+SAVE_BASELINE = os.getenv("BENCH_SAVE_BASELINE", "0") == "1"
+ENGINES = [e for e in os.getenv("BENCH_ENGINES", "sklearn,compiled").split(",") if e]
+ONLY = os.getenv("BENCH_ONLY", "")
+
+# Diferencias absolutas por debajo de esto son ruido y no cuentan como regresión
+MIN_ABS = {"_ms": 0.2, ".segundos": 0.25, ".rss_mb": 10.0}
+
+
+def _env_info() -> dict:
+    import numpy, pandas, sklearn
+    return {"python": platform.python_version(), "plataforma": platform.platform(), "cpus": os.cpu_count(),
+            "numpy": numpy.__version__, "pandas": pandas.__version__, "sklearn": sklearn.__version__}
+
+
+def _api(engine: str, model_dir: Path, cache_dir: Path) -> dict:
+    env = {**os.environ, "PYTHONWARNINGS": "ignore", "MODEL_ENGINE": engine, "STARTUP_MODE": "eager",
+           "MICROBATCH": "0", "MODEL_PATH": str(model_dir / "modelo.pkl"),
+           "TRAIN_COLUMNS_PATH": str(model_dir / "train_columns.json"),
+           "COMPILED_MODEL_DIR": str(model_dir / "compilado"), "DASH_CACHE": str(cache_dir)}
+    proc = subprocess.run([sys.executable, "-m", "bench.api"], cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"API ({engine}) falló:\n{proc.stderr[-2000:]}")
+    line = next(l for l in reversed(proc.stdout.splitlines()) if l.startswith("BENCH "))
+    r = json.loads(line[len("BENCH "):])
+    m = r["metricas"]
+    print(f"🌐 {engine:<9} ({r['motor']}) /predict p50 {m['predict.p50_ms']:.2f} ms | "
+          f"lote 1000: {m['predict_batch.1000.filas_s']:,.0f} filas/s | /mineria_cache p50 {m['cache.mineria_cache.p50_ms']:.2f} ms")
+    return {f"api.{engine}.{k}": v for k, v in m.items()}
+
+
+def _worse(name: str, base: float, new: float) -> float:
+    """Empeoramiento relativo (>0 = peor); filas_s es mayor-mejor, el resto menor-mejor."""
+    if not base:
+        return 0.0
+    return (base - new) / base if name.endswith("filas_s") else (new - base) / base
+
+
+def compare(current: dict, baseline: dict) -> list:
+    """Lista de (métrica, base, actual, empeoramiento) que superan su umbral."""
+    umbrales = baseline.get("umbrales", {})
+    out = []
+    for name, base in baseline["metricas"].items():
+        if name not in current:
+            continue
+        new = current[name]
+        limit = max((v for p, v in umbrales.items() if name.startswith(p)), default=THRESHOLD)
+        floor = next((v for suf, v in MIN_ABS.items() if name.endswith(suf)), 0.0)
+        w = _worse(name, base, new)
+        if w > limit and abs(new - base) > floor:
+            out.append((name, base, new, w))
+    return out
+
+
+def main():
+    t0 = time.perf_counter()
+    WORK.mkdir(parents=True, exist_ok=True)
+    csv = WORK / f"consumo_mx_{N_ROWS}.csv"
+    if not csv.exists():
+        print(f"📦 Generando {N_ROWS:,} filas -> {csv}")
+        generate(N_ROWS, csv)
+    model_dir = WORK / f"modelo_{N_ROWS}"
+    if not (model_dir / "compilado" / "meta.json").exists():
+        info = train_model(csv, model_dir)
+        print(f"🌲 Modelo de prueba: {info['n_columnas']} columnas, fit {info['fit_segundos']}s")
+
+    metricas = {}
+    if ONLY in ("", "builders"):
+        metricas.update(builders.run_all(csv, WORK, N_ROWS))
+    if ONLY in ("", "api"):
+        if not (WORK / "cache" / "mineria" / "meta.json").exists() and not (WORK / "cache" / "cards.json").exists():
+            builders.run_all(csv, WORK, N_ROWS)   # la API necesita las salidas de los builders
+        for engine in ENGINES:
+            metricas.update(_api(engine, model_dir, WORK / "cache"))
+
+    result = {"fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"), "filas": N_ROWS,
+              "entorno": _env_info(), "metricas": metricas}
+    RESULTS.parent.mkdir(parents=True, exist_ok=True)
+    RESULTS.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"📝 Resultados: {RESULTS} ({time.perf_counter() - t0:0.0f}s)")
+
+    if SAVE_BASELINE:
+        prev = json.loads(BASELINE.read_text(encoding="utf-8")) if BASELINE.exists() else {}
+        BASELINE.write_text(json.dumps({**result, "umbrales": prev.get("umbrales", {})}, ensure_ascii=False, indent=2),
+                            encoding="utf-8")
+        print(f"📌 Línea base guardada en {BASELINE}")
+        return
+    if not BASELINE.exists():
+        print(f"❌ Sin línea base en {BASELINE}: no hay contra qué comparar (BENCH_SAVE_BASELINE=1 para guardarla)")
+        sys.exit(1)
+
+    baseline = json.loads(BASELINE.read_text(encoding="utf-8"))
+    if baseline.get("filas") != N_ROWS or baseline.get("entorno", {}).get("cpus") != os.cpu_count():
+        print("⚠️  La línea base es de otro tamaño de datos o de otra máquina; la comparación es orientativa")
+    bad = compare(metricas, baseline)
+    for name, base, new, w in bad:
+        print(f"❌ {name}: {base:,.4g} -> {new:,.4g} ({w:+.0%})")
+    if bad:
+        sys.exit(1)
+    print(f"✅ Sin regresiones contra {BASELINE.name} ({len(baseline['metricas'])} métricas)")
+
+
+if __name__ == "__main__":
+    main()
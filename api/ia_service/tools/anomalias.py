@@ -0,0 +1,144 @@
+# ia_service/tools/anomalias.py
+# Anomalías por grupo (casa_id, hora) en una sola pasada y vectorizadas:
+#   - línea base por grupo: n / media / M2 (Welford por bloque + unión de Chan)
+#   - candidatos por grupo: los K valores más altos y los K más bajos (con timestamp)
+# Al final el z de cada candidato se calcula con la línea base FINAL del grupo. Los de mayor |z|
+# de un grupo son siempre sus extremos, así que el top-N global (N <= K) es exacto.
+# Conteo por grupo: exacto con los candidatos mientras no se saturen (el K-ésimo ya no es
+# anomalía); si se saturan, se usa el conteo "corrido" (cada chunk contra la base acumulada).
+# Mismo contrato que tools/sketches.py: update / merge / to_json / from_json.
+import numpy as np
+import pandas as pd
+
+KEYS = ["casa", "hora"]
+NAT = np.iinfo(np.int64).min
+
+
+class GroupedAnomalies:
+    """Línea base y candidatos por (casa, hora); `result` arma el contenido de anomalias.json."""
+
+    def __init__(self, k: int = 100, z_threshold: float = 3.0):
+        self.k = int(k)
+        self.z = float(z_threshold)
+        self.stats = pd.DataFrame({"n": [], "mean": [], "m2": [], "corrido": []},
+                                  index=pd.MultiIndex.from_arrays([[], []], names=KEYS))
+        self.cand = pd.DataFrame({"casa": pd.Series(dtype=object), "hora": pd.Series(dtype=np.int64),
+                                  "ts": pd.Series(dtype=np.int64), "valor": pd.Series(dtype=float)})
+
+    # ---------- acumulación ----------
+    def _combine(self, other: pd.DataFrame):
+        """Chan por grupo, alineando índices (grupos nuevos entran con n=0)."""
+        a, b = self.stats.align(other, join="outer", fill_value=0.0)
+        n = a["n"] + b["n"]
+        d = b["mean"] - a["mean"]
+        safe = n.where(n > 0, 1.0)
+        self.stats = pd.DataFrame({
+            "n": n,
+            "mean": a["mean"] + d * b["n"] / safe,
+            "m2": a["m2"] + b["m2"] + d * d * a["n"] * b["n"] / safe,
+            "corrido": a["corrido"] + b["corrido"],
+        })
+
+    def _extremes(self, gid: np.ndarray, valor: np.ndarray) -> np.ndarray:
+        """Índices de los K más bajos y los K más altos de cada grupo (gid = código entero de grupo)."""
+        order = np.lexsort((valor, gid))
+        g = gid[order]
+        starts = np.r_[0, np.flatnonzero(np.diff(g)) + 1]
+        sizes = np.diff(np.r_[starts, len(g)])
+        rank = np.arange(len(g)) - np.repeat(starts, sizes)
+        return order[(rank < self.k) | (rank >= np.repeat(sizes, sizes) - self.k)]
+
+    def _keep_extremes(self, cand: pd.DataFrame):
+        gid = pd.MultiIndex.from_frame(cand[KEYS]).factorize()[0] if len(cand) else np.empty(0, np.intp)
+        self.cand = cand.iloc[np.sort(self._extremes(gid, cand["valor"].to_numpy()))].reset_index(drop=True)
+
+    def update(self, casa, hora, ts, valor):
+        """Filas de un chunk: casa_id, hora 0-23, timestamp (ns int64) y consumo (float)."""
+        codes, uniq = pd.factorize(np.asarray(casa, dtype=object))
+        hora = np.asarray(hora, dtype=np.int64)
+        valor = np.asarray(valor, dtype=float)
+        ok = (codes >= 0) & np.isfinite(valor)
+        if not ok.any():
+            return
+        codes, hora, valor, ts = codes[ok], hora[ok], valor[ok], np.asarray(ts, dtype=np.int64)[ok]
+
+        # grupos del chunk como enteros: código de casa * 24 + hora
+        u, inv = np.unique(codes.astype(np.int64) * 24 + hora, return_inverse=True)
+        n = np.bincount(inv).astype(float)
+        mean = np.bincount(inv, weights=valor) / n
+        m2 = np.bincount(inv, weights=(valor - mean[inv]) ** 2)
+        index = pd.MultiIndex.from_arrays([np.asarray(uniq, dtype=object)[u // 24].astype(str), u % 24], names=KEYS)
+        self._combine(pd.DataFrame({"n": n, "mean": mean, "m2": m2, "corrido": 0.0}, index=index))
+
+        # conteo corrido: filas del chunk contra la base acumulada (incluye el chunk)
+        base = self.stats.loc[index]
+        sd = np.sqrt(base["m2"].to_numpy() / base["n"].to_numpy())
+        z = np.abs(valor - base["mean"].to_numpy()[inv]) / np.where(sd > 0, sd, np.inf)[inv]
+        self.stats.loc[index, "corrido"] += np.bincount(inv, weights=z >= self.z, minlength=len(u))
+
+        # candidatos: primero los extremos del chunk (barato), luego contra los guardados
+        sel = self._extremes(inv, valor)
+        part = pd.DataFrame({"casa": index.get_level_values(0)[inv[sel]].to_numpy(dtype=object),
+                             "hora": hora[sel], "ts": ts[sel], "valor": valor[sel]})
+        self._keep_extremes(pd.concat([self.cand, part], ignore_index=True))
+
+    def merge(self, other: "GroupedAnomalies") -> "GroupedAnomalies":
+        self._combine(other.stats)
+        self._keep_extremes(pd.concat([self.cand, other.cand], ignore_index=True))
+        return self
+
+    # ---------- resultado ----------
+    def result(self, top_n: int = 100, min_n: int = 30) -> dict:
+        st = self.stats[self.stats["n"] >= min_n].copy()
+        st["desv"] = np.sqrt(st["m2"] / st["n"])
+        c = self.cand.join(st[["n", "mean", "desv"]], on=KEYS, how="inner")
+        c["z"] = (c["valor"] - c["mean"]) / c["desv"].where(c["desv"] > 0, np.inf)
+        c["abs_z"] = c["z"].abs()
+        anom = c[c["abs_z"] >= self.z]
+
+        # conteo exacto salvo que algún lado (altos/bajos) tenga K candidatos todos anómalos
+        hi = anom[anom["z"] > 0].groupby(KEYS).size()
+        lo = anom[anom["z"] < 0].groupby(KEYS).size()
+        exact = anom.groupby(KEYS).size()
+        st["exacto_n"] = exact.reindex(st.index, fill_value=0)
+        sat = (hi.reindex(st.index, fill_value=0) >= self.k) | (lo.reindex(st.index, fill_value=0) >= self.k)
+        st["anomalias"] = np.where(sat, np.maximum(st["corrido"], st["exacto_n"]), st["exacto_n"]).astype(int)
+        st["exacto"] = ~sat
+
+        top = anom.sort_values(["abs_z", "ts"], ascending=[False, True], kind="stable").head(top_n)
+        top_rows = [{
+            "timestamp": pd.Timestamp(int(r.ts)).strftime("%Y-%m-%d %H:%M:%S") if r.ts != NAT else None,
+            "municipio": r.casa, "hora": int(r.hora), "valor": round(float(r.valor), 4),
+            "z": round(float(r.z), 3), "media": round(float(r.mean), 4), "desv": round(float(r.desv), 4),
+        } for r in top.itertuples(index=False)]
+
+        grupos = st.sort_values("anomalias", ascending=False, kind="stable").reset_index()
+        return {
+            "z_threshold": self.z,
+            "min_n": int(min_n),
+            "total_anomalias": int(st["anomalias"].sum()),
+            "top": top_rows,
+            "grupos": [{
+                "municipio": r.casa, "hora": int(r.hora), "n": int(r.n), "media": round(float(r.mean), 4),
+                "desv": round(float(r.desv), 4), "anomalias": int(r.anomalias), "exacto": bool(r.exacto),
+            } for r in grupos.itertuples(index=False)],
+        }
+
+    # ---------- JSON (checkpoints) ----------
+    def to_json(self) -> dict:
+        st = self.stats.reset_index()
+        return {"k": self.k, "z": self.z,
+                "stats": {c: st[c].tolist() for c in st.columns},
+                "cand": {c: self.cand[c].tolist() for c in self.cand.columns}}
+
+    @classmethod
+    def from_json(cls, d: dict) -> "GroupedAnomalies":
+        a = cls(d["k"], d["z"])
+        st = pd.DataFrame(d["stats"])
+        if len(st):
+            st["casa"] = st["casa"].astype(object)
+            a.stats = st.set_index(KEYS)[["n", "mean", "m2", "corrido"]].astype(float)
+        cand = pd.DataFrame(d["cand"])
+        if len(cand):
+            a.cand = cand.astype({"casa": object, "hora": np.int64, "ts": np.int64, "valor": float})
+        return a
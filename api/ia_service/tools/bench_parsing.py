@@ -0,0 +1,148 @@
+# ia_service/tools/bench_parsing.py
+# Microbenchmark del parseo de hora / día: versión por fila (la que tenía build_mineria_cache)
+# contra tools/parsing.py. Verifica que ambas den lo mismo y reporta filas/s.
+#   python tools/bench_parsing.py [filas]
+import re, sys, time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import parsing  # noqa: E402
+from parsing import EN_ES, DOW_MAP, DIAS_ORDEN, NAT  # noqa: E402
+
+N_ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+REPEAT = 3
+
+
+# ===================== Referencia (por fila) =====================
+_time_re = re.compile(r"^\s*(\d{1,2})(?::(\d{1,2}))?")
+
+def old_coerce_time_str(s: pd.Series) -> pd.Series:
+    if pd.api.types.is_numeric_dtype(s):
+        hh = s.astype("Int64").astype(object)
+        return hh.apply(lambda v: f"{int(v):02d}:00" if pd.notna(v) else np.nan)
+    s = s.astype(str)
+
+    def _one(x: str):
+        m = _time_re.match(x)
+        if not m:
+            return np.nan
+        hh = int(m.group(1))
+        mm = int(m.group(2)) if m.group(2) is not None else 0
+        if 0 <= hh <= 23 and 0 <= mm <= 59:
+            return f"{hh:02d}:{mm:02d}"
+        return np.nan
+
+    return s.map(_one)
+
+def old_normalize_dow(series: pd.Series, dt_col: pd.Series) -> pd.Series:
+    if series is not None and series.notna().any():
+        s = (series.astype(str)
+             .str.normalize('NFKD')
+             .str.encode('ascii', errors='ignore')
+             .str.decode('utf-8')
+             .str.strip()
+             .str.lower())
+        s = s.map(lambda x: EN_ES.get(x, x))
+        mask_na = s.isna() | (s == "") | (~s.isin(DIAS_ORDEN))
+        if mask_na.any():
+            s.loc[mask_na] = dt_col.loc[mask_na].dt.dayofweek.map(DOW_MAP)
+        return s
+    return dt_col.dt.dayofweek.map(DOW_MAP)
+
+def _old_hours_fecha(df, col):
+    hhmm = old_coerce_time_str(df[col])
+    dt = pd.to_datetime(df["fecha"].astype(str).str.strip() + " " + hhmm.astype(str), errors="coerce")
+    return dt.dt.hour
+
+def old_chunk_dt(df: pd.DataFrame):
+    cand = []
+    if "timestamp" in df.columns and pd.api.types.is_datetime64_any_dtype(df["timestamp"]):
+        cand.append(("timestamp", df["timestamp"].dt.hour))
+    for col in ("hora_dia", "hora"):
+        if "fecha" in df.columns and col in df.columns:
+            cand.append((f"fecha+{col}", _old_hours_fecha(df, col)))
+    clean = []
+    for name, hrs in cand:
+        mask = hrs.notna()
+        if mask.any():
+            hrs2 = hrs.loc[mask].astype(int)
+            clean.append((name, hrs2, (hrs2 == 0).mean()))
+    clean.sort(key=lambda t: t[2])
+    name, hours, _ = clean[0]
+    if name == "timestamp":
+        dt = df.loc[hours.index, "timestamp"]
+    else:
+        hhmm = hours.astype(int).astype(str).str.zfill(2) + ":00"
+        dt = pd.to_datetime(df.loc[hours.index, "fecha"].astype(str).str.strip() + " " + hhmm, errors="coerce")
+    return dt.loc[dt.notna()]
+
+
+# ===================== Nueva =====================
+def new_chunk_dt(df: pd.DataFrame):
+    dt_ns = parsing.chunk_datetimes(df, parsing.pick_hour_source(df.head(20000)))
+    ok = dt_ns != NAT
+    return pd.Series(dt_ns[ok].view("datetime64[ns]"), index=df.index[ok])
+
+
+# ===================== Datos =====================
+def _sample(n: int, rng) -> pd.DataFrame:
+    dias = pd.date_range("2020-01-01", periods=400, freq="D")
+    fecha = dias[rng.integers(0, len(dias), n)]
+    h = rng.integers(0, 24, n)
+    hora_dia = np.array([f"{x:02d}:00" for x in range(24)] + ["7", "7:30 ", "x", "25:00"], dtype=object)
+    # hora_dia con ruido: 2% inválidas y 5% en "00:00" (por eso la heurística prefiere otra fuente)
+    r = rng.random(n)
+    hd = hora_dia[np.where(r < 0.02, rng.integers(24, 28, n), np.where(r < 0.07, 0, h))]
+    names = np.array(DIAS_ORDEN + ["Monday", "SUNDAY", " miercoles ", "", "??"], dtype=object)
+    dow = names[rng.integers(0, len(names), n)]
+    return pd.DataFrame({
+        "timestamp": fecha + pd.to_timedelta(h, unit="h"),
+        "fecha": fecha.strftime("%Y-%m-%d"),
+        "hora_dia": hd,
+        "hora": h.astype(float),
+        "dia_semana": dow,
+    })
+
+
+def _rate(fn, *args) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        t = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - t)
+    return N_ROWS / best
+
+
+def main():
+    rng = np.random.default_rng(0)
+    df = _sample(N_ROWS, rng)
+    dt = df["timestamp"]
+    no_ts = df.drop(columns=["timestamp"])
+
+    # Paridad
+    same = lambda a, b: a.astype(object).fillna("-").tolist() == b.astype(object).fillna("-").tolist()
+    assert same(old_coerce_time_str(df["hora_dia"]), parsing.coerce_time_str(df["hora_dia"]))
+    assert same(old_coerce_time_str(df["hora"]), parsing.coerce_time_str(df["hora"]))
+    assert same(old_normalize_dow(df["dia_semana"], dt), parsing.normalize_dow(df["dia_semana"], dt))
+    for d in (df, no_ts):
+        a, b = old_chunk_dt(d), new_chunk_dt(d)
+        assert a.index.equals(b.index) and (a.to_numpy(dtype="datetime64[ns]") == b.to_numpy()).all()
+    print(f"✅ Paridad por fila en {N_ROWS:,} filas")
+
+    cases = [
+        ("coerce_time_str (texto)", old_coerce_time_str, parsing.coerce_time_str, (df["hora_dia"],)),
+        ("coerce_time_str (num)", old_coerce_time_str, parsing.coerce_time_str, (df["hora"],)),
+        ("normalize_dow", old_normalize_dow, parsing.normalize_dow, (df["dia_semana"], dt)),
+        ("dt del chunk (timestamp)", old_chunk_dt, new_chunk_dt, (df,)),
+        ("dt del chunk (fecha+hora)", old_chunk_dt, new_chunk_dt, (no_ts,)),
+    ]
+    print(f"{'función':<28} {'antes (filas/s)':>16} {'ahora (filas/s)':>16} {'x':>7}")
+    for name, old, new, args in cases:
+        r_old, r_new = _rate(old, *args), _rate(new, *args)
+        print(f"{name:<28} {r_old:16,.0f} {r_new:16,.0f} {r_new / r_old:7.1f}")
+
+
+if __name__ == "__main__":
+    main()
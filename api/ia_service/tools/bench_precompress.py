@@ -0,0 +1,64 @@
+# ia_service/tools/bench_precompress.py
+# Bytes enviados y CPU del servidor por request en los endpoints de caché, con las salidas que ya
+# escribieron los builders en DASH_CACHE (y DASH_CACHE/mineria):
+#   antes      dict parseado -> JSONResponse (re-serializa en cada request, sin compresión)
+#   gzip vivo  lo mismo + gzip nivel 6 por request (lo que haría GZipMiddleware)
+#   precomp.   bytes de los builders tal cual (.gz / .br según Accept-Encoding)
+#   DASH_CACHE=data_cache python tools/bench_precompress.py [repeticiones]
+import gzip, sys, time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from starlette.requests import Request  # noqa: E402
+import app.main as api  # noqa: E402
+
+REPEAT = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+ENDPOINTS = {
+    "/dash/cards": api.dash_cards,
+    "/dash/mensual": api.dash_mensual,
+    "/dash/semanal": api.dash_semanal,
+    "/mineria_cache": api.mineria_cache,
+    "/mineria/anomalias": api.mineria_anomalias,
+}
+
+
+def _request(accept_encoding: str) -> Request:
+    headers = [(b"accept-encoding", accept_encoding.encode())] if accept_encoding else []
+    return Request({"type": "http", "method": "GET", "path": "/", "query_string": b"", "headers": headers})
+
+
+def _measure(fn, accept_encoding: str, precompressed: bool, live_gzip: bool = False):
+    """(bytes del cuerpo, µs de CPU por request) llamando al handler directamente."""
+    api.CACHE_PRECOMPRESSED = precompressed
+    req = _request(accept_encoding)
+    body = fn(req).body   # primera llamada: carga el archivo al caché en proceso
+    if live_gzip:
+        body = gzip.compress(body, 6)
+    t = time.process_time()
+    for _ in range(REPEAT):
+        b = fn(req).body
+        if live_gzip:
+            gzip.compress(b, 6)
+    return len(body), (time.process_time() - t) / REPEAT * 1e6
+
+
+def main():
+    print(f"Caché: {api.DASH_CACHE.resolve()} | {REPEAT} requests por caso")
+    print(f"{'endpoint':<20} {'antes':>16} {'gzip vivo':>16} {'precomp. gzip':>16} {'precomp. br':>16}")
+    for name, fn in ENDPOINTS.items():
+        try:
+            cols = [
+                _measure(fn, "", False),
+                _measure(fn, "gzip", False, live_gzip=True),
+                _measure(fn, "gzip", True),
+                _measure(fn, "br", True),
+            ]
+        except Exception as e:   # HTTPException 404: falta correr el builder
+            print(f"{name:<20} sin datos ({getattr(e, 'detail', e)})")
+            continue
+        print(f"{name:<20} " + " ".join(f"{b:>7,} B {us:>5.0f}µs" for b, us in cols))
+    print("(precomp. br = identity si no hay .br o la API no tiene brotli)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,114 +1,547 @@
 # build_dashboard_cache.py
+import os, sys, time, json, math, shutil, subprocess, tempfile
 import pandas as pd
 import numpy as np
 from pathlib import Path
+from precompress import precompress
 
 # === RUTAS (tu CSV real y salida JSON) ===
-CSV_PATH = Path(r"C:\Users\joses\OneDrive\Documentos\web_aegis-main\backend\data\consumo_mx_2M.csv")
-OUT_DIR  = Path(r"C:\Users\joses\OneDrive\Documentos\web_aegis-main\ia_service\data_cache")
+CSV_PATH = Path(os.getenv("DASH_CSV_PATH", r"C:\Users\joses\OneDrive\Documentos\web_aegis-main\backend\data\consumo_mx_2M.csv"))
+OUT_DIR  = Path(os.getenv("DASH_OUT_DIR", r"C:\Users\joses\OneDrive\Documentos\web_aegis-main\ia_service\data_cache"))
 
-OUT_DIR.mkdir(parents=True, exist_ok=True)
+# full = carga todo en memoria (original) | stream = por chunks, memoria acotada | compare = corre full
+# y stream con CHUNKSIZE y con COMPARE_CHUNKSIZE (las salidas no deben depender de los cortes)
+# Con COLUMNAR_DIR (store de tools/columnar_store.py) se leen solo las particiones recientes.
+MODE      = os.getenv("DASH_MODE", "full")
+COLUMNAR_DIR = os.getenv("COLUMNAR_DIR", "")
+CHUNKSIZE = int(os.getenv("CHUNKSIZE", "500000"))
+COMPARE_CHUNKSIZE = int(os.getenv("DASH_COMPARE_CHUNKSIZE", "7777"))
+HIST_N    = 500
+# Variantes .gz/.br de las salidas que la API sirve tal cual (historico se pagina, no se precomprime)
+PRECOMPRESS = os.getenv("CACHE_PRECOMPRESS", "1") == "1"
+OUTPUTS   = ["cards.json", "mensual.json", "semanal.json", "historico.json"]
 
-if not CSV_PATH.exists():
-    alt = CSV_PATH.with_suffix("")
-    pq  = CSV_PATH.with_suffix(".parquet")
+# Historial completo en binario de ancho fijo (historico.npy) para /dash/historico paginado;
+# historico.json (HIST_N filas) se sigue escribiendo como respaldo.
+HIST_BIN        = os.getenv("DASH_HIST_BIN", "1") == "1"
+HIST_INDEX_STEP = 4096       # una fecha cada N filas en historico_meta.json (búsqueda por rango)
+HIST_DTYPE = np.dtype([("fecha", "<i8"), ("consumo", "<f8"), ("costo", "<f8"),
+                       ("dispositivo", "<i4"), ("usuario", "<i4"), ("estado", "<i2")])
+HIST_DICTS = ["dispositivo", "usuario", "estado"]
+
+# Conjunto de columnas deseadas (algunas pueden faltar)
+DESIRED   = ["fecha", "consumo_kwh", "costo_mx", "estado", "dispositivo", "usuario"]
+HIST_COLS = ["fecha", "dispositivo", "usuario", "consumo_kwh", "costo_mx", "estado"]
+
+
+def _resolve_source(csv_path: Path) -> Path:
+    if csv_path.exists():
+        return csv_path
+    alt = csv_path.with_suffix("")
+    pq  = csv_path.with_suffix(".parquet")
     if alt.exists():
-        CSV_PATH = alt
-    elif pq.exists():
-        CSV_PATH = pq
-    else:
-        raise FileNotFoundError(f"No encontré el CSV/parquet en: {CSV_PATH}")
+        return alt
+    if pq.exists():
+        return pq
+    raise FileNotFoundError(f"No encontré el CSV/parquet en: {csv_path}")
 
-print(f"📥 Leyendo: {CSV_PATH}")
 
-# Detectar columnas disponibles en el archivo sin cargar todo
-# (leemos solo el header)
-if CSV_PATH.suffix.lower() == ".parquet":
-    # Para parquet no necesitamos usecols; cargaremos y luego normalizamos
-    available_cols = None
-else:
-    with open(CSV_PATH, "r", encoding="utf-8", errors="ignore") as f:
+def _used_columns(src: Path):
+    """Columnas a leer; None para parquet (se carga y luego se normaliza)."""
+    if src.suffix.lower() == ".parquet":
+        return None
+    # Detectar columnas disponibles en el archivo sin cargar todo (leemos solo el header)
+    with open(src, "r", encoding="utf-8", errors="ignore") as f:
         header = f.readline().strip()
-    available_cols = [c.strip() for c in header.split(",")]
+    return _pick_columns([c.strip() for c in header.split(",")])
 
-# Conjunto de columnas deseadas (algunas pueden faltar)
-desired = ["fecha", "consumo_kwh", "costo_mx", "estado", "dispositivo", "usuario"]
-
-# Filtrar usecols según existan
-if available_cols is None:
-    # parquet: no pasamos usecols, cargamos todo y luego filtramos
-    df = pd.read_parquet(CSV_PATH)
-else:
-    used = [c for c in desired if c in available_cols]
+
+def _pick_columns(available_cols: list) -> list:
+    """Columnas de DESIRED presentes en el encabezado; valida las indispensables."""
+    used = [c for c in DESIRED if c in available_cols]
     # Mínimos indispensables para el cálculo
     if "fecha" not in used or "consumo_kwh" not in used:
         raise ValueError(
             f"Tu archivo debe tener al menos 'fecha' y 'consumo_kwh'. "
             f"Encontradas: {available_cols[:10]}..."
         )
-    df = pd.read_csv(
-        CSV_PATH,
+    return used
+
+
+def _read_csv_kwargs(used: list) -> dict:
+    return dict(
         usecols=used,              # solo las que existan
         parse_dates=["fecha"],     # parseo de fecha
         dayfirst=False,
         encoding="utf-8",
-        low_memory=False
     )
 
-# Crear columnas faltantes con valores por defecto
-if "dispositivo" not in df.columns: df["dispositivo"] = "Smart Plug"
-if "usuario" not in df.columns:     df["usuario"] = "—"
-if "estado" not in df.columns:      df["estado"] = "activo"
-if "costo_mx" not in df.columns:    df["costo_mx"] = 0.0
-
-# Limpieza y tipos
-df = df.dropna(subset=["fecha", "consumo_kwh"]).copy()
-df["fecha"] = pd.to_datetime(df["fecha"], errors="coerce")
-df = df.dropna(subset=["fecha"]).copy()
-
-df["consumo_kwh"] = pd.to_numeric(df["consumo_kwh"], errors="coerce").fillna(0.0)
-df["costo_mx"]    = pd.to_numeric(df["costo_mx"], errors="coerce").fillna(0.0)
-df["estado"]      = df["estado"].astype(str).str.lower().str.strip()
-
-# ===== Cards (mes actual) =====
-hoy = df["fecha"].max()
-if pd.isna(hoy):
-    raise ValueError("No se pudo determinar la fecha máxima; revisa la columna 'fecha'.")
-
-mes_actual = df[df["fecha"].dt.to_period("M") == hoy.to_period("M")]
-consumo_mes = float(mes_actual["consumo_kwh"].sum()) if not mes_actual.empty else 0.0
-
-if not mes_actual.empty:
-    umbral = mes_actual["consumo_kwh"].quantile(0.95)
-    alertas = int((mes_actual["consumo_kwh"] > umbral).sum())
-else:
-    alertas = 0
-
-ult7 = df[df["fecha"] >= (hoy - pd.Timedelta(days=7))]
-activos = int((ult7["estado"] == "activo").sum()) if not ult7.empty else 0
-
-cards = {"consumo": round(consumo_mes, 2), "alertas": alertas, "activos": activos}
-pd.Series(cards).to_json(OUT_DIR / "cards.json", orient="index", force_ascii=False)
-
-# ===== Mensual (últimos 7) =====
-df["mes"] = df["fecha"].dt.to_period("M")
-mens = df.groupby("mes")["consumo_kwh"].sum().sort_index().tail(7)
-mensual = {"labels": [str(p) for p in mens.index.astype(str)], "data": [round(x,2) for x in mens.values]}
-pd.Series(mensual).to_json(OUT_DIR / "mensual.json", orient="index", force_ascii=False)
-
-# ===== Semanal (últimos 7 días) =====
-df["dia"] = df["fecha"].dt.date
-sem = df.groupby("dia")["consumo_kwh"].sum().sort_index().tail(7)
-semanal = {"labels": [str(d) for d in sem.index], "data": [round(x,2) for x in sem.values]}
-pd.Series(semanal).to_json(OUT_DIR / "semanal.json", orient="index", force_ascii=False)
-
-# ===== Histórico (últimos 500) =====
-hist = (df.sort_values("fecha", ascending=False)
-          .loc[:, ["fecha","dispositivo","usuario","consumo_kwh","costo_mx","estado"]]
-          .head(500)
-          .copy())
-hist["fecha"] = pd.to_datetime(hist["fecha"], errors="coerce").dt.strftime("%Y-%m-%d %H:%M:%S")
-hist.rename(columns={"consumo_kwh":"consumo","costo_mx":"costo"}, inplace=True)
-
-hist.to_json(OUT_DIR / "historico.json", orient="records", force_ascii=False)
-print(f"✅ Cache generado en: {OUT_DIR.resolve()}")
+
+def _clean(df: pd.DataFrame) -> pd.DataFrame:
+    # Crear columnas faltantes con valores por defecto
+    if "dispositivo" not in df.columns: df["dispositivo"] = "Smart Plug"
+    if "usuario" not in df.columns:     df["usuario"] = "—"
+    if "estado" not in df.columns:      df["estado"] = "activo"
+    if "costo_mx" not in df.columns:    df["costo_mx"] = 0.0
+
+    # Limpieza y tipos
+    df = df.dropna(subset=["fecha", "consumo_kwh"]).copy()
+    df["fecha"] = pd.to_datetime(df["fecha"], errors="coerce")
+    df = df.dropna(subset=["fecha"]).copy()
+
+    df["consumo_kwh"] = pd.to_numeric(df["consumo_kwh"], errors="coerce").fillna(0.0)
+    df["costo_mx"]    = pd.to_numeric(df["costo_mx"], errors="coerce").fillna(0.0)
+    df["estado"]      = _norm_text(df["estado"])
+    return df
+
+
+def _norm_text(s: pd.Series) -> pd.Series:
+    """astype(str).str.lower().str.strip() aplicado a los valores distintos (pocos) y no fila por fila."""
+    codes, uniq = pd.factorize(s, use_na_sentinel=False)
+    norm = pd.Series(uniq, dtype=s.dtype).astype(str).str.lower().str.strip()
+    return pd.Series(norm.array.take(codes), index=s.index, name=s.name)
+
+
+def _top_hist(df: pd.DataFrame) -> pd.DataFrame:
+    """Los HIST_N más recientes; orden estable para que los empates por fecha respeten el orden del archivo."""
+    if len(df) > HIST_N:
+        # solo se ordenan las filas con fecha >= la HIST_N-ésima más reciente (empates incluidos)
+        f = df["fecha"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+        df = df[f >= np.partition(f, len(f) - HIST_N)[len(f) - HIST_N]]
+    return df.sort_values("fecha", ascending=False, kind="stable").loc[:, HIST_COLS].head(HIST_N)
+
+
+# ===================== Historial binario =====================
+class _HistWriter:
+    """
+    Escribe historico.npy (HIST_DTYPE, fecha desc, empates en orden de archivo) y
+    historico_meta.json (diccionarios de texto + índice disperso de fechas). Las filas se anexan
+    sin ordenar a un temporal en disco; al final solo la fecha y el orden (16 B/fila) van a RAM.
+    Si el build falla, abort() borra los temporales (finish() lo llama solo si falla él mismo).
+    """
+
+    BLOCK = 1 << 16
+
+    def __init__(self, out_dir: Path):
+        self.out_dir = out_dir
+        out_dir.mkdir(parents=True, exist_ok=True)
+        self.tmp = out_dir / "historico.tmp.bin"
+        self.f = open(self.tmp, "wb")
+        self.n = 0
+        self.dicts = {c: {} for c in HIST_DICTS}
+
+    def _codes(self, col: str, s: pd.Series) -> np.ndarray:
+        d = self.dicts[col]
+        codes, uniq = pd.factorize(s)
+        lut = np.array([d.setdefault(str(u), len(d)) for u in uniq] + [-1], dtype=np.int64)
+        return lut[codes]
+
+    def add(self, df: pd.DataFrame, consumo=None, costo=None):
+        """Filas ya limpias (_clean). consumo/costo permiten pasar valores ya corregidos."""
+        if df.empty:
+            return
+        rec = np.empty(len(df), dtype=HIST_DTYPE)
+        rec["fecha"] = df["fecha"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+        rec["consumo"] = df["consumo_kwh"].to_numpy(dtype=np.float64) if consumo is None else consumo
+        rec["costo"] = df["costo_mx"].to_numpy(dtype=np.float64) if costo is None else costo
+        for c in HIST_DICTS:
+            rec[c] = self._codes(c, df[c])
+        self.f.write(rec.tobytes())
+        self.n += len(rec)
+
+    def abort(self):
+        """Cierra y borra los temporales sin tocar historico.npy / historico_meta.json."""
+        self.f.close()
+        for name in ("historico.tmp.bin", "historico.tmp.npy", "historico_meta.tmp.json"):
+            (self.out_dir / name).unlink(missing_ok=True)
+
+    def finish(self):
+        try:
+            self._finish()
+        except BaseException:
+            self.abort()
+            raise
+
+    def _finish(self):
+        self.f.close()
+        final, tmp_npy = self.out_dir / "historico.npy", self.out_dir / "historico.tmp.npy"
+        # diccionarios ordenados: el archivo no depende del orden en que llegaron las filas
+        names = {c: sorted(d) for c, d in self.dicts.items()}
+        remap = {c: np.array([d[k] for k in names[c]], dtype=np.int64).argsort() for c, d in self.dicts.items()}
+        if self.n:
+            raw = np.memmap(self.tmp, dtype=HIST_DTYPE, mode="r", shape=(self.n,))
+            order = np.argsort(-raw["fecha"], kind="stable")
+            out = np.lib.format.open_memmap(tmp_npy, mode="w+", dtype=HIST_DTYPE, shape=(self.n,))
+            for s in range(0, self.n, self.BLOCK):
+                blk = raw[order[s:s + self.BLOCK]]
+                for c, lut in remap.items():
+                    blk[c] = np.where(blk[c] >= 0, np.append(lut, -1)[blk[c]], -1)
+                out[s:s + self.BLOCK] = blk
+            index = out["fecha"][::HIST_INDEX_STEP].tolist()
+            out.flush()
+            del out, raw
+        else:
+            np.save(tmp_npy, np.empty(0, dtype=HIST_DTYPE))
+            index = []
+        os.replace(tmp_npy, final)
+        self.tmp.unlink()
+        meta = {"n": self.n, "paso_indice": HIST_INDEX_STEP, "indice": index,
+                "diccionarios": names}
+        tmp = self.out_dir / "historico_meta.tmp.json"
+        tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.out_dir / "historico_meta.json")   # último: marca la versión nueva
+        print(f"🗂️  historico.npy: {self.n:,} filas ({self.n * HIST_DTYPE.itemsize / 1e6:0.1f} MB)")
+
+
+def _f32_decimal(x: np.ndarray) -> np.ndarray:
+    """float32 -> float64 con 7 cifras significativas (el decimal del CSV, sin pasar por texto)."""
+    x = np.asarray(x, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        e = np.floor(np.log10(np.abs(x)))
+    scale = np.power(10.0, np.where(np.isfinite(e), 6 - e, 0))
+    return np.where(np.isfinite(e), np.round(x * scale) / scale, x)
+
+
+# ===================== Modo full (todo en memoria) =====================
+def build_full(src: Path, hist: "_HistWriter" = None):
+    used = _used_columns(src)
+    if used is None:
+        # parquet: no pasamos usecols, cargamos todo y luego filtramos
+        df = pd.read_parquet(src)
+    else:
+        df = pd.read_csv(src, low_memory=False, **_read_csv_kwargs(used))
+    df = _clean(df)
+    if hist is not None:
+        hist.add(df)
+
+    # ===== Cards (mes actual) =====
+    hoy = df["fecha"].max()
+    if pd.isna(hoy):
+        raise ValueError("No se pudo determinar la fecha máxima; revisa la columna 'fecha'.")
+
+    mes_actual = df[df["fecha"].dt.to_period("M") == hoy.to_period("M")]
+    consumo_mes = math.fsum(mes_actual["consumo_kwh"].to_numpy(dtype=np.float64))
+
+    if not mes_actual.empty:
+        umbral = mes_actual["consumo_kwh"].quantile(0.95)
+        alertas = int((mes_actual["consumo_kwh"] > umbral).sum())
+    else:
+        alertas = 0
+
+    ult7 = df[df["fecha"] >= (hoy - pd.Timedelta(days=7))]
+    activos = int((ult7["estado"] == "activo").sum()) if not ult7.empty else 0
+
+    cards = {"consumo": round(consumo_mes, 2), "alertas": alertas, "activos": activos}
+
+    # ===== Mensual y semanal (últimos 7 meses / días), sumas exactas como en stream =====
+    mens, sem = _SumState("mes"), _SumState("dia")
+    mens.update(df)
+    sem.update(df)
+
+    # ===== Histórico (últimos 500) =====
+    return cards, mens.result(), sem.result(), _top_hist(df)
+
+
+# ===================== Modo stream (memoria acotada) =====================
+def _iter_chunks(src: Path, used):
+    if used is None:
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(src).iter_batches(batch_size=CHUNKSIZE):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(src, chunksize=CHUNKSIZE, low_memory=True, **_read_csv_kwargs(used))
+
+
+class _CardsState:
+    """
+    Solo lo que puede afectar las cards: los consumos del mes más reciente visto (percentil 95
+    exacto) y las fechas de filas 'activo' dentro de los 7 días previos al máximo visto.
+    """
+
+    def __init__(self):
+        self.hoy = None
+        self.mes_actual = None
+        self.mes_vals = []
+        self.activos_ts = np.empty(0, dtype="datetime64[ns]")
+
+    def update(self, df: pd.DataFrame):
+        if df.empty:
+            return
+        fecha = df["fecha"]
+        cons = df["consumo_kwh"]
+        chunk_max = fecha.max()
+        if self.hoy is None or chunk_max > self.hoy:
+            self.hoy = chunk_max
+        if self.mes_actual is None or self.hoy.to_period("M") != self.mes_actual:
+            self.mes_actual, self.mes_vals = self.hoy.to_period("M"), []
+        # mismo mes que mes_actual, comparando contra sus límites en vez de convertir cada fila a Period
+        inicio, fin = self.mes_actual.start_time, (self.mes_actual + 1).start_time
+        self.mes_vals.append(cons[((fecha >= inicio) & (fecha < fin)).to_numpy()].to_numpy(dtype=np.float64))
+
+        desde = (self.hoy - pd.Timedelta(days=7)).to_datetime64()
+        act = fecha[(df["estado"] == "activo").to_numpy()].to_numpy(dtype="datetime64[ns]")
+        self.activos_ts = np.concatenate([self.activos_ts, act])
+        self.activos_ts = self.activos_ts[self.activos_ts >= desde]
+
+    def result(self) -> dict:
+        if self.hoy is None or pd.isna(self.hoy):
+            raise ValueError("No se pudo determinar la fecha máxima; revisa la columna 'fecha'.")
+        vals = pd.Series(np.concatenate(self.mes_vals) if self.mes_vals else np.empty(0))
+        consumo_mes = math.fsum(vals.to_numpy())
+        alertas = int((vals > vals.quantile(0.95)).sum()) if not vals.empty else 0
+        desde = (self.hoy - pd.Timedelta(days=7)).to_datetime64()
+        activos = int((self.activos_ts >= desde).sum())
+        return {"consumo": round(consumo_mes, 2), "alertas": alertas, "activos": activos}
+
+
+# Suma exacta: cada float64 es m·2^e con m entero de 53 bits; se suman las m por (periodo, e) en
+# int64 (partidas en 21 + 32 bits para no desbordar) y se acumulan como enteros de Python escalados
+# por 2^EXACT_SHIFT. El total no depende del orden ni de dónde caen los cortes de chunk; el float
+# final sale de una sola división entera (redondeo correcto).
+EXACT_SHIFT = 1126   # 1074 (subnormal más chico) + 52 bits de mantisa
+
+
+class _ExactSums:
+    """Sumas exactas por llave (ver EXACT_SHIFT); inf/nan se llevan aparte como float."""
+
+    def __init__(self):
+        self.exact: dict = {}
+        self.especial: dict = {}
+
+    def add(self, keys: pd.Series, vals: np.ndarray):
+        codes, uniq = pd.factorize(keys)
+        uniq = list(uniq)
+        vals = np.asarray(vals, dtype=np.float64)
+        fin = np.isfinite(vals) & (codes >= 0)
+        if not fin.all():
+            bad = ~fin & (codes >= 0)
+            for c, v in pd.Series(vals[bad]).groupby(codes[bad]).sum().items():
+                self.especial[uniq[c]] = self.especial.get(uniq[c], 0.0) + float(v)
+        m, e = np.frexp(vals[fin])
+        mi = (m * (1 << 53)).astype(np.int64)              # exacto: |m| < 1 con 53 bits
+        part = pd.DataFrame({"k": codes[fin], "e": e.astype(np.int64) - 53, "hi": mi >> 32, "lo": mi & 0xFFFFFFFF})
+        sums = part.groupby(["k", "e"], sort=False)[["hi", "lo"]].sum()
+        for (c, ex), hi, lo in zip(sums.index, sums["hi"].tolist(), sums["lo"].tolist()):
+            k = uniq[c]
+            self.exact[k] = self.exact.get(k, 0) + (((hi << 32) + lo) << (ex + EXACT_SHIFT))
+
+    def keys(self) -> list:
+        return sorted(set(self.exact) | set(self.especial))
+
+    def value(self, k) -> float:
+        return self.exact.get(k, 0) / (1 << EXACT_SHIFT) + self.especial.get(k, 0.0)
+
+
+class _SumState:
+    """
+    Suma exacta de consumo por periodo (mes o día); result() = los últimos 7 periodos. Los días se
+    agrupan por fecha truncada (datetime64) y pasan a datetime.date solo en las 7 etiquetas finales.
+    """
+
+    PERIODOS = {"mes": lambda fecha: fecha.dt.to_period("M"), "dia": lambda fecha: fecha.dt.normalize()}
+
+    def __init__(self, periodo: str):
+        self.periodo = periodo
+        self.key = self.PERIODOS[periodo]
+        self.sums = _ExactSums()
+
+    def update(self, df: pd.DataFrame):
+        if not df.empty:
+            self.sums.add(self.key(df["fecha"]), df["consumo_kwh"].to_numpy(dtype=np.float64))
+
+    def result(self) -> pd.Series:
+        keys = self.sums.keys()[-7:]
+        index = [k.date() for k in keys] if self.periodo == "dia" else keys
+        return pd.Series([self.sums.value(k) for k in keys], index=index, dtype="float64")
+
+
+class _TopHist:
+    """Las HIST_N filas más recientes vistas (historico.json)."""
+
+    def __init__(self):
+        self.hist = None
+
+    def update(self, df: pd.DataFrame):
+        if df.empty:
+            return
+        cand = _top_hist(df)
+        self.hist = cand if self.hist is None else _top_hist(pd.concat([self.hist, cand]))
+
+    def result(self) -> pd.DataFrame:
+        return self.hist
+
+
+class _StreamState:
+    """Sumas por mes y por día, el top-HIST_N por fecha y el estado de las cards, chunk por chunk."""
+
+    def __init__(self):
+        self.cards = _CardsState()
+        self.mes = _SumState("mes")
+        self.dia = _SumState("dia")
+        self.top = _TopHist()
+
+    @property
+    def hoy(self):
+        return self.cards.hoy
+
+    def update(self, df: pd.DataFrame):
+        for part in (self.cards, self.mes, self.dia, self.top):
+            part.update(df)
+
+    def results(self):
+        return self.cards.result(), self.mes.result(), self.dia.result(), self.top.result()
+
+
+def build_stream(src: Path, hist: "_HistWriter" = None):
+    used = _used_columns(src)
+    st = _StreamState()
+    for i, chunk in enumerate(_iter_chunks(src, used), start=1):
+        if used is None:
+            chunk = chunk[[c for c in DESIRED if c in chunk.columns]]
+        clean = _clean(chunk)
+        st.update(clean)
+        if hist is not None:
+            hist.add(clean)
+        print(f"🔹 Chunk {i} | filas: {len(chunk):,}")
+    return st.results()
+
+
+# ===================== Store columnar (particiones por mes) =====================
+def build_columnar(store_dir: Path, hist: "_HistWriter" = None):
+    """
+    Recorre las particiones de la más reciente a la más antigua y deja de agregar en cuanto hay
+    7 meses con datos y HIST_N filas de histórico: lo demás no puede cambiar ninguna salida. Las
+    ventanas de cards (mes actual, 7 días) y de semanal caen dentro de esos 7 meses. Con `hist`
+    se siguen leyendo las particiones restantes solo para el historial binario.
+    """
+    from columnar_store import ColumnarStore
+
+    store = ColumnarStore(store_dir)
+    cols = [c for c in DESIRED if c in store.columns]
+    st, meses, filas, agregando = _StreamState(), 0, 0, True
+    for part in reversed(store.partitions()):
+        df = store.frame(part, cols)
+        for c in ("estado", "dispositivo", "usuario"):
+            if c in df.columns:   # mismo texto que produce read_csv (nulos -> "nan" en _clean)
+                df[c] = df[c].astype(object)
+        df = _clean(df)
+        # float32 -> el decimal del CSV, para que sumas, percentil e historial usen los mismos valores
+        for c in ("consumo_kwh", "costo_mx"):
+            df[c] = _f32_decimal(df[c])
+        if hist is not None:
+            hist.add(df)
+        if agregando:
+            st.update(df)
+            meses += not df.empty
+            filas += len(df)
+            print(f"🔹 Partición {part} | filas: {len(df):,}")
+            agregando = not (meses >= 7 and filas >= HIST_N)
+        if not agregando and hist is None:
+            break
+    cards, mens, sem, hist = st.results()
+    # float32 -> decimal más corto que lo representa (el valor que venía en el CSV)
+    for c in ("consumo_kwh", "costo_mx"):
+        hist[c] = hist[c].astype(np.float32).astype(str).astype(np.float64)
+    return cards, mens, sem, hist
+
+
+# ===================== Salidas =====================
+def _write_cards(cards: dict, out_dir: Path):
+    pd.Series(cards).to_json(out_dir / "cards.json", orient="index", force_ascii=False)
+
+
+def _write_serie(serie: pd.Series, out_dir: Path, name: str):
+    data = {"labels": [str(p) for p in serie.index.astype(str)], "data": [round(x,2) for x in serie.values]}
+    pd.Series(data).to_json(out_dir / name, orient="index", force_ascii=False)
+
+
+def _write_historico(hist: pd.DataFrame, out_dir: Path):
+    hist = hist.copy()
+    hist["fecha"] = pd.to_datetime(hist["fecha"], errors="coerce").dt.strftime("%Y-%m-%d %H:%M:%S")
+    hist.rename(columns={"consumo_kwh":"consumo","costo_mx":"costo"}, inplace=True)
+    hist.to_json(out_dir / "historico.json", orient="records", force_ascii=False)
+
+
+def _write_outputs(cards, mens, sem, hist, out_dir: Path):
+    out_dir.mkdir(parents=True, exist_ok=True)
+    _write_cards(cards, out_dir)
+    _write_serie(mens, out_dir, "mensual.json")
+    _write_serie(sem, out_dir, "semanal.json")
+    _write_historico(hist, out_dir)
+
+    if PRECOMPRESS:
+        precompress(out_dir, ["cards.json", "mensual.json", "semanal.json"])
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _compare():
+    """Corre full y stream (con dos tamaños de chunk) en procesos separados; compara salidas y pico de RSS."""
+    res = {}
+    tmp = Path(tempfile.mkdtemp(prefix="dash_cmp_"))
+    runs = {"full": ("full", CHUNKSIZE), "stream": ("stream", CHUNKSIZE),
+            f"stream@{COMPARE_CHUNKSIZE}": ("stream", COMPARE_CHUNKSIZE)}
+    try:
+        for name, (mode, chunksize) in runs.items():
+            env = {**os.environ, "DASH_MODE": mode, "DASH_OUT_DIR": str(tmp / name), "CHUNKSIZE": str(chunksize)}
+            out = subprocess.run([sys.executable, __file__], env=env, capture_output=True, text=True, check=True).stdout
+            res[name] = json.loads(out.strip().splitlines()[-1])
+        files = OUTPUTS + (["historico.npy", "historico_meta.json"] if HIST_BIN else [])
+        same = {name: {f: (tmp / "full" / f).read_bytes() == (tmp / name / f).read_bytes() for f in files}
+                for name in runs if name != "full"}
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    for name, r in res.items():
+        rss = f"{r['peak_rss_mb']:0.0f} MB" if r["peak_rss_mb"] is not None else "n/d"
+        print(f"📊 {name:<12} | pico RSS {rss:>8} | {r['segundos']:0.1f}s")
+    for name, eq in same.items():
+        print(f"🔁 full vs {name}: " + ", ".join(f"{f}={'sí' if ok else 'NO'}" for f, ok in eq.items()))
+    if not all(ok for eq in same.values() for ok in eq.values()):
+        sys.exit(1)
+
+
+def main():
+    if COLUMNAR_DIR:
+        print(f"📥 Leyendo store columnar: {COLUMNAR_DIR}")
+        t0 = time.time()
+        hist = _HistWriter(OUT_DIR) if HIST_BIN else None
+        try:
+            _write_outputs(*build_columnar(Path(COLUMNAR_DIR), hist), OUT_DIR)
+        except BaseException:
+            if hist is not None:
+                hist.abort()
+            raise
+        if hist is not None:
+            hist.finish()
+        print(f"✅ Cache generado en: {OUT_DIR.resolve()}")
+        print(json.dumps({"modo": "columnar", "peak_rss_mb": _peak_rss_mb(), "segundos": round(time.time() - t0, 2)}))
+        return
+    if MODE == "compare":
+        return _compare()
+    src = _resolve_source(CSV_PATH)
+    print(f"📥 Leyendo: {src} | modo {MODE}")
+    t0 = time.time()
+    hist = _HistWriter(OUT_DIR) if HIST_BIN else None
+    try:
+        results = build_stream(src, hist) if MODE == "stream" else build_full(src, hist)
+        _write_outputs(*results, OUT_DIR)
+    except BaseException:
+        if hist is not None:
+            hist.abort()
+        raise
+    if hist is not None:
+        hist.finish()
+    rss = _peak_rss_mb()
+    print(f"✅ Cache generado en: {OUT_DIR.resolve()}" + (f" | pico RSS {rss:0.0f} MB" if rss else ""))
+    print(json.dumps({"modo": MODE, "peak_rss_mb": rss, "segundos": round(time.time() - t0, 2)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,18 @@
 # ia_service/tools/build_mineria_cache.py
-import os, time, json, re
+import os, io, time, json, hashlib
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import numpy as np
 import pandas as pd
 
+# coerce_time_str / EN_ES / DOW_MAP se reexportan para quien los importaba de aquí
+from parsing import (EN_ES, DOW_MAP, DIAS_ORDEN, NAT, coerce_time_str, normalize_dow,
+                     pick_hour_source, chunk_datetimes)
+from sketches import HyperLogLog, Reservoir, TDigest, Welford
+from anomalias import GroupedAnomalies
+from cubo import Cube
+from precompress import COMBINED, precompress, remove_combined, write_combined
+
 # =========================
 # Config y rutas
 # =========================
@@ -14,6 +23,34 @@ OUT_DIR.mkdir(parents=True, exist_ok=True)
 CHUNKSIZE   = int(os.getenv("CHUNKSIZE", "500000"))
 MAX_CHUNKS  = int(os.getenv("MAX_CHUNKS", "0"))      # 0 = sin límite
 Z_THRESHOLD = float(os.getenv("Z_THRESHOLD", "3.0"))
+WORKERS     = int(os.getenv("MINERIA_WORKERS", "1"))  # 1 = serial, 0 = todos los núcleos
+SCATTER_MAX = 1200       # puntos del scatter (reservorio uniforme sobre TODAS las filas)
+# Estratificar el scatter: "" (no) | hora | municipio; con estratos se guardan SCATTER_POR_ESTRATO por estrato
+SCATTER_STRATA      = os.getenv("MINERIA_SCATTER_STRATA", "")
+SCATTER_POR_ESTRATO = int(os.getenv("MINERIA_SCATTER_POR_ESTRATO", "50"))
+# Anomalías por (casa_id, hora): top-N en anomalias.json y grupos con al menos ANOM_MIN_N filas
+ANOM_TOP   = int(os.getenv("MINERIA_ANOM_TOP", "100"))
+ANOM_MIN_N = int(os.getenv("MINERIA_ANOM_MIN_N", "30"))
+
+# Modo incremental: guarda el estado + offset procesado y en la siguiente corrida solo lee lo agregado.
+# El checkpoint (varios MB de estado del builder) va fuera del directorio que sirve la API:
+# <OUT_DIR>/../_state/ (excluido de git y del deploy); antes vivía en <OUT_DIR>/_checkpoint.json.
+INCREMENTAL = os.getenv("MINERIA_INCREMENTAL", "0") == "1"
+CHECKPOINT  = Path(os.getenv("MINERIA_CHECKPOINT", str(OUT_DIR.parent / "_state" / "mineria_checkpoint.json"))).resolve()
+LEGACY_CHECKPOINT = OUT_DIR / "_checkpoint.json"
+FP_BYTES    = 64 * 1024   # bytes muestreados para la huella (inicio de datos y cola antes del offset)
+
+# Fuente de hora: auto (se elige con una muestra y se reutiliza) | chunk (se elige en cada chunk)
+# | timestamp | fecha+hora_dia | fecha+hora
+HOUR_SOURCE   = os.getenv("MINERIA_HOUR_SOURCE", "auto")
+SOURCE_SAMPLE = 20000
+_source_cache: dict = {}
+
+# Store columnar (tools/columnar_store.py): si se define, se lee de ahí en vez del CSV
+COLUMNAR_DIR = os.getenv("COLUMNAR_DIR", "")
+
+# mineria_cache.json (respuesta completa ya serializada) + variantes .gz/.br para la API
+PRECOMPRESS = os.getenv("CACHE_PRECOMPRESS", "1") == "1"
 
 # Columnas candidatas (tomaremos solo las que existan realmente)
 CANDIDATE_COLS = [
@@ -26,63 +63,12 @@ CANDIDATE_COLS = [
     "dia_semana",
 ]
 
-EN_ES = {
-    "monday":"lunes","tuesday":"martes","wednesday":"miércoles","thursday":"jueves",
-    "friday":"viernes","saturday":"sábado","sunday":"domingo"
-}
-DOW_MAP    = {0:"lunes",1:"martes",2:"miércoles",3:"jueves",4:"viernes",5:"sábado",6:"domingo"}
-DIAS_ORDEN = ["lunes","martes","miércoles","jueves","viernes","sábado","domingo"]
-
-_time_re = re.compile(r"^\s*(\d{1,2})(?::(\d{1,2}))?")
-
-def coerce_time_str(s: pd.Series) -> pd.Series:
-    """
-    Convierte posibles formatos de hora a 'HH:MM'.
-    Acepta: 'H', 'HH', 'H:MM', 'HH:MM', enteros y strings con ruido.
-    """
-    if s is None:
-        return pd.Series(dtype="object")
-
-    # numérico (0..23) -> "HH:00"
-    if pd.api.types.is_numeric_dtype(s):
-        hh = s.astype("Int64").astype(object)
-        return hh.apply(lambda v: f"{int(v):02d}:00" if pd.notna(v) else np.nan)
-
-    s = s.astype(str)
-
-    def _one(x: str):
-        m = _time_re.match(x)
-        if not m:
-            return np.nan
-        hh = int(m.group(1))
-        mm = int(m.group(2)) if m.group(2) is not None else 0
-        if 0 <= hh <= 23 and 0 <= mm <= 59:
-            return f"{hh:02d}:{mm:02d}"
-        return np.nan
-
-    return s.map(_one)
-
-def normalize_dow(series: pd.Series, dt_col: pd.Series) -> pd.Series:
-    """Normaliza 'dia_semana'; si no está/vale, se infiere de dt_col."""
-    if series is not None and series.notna().any():
-        s = (series.astype(str)
-             .str.normalize('NFKD')
-             .str.encode('ascii', errors='ignore')
-             .str.decode('utf-8')
-             .str.strip()
-             .str.lower())
-        s = s.map(lambda x: EN_ES.get(x, x))
-        mask_na = s.isna() | (s == "") | (~s.isin(DIAS_ORDEN))
-        if mask_na.any():
-            s.loc[mask_na] = dt_col.loc[mask_na].dt.dayofweek.map(DOW_MAP)
-        return s
-    else:
-        return dt_col.dt.dayofweek.map(DOW_MAP)
-
 def detect_usecols(csv_path: Path) -> list:
     """Detecta columnas disponibles y valida precondiciones."""
-    df_head = pd.read_csv(csv_path, nrows=1)
-    cols = df_head.columns.tolist()
+    return pick_usecols(pd.read_csv(csv_path, nrows=0).columns.tolist())
+
+def pick_usecols(cols: list) -> list:
+    """CANDIDATE_COLS presentes en `cols` (encabezado del CSV), validando precondiciones."""
     usecols = [c for c in CANDIDATE_COLS if c in cols]
     if "consumo_kwh" not in usecols:
         raise ValueError("El CSV no contiene la columna obligatoria 'consumo_kwh'.")
@@ -91,161 +77,255 @@ def detect_usecols(csv_path: Path) -> list:
         raise ValueError("Se requiere 'timestamp' o el par 'fecha' + ('hora_dia' o 'hora').")
     return usecols
 
-# ====== NUEVO: elegir la mejor fuente de HORA por chunk ======
-def _hours_from_ts(ts: pd.Series):
-    if ts is None or not pd.api.types.is_datetime64_any_dtype(ts):
+# =========================
+# Estado agregable por chunk
+# =========================
+SKETCHES = {"scatter": Reservoir, "consumo": Welford, "digest": TDigest, "casas": HyperLogLog,
+            "anom": GroupedAnomalies, "cubo": Cube}
+
+def _new_state() -> dict:
+    return {
+        "hora_sum": np.zeros(24, dtype=np.float64),
+        "dia_sum": {d: 0.0 for d in DIAS_ORDEN},
+        "muni_sum": {},
+        "scatter": Reservoir(SCATTER_POR_ESTRATO if SCATTER_STRATA else SCATTER_MAX),
+        "consumo": Welford(),     # media / desviación de consumo_kwh
+        "digest": TDigest(),      # distribución de consumo_kwh (colas para anomalías)
+        "casas": HyperLogLog(),   # casa_id distintos
+        "anom": GroupedAnomalies(ANOM_TOP, Z_THRESHOLD),   # anomalías por (casa_id, hora)
+        "cubo": Cube(),           # consumo/costo por (casa_id, día, hora) para /mineria/query
+        "total_rows": 0,
+    }
+
+def _merge_state(acc: dict, part: dict) -> dict:
+    """Suma los parciales de `part` en `acc`; los sketches se unen con su merge."""
+    acc["hora_sum"] += part["hora_sum"]
+    for d, v in part["dia_sum"].items():
+        acc["dia_sum"][d] = acc["dia_sum"].get(d, 0.0) + v
+    for k, v in part["muni_sum"].items():
+        acc["muni_sum"][k] = acc["muni_sum"].get(k, 0.0) + v
+    for k in SKETCHES:
+        acc[k].merge(part[k])
+    acc["total_rows"] += part["total_rows"]
+    return acc
+
+def _hour_source(df: pd.DataFrame, i: int) -> str:
+    """
+    Fuente de hora para el chunk. En modo auto se elige una vez, con una muestra del primer chunk,
+    y se reutiliza para los siguientes con las mismas columnas; "chunk" reelige en cada chunk.
+    """
+    if HOUR_SOURCE not in ("auto", "chunk"):
+        return HOUR_SOURCE
+    key = tuple(df.columns)
+    if HOUR_SOURCE == "chunk" or key not in _source_cache:
+        _source_cache[key] = pick_hour_source(df if HOUR_SOURCE == "chunk" else df.head(SOURCE_SAMPLE))
+    return _source_cache[key]
+
+
+def _chunk_dt(df: pd.DataFrame, i: int, verbose: bool = True):
+    """dt por fila válida del chunk (índice = índice de df), con la mejor fuente de hora; None si no hay."""
+    source = _hour_source(df, i)
+    dt_ns = chunk_datetimes(df, source) if source else None
+    if dt_ns is not None and not (dt_ns != NAT).any() and HOUR_SOURCE == "auto":
+        # la fuente elegida no sirve en este chunk: se reelige con el chunk completo
+        source = pick_hour_source(df)
+        dt_ns = chunk_datetimes(df, source) if source else None
+    if dt_ns is None:
+        print(f"⚠️  Chunk {i} sin horas válidas (timestamp/fecha+hora_dia/fecha+hora). Saltando.")
         return None
-    return ts.dt.hour
 
-def _hours_from_fecha_hora(df: pd.DataFrame, prefer: str):
-    if prefer == "hora_dia" and "hora_dia" in df.columns:
-        hhmm = coerce_time_str(df["hora_dia"])
-    elif prefer == "hora" and "hora" in df.columns:
-        hhmm = coerce_time_str(df["hora"])
-    else:
+    valid = dt_ns != NAT
+    if not valid.any():
+        print(f"⚠️  Chunk {i}: después de armar dt no quedaron válidos. Saltando.")
         return None
-    fecha_txt = df["fecha"].astype(str).str.strip() if "fecha" in df.columns else ""
-    dt = pd.to_datetime(fecha_txt + " " + hhmm.astype(str), errors="coerce")
-    return dt.dt.hour
-
-def _pick_best_hours(df: pd.DataFrame):
-    cand = []
-
-    # 1) timestamp
-    if "timestamp" in df.columns and pd.api.types.is_datetime64_any_dtype(df["timestamp"]):
-        h_ts = _hours_from_ts(df["timestamp"])
-        if h_ts is not None:
-            cand.append(("timestamp", h_ts))
-
-    # 2) fecha + hora_dia
-    if "fecha" in df.columns and "hora_dia" in df.columns:
-        h_hd = _hours_from_fecha_hora(df, "hora_dia")
-        if h_hd is not None:
-            cand.append(("fecha+hora_dia", h_hd))
-
-    # 3) fecha + hora
-    if "fecha" in df.columns and "hora" in df.columns:
-        h_h = _hours_from_fecha_hora(df, "hora")
-        if h_h is not None:
-            cand.append(("fecha+hora", h_h))
-
-    # Filtrar NaN y medir proporción de hora=00
-    clean = []
-    for name, hrs in cand:
-        mask = hrs.notna()
-        if mask.any():
-            hrs2 = hrs.loc[mask].astype(int)
-            p0 = (hrs2 == 0).mean()
-            clean.append((name, hrs2, p0))
-
-    if not clean:
-        return None, None
-
-    # Elegimos la de menor proporción en 00
-    clean.sort(key=lambda t: t[2])
-    best_name, best_hours, best_p0 = clean[0]
-    return best_name, best_hours
-
-def main():
-    if not CSV_PATH.exists():
-        raise FileNotFoundError(f"No se encontró el CSV en: {CSV_PATH}")
-
-    print(f"📥 Leyendo: {CSV_PATH}")
-    t0 = time.time()
-
-    USECOLS = detect_usecols(CSV_PATH)
-    print(f"🔎 Columnas detectadas para uso: {USECOLS}")
-
-    hora_sum   = np.zeros(24, dtype=np.float64)
-    dia_sum    = {d: 0.0 for d in DIAS_ORDEN}
-    muni_sum   = {}
-    scatter    = []
-    total_rows = 0
-    rng = np.random.default_rng(42)
-
-    parse_dates = ["timestamp"] if "timestamp" in USECOLS else None
-
-    reader = pd.read_csv(
-        CSV_PATH,
-        usecols=USECOLS,
-        chunksize=CHUNKSIZE,
+    dt = pd.Series(dt_ns[valid].view("datetime64[ns]"), index=df.index[valid])
+
+    # Log de debug en los primeros 2 chunks
+    if verbose and i <= 2:
+        hours = dt.dt.hour
+        vc = hours.value_counts().sort_index()
+        print(f"✅ Fuente de hora elegida chunk {i}: {source} | total={len(hours)} | p(h=00)={(hours == 0).mean():0.3f}")
+        print(f"⏱️  Dist horas chunk {i} (primeras 24):", dict(vc.head(24)))
+    return dt
+
+
+def _accumulate(state: dict, rng, hours: np.ndarray, cons: np.ndarray, costo: np.ndarray,
+                dow: pd.Series, casa: pd.Series = None, ts: np.ndarray = None) -> int:
+    """Suma filas ya limpias (hora 0-23, consumo/costo float sin NaN) al estado."""
+    # Consumo por hora (rápido)
+    state["hora_sum"] += np.bincount(hours, weights=cons, minlength=24)
+
+    # Consumo por día
+    dsum = pd.Series(cons, index=dow.index).groupby(dow, observed=False).sum()
+    for d, v in dsum.items():
+        if d in state["dia_sum"]:
+            state["dia_sum"][d] += float(v)
+
+    # Top municipios
+    if casa is not None:
+        msum = pd.Series(cons, index=casa.index).groupby(casa, observed=False).sum()
+        for k, v in msum.items():
+            state["muni_sum"][k] = state["muni_sum"].get(k, 0.0) + float(v)
+        state["casas"].update(casa.dropna().unique())
+        state["anom"].update(casa.to_numpy(), hours, ts, cons)
+
+    # Sketches sobre todas las filas: scatter (consumo vs costo), media/desv y distribución
+    estratos = {"hora": hours, "municipio": casa.to_numpy() if casa is not None else None}.get(SCATTER_STRATA)
+    state["scatter"].update(rng, cons, costo, estratos)
+    state["consumo"].update(cons)
+    state["digest"].update(cons)
+    state["cubo"].update(casa.to_numpy() if casa is not None else None, ts, hours, cons, costo)
+
+    n = len(cons)
+    state["total_rows"] += n
+    return n
+
+
+def _process_chunk(df: pd.DataFrame, state: dict, rng, i: int, verbose: bool = True):
+    """Acumula un chunk en `state`. Devuelve las filas válidas procesadas (None si se saltó)."""
+    dt = _chunk_dt(df, i, verbose)
+    if dt is None:
+        return None
+    if len(dt) < len(df):   # solo lectura: sin copia, y sin reindexar si todas las filas son válidas
+        df = df.loc[dt.index]
+
+    # Numéricos
+    cons      = pd.to_numeric(df["consumo_kwh"], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+    costo_est = pd.to_numeric(df.get("costo_estimado", pd.Series(np.nan, index=df.index)), errors="coerce")
+    costo_mx  = pd.to_numeric(df.get("costo_mx", pd.Series(np.nan, index=df.index)),       errors="coerce")
+    costo     = costo_est.fillna(costo_mx).fillna(0.0).to_numpy(dtype=float)
+
+    dow = normalize_dow(df.get("dia_semana"), dt)
+    return _accumulate(state, rng, dt.dt.hour.values, cons, costo, dow,
+                       df["casa_id"] if "casa_id" in df.columns else None,
+                       dt.to_numpy(dtype="datetime64[ns]").view(np.int64))
+
+
+def _run_columnar(store_dir: Path, t0: float) -> dict:
+    """Lee el store columnar (tools/columnar_store.py): solo las columnas que usa este builder."""
+    from columnar_store import ColumnarStore, NAT
+
+    store = ColumnarStore(store_dir)
+    state, rng = _new_state(), np.random.default_rng(42)
+    casas = store.categories("casa_id")
+    for i, part in enumerate(store.partitions(), start=1):
+        t_part = time.time()
+        ts = store.column(part, "ts")
+        ok = np.flatnonzero(np.asarray(ts) != NAT)
+        if not len(ok):
+            continue
+        cons = np.nan_to_num(store.column(part, "consumo_kwh")[ok].astype(np.float64), nan=0.0)
+        costo = store.column(part, "costo_estimado")[ok].astype(np.float64)
+        costo_mx = store.column(part, "costo_mx")[ok].astype(np.float64)
+        costo = np.nan_to_num(np.where(np.isnan(costo), costo_mx, costo), nan=0.0)
+        dow = pd.Series(pd.Categorical.from_codes(store.column(part, "dia_semana")[ok], categories=DIAS_ORDEN))
+        casa = (pd.Series(pd.Categorical.from_codes(store.column(part, "casa_id")[ok], categories=casas))
+                if "casa_id" in store.columns else None)
+        n = _accumulate(state, rng, store.column(part, "hora")[ok].astype(np.intp), cons, costo, dow, casa,
+                        np.asarray(ts)[ok])
+        dt_part = time.time() - t_part
+        print(f"🔹 Partición {part} ({i}) | filas válidas: {n:,} | {n / max(dt_part, 1e-9):,.0f} reg/s | total: {time.time() - t0:0.1f}s")
+    return state
+
+
+def _read_chunks(source, usecols: list, chunksize: int):
+    parse_dates = ["timestamp"] if "timestamp" in usecols else None
+    return pd.read_csv(
+        source,
+        usecols=usecols,
+        chunksize=chunksize,
         parse_dates=parse_dates,
         dtype={"casa_id": "category"},
         low_memory=True,
-        memory_map=True
+        memory_map=isinstance(source, (str, Path))
     )
 
-    for i, df in enumerate(reader, start=1):
+# =========================
+# Modo paralelo por rangos de bytes
+# =========================
+class _ByteRange(io.RawIOBase):
+    """Archivo de solo lectura = encabezado del CSV + bytes [start, end) del mismo archivo."""
+
+    def __init__(self, path: Path, start: int, end: int):
+        self._f = open(path, "rb")
+        self._head = self._f.readline()
+        self._f.seek(start)
+        self._left = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._head:
+            n = min(len(b), len(self._head))
+            b[:n], self._head = self._head[:n], self._head[n:]
+            return n
+        if self._left <= 0:
+            return 0
+        n = self._f.readinto(memoryview(b)[:min(len(b), self._left)])
+        self._left -= n
+        return n
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+def _split_ranges(csv_path: Path, parts: int, start: int = None, end: int = None) -> list:
+    """Corta [start, end) (por defecto todo el cuerpo) en `parts` rangos alineados a inicio de línea."""
+    with open(csv_path, "rb") as f:
+        first = len(f.readline()) if start is None else start
+        size = csv_path.stat().st_size if end is None else end
+        cuts = [first]
+        for k in range(1, parts):
+            f.seek(first + (size - first) * k // parts)
+            f.readline()                      # avanza al siguiente inicio de línea
+            cuts.append(min(f.tell(), size))
+    cuts.append(size)
+    cuts = sorted(set(cuts))
+    return [(a, b) for a, b in zip(cuts[:-1], cuts[1:]) if b > a]
+
+def _process_range(csv_path: Path, start: int, end: int, usecols: list, chunksize: int, worker: int,
+                   seed: int = 42, verbose: bool = False):
+    """Worker: misma lógica por chunk que el modo serial, sobre un rango de bytes."""
+    t0 = time.time()
+    state = _new_state()
+    rng = np.random.default_rng(seed + worker)
+    with _ByteRange(csv_path, start, end) as src:
+        for i, df in enumerate(_read_chunks(io.BufferedReader(src, 1 << 20), usecols, chunksize), start=1):
+            t_chunk = time.time()
+            n = _process_chunk(df, state, rng, i, verbose=verbose)
+            if verbose and n is not None:
+                dt_chunk = time.time() - t_chunk
+                print(f"🔹 Chunk {i} | filas: {n:,} | {dt_chunk:0.1f}s | {n / max(dt_chunk, 1e-9):0.0f} reg/s "
+                      f"| total {time.time() - t0:0.0f}s")
+    return worker, state, end - start, time.time() - t0
+
+def _run_parallel(usecols: list, workers: int, t0: float, start: int = None, end: int = None,
+                  seed: int = 42) -> dict:
+    ranges = _split_ranges(CSV_PATH, workers, start, end)
+    print(f"🧵 Modo paralelo: {len(ranges)} rangos | {workers} workers")
+    state = _new_state()
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        futs = [ex.submit(_process_range, CSV_PATH, a, b, usecols, CHUNKSIZE, w, seed)
+                for w, (a, b) in enumerate(ranges)]
+        parts = [f.result() for f in futs]
+    for worker, part, nbytes, secs in sorted(parts, key=lambda p: p[0]):
+        rows = part["total_rows"]
+        print(f"🔹 Worker {worker} | filas: {rows:,} | {nbytes / 1e6:0.1f} MB | {secs:0.1f}s "
+              f"| {rows / max(secs, 1e-9):0.0f} reg/s")
+        _merge_state(state, part)
+    print(f"⏱️  Paralelo total {time.time() - t0:0.1f}s")
+    return state
+
+def _run_serial(usecols: list, t0: float) -> dict:
+    state = _new_state()
+    rng = np.random.default_rng(42)
+    for i, df in enumerate(_read_chunks(CSV_PATH, usecols, CHUNKSIZE), start=1):
         t_chunk = time.time()
-
-        # ===== Elegir la mejor fuente de hora para ESTE chunk =====
-        best_name, best_hours = _pick_best_hours(df)
-        if best_hours is None:
-            print(f"⚠️  Chunk {i} sin horas válidas (timestamp/fecha+hora_dia/fecha+hora). Saltando.")
-            continue
-
-        # Log de debug en los primeros 2 chunks
-        if i <= 2:
-            vc = best_hours.value_counts().sort_index()
-            total_h = int(best_hours.shape[0])
-            p0 = (best_hours == 0).mean()
-            print(f"✅ Fuente de hora elegida chunk {i}: {best_name} | total={total_h} | p(h=00)={p0:0.3f}")
-            print(f"⏱️  Dist horas chunk {i} (primeras 24):", dict(vc.head(24)))
-
-        # Construir dt coherente con la fuente elegida
-        if best_name == "timestamp":
-            dt = df.loc[best_hours.index, "timestamp"]
-        else:
-            # Creamos "HH:MM" a partir de best_hours y combinamos con fecha
-            hhmm = best_hours.astype(int).astype(str).str.zfill(2) + ":00"
-            fecha_txt = df.loc[best_hours.index, "fecha"].astype(str).str.strip() if "fecha" in df.columns else ""
-            dt = pd.to_datetime(fecha_txt + " " + hhmm, errors="coerce")
-
-        mask_valid = dt.notna()
-        if not mask_valid.any():
-            print(f"⚠️  Chunk {i}: después de armar dt no quedaron válidos. Saltando.")
+        n = _process_chunk(df, state, rng, i)
+        if n is None:
             continue
 
-        df = df.loc[mask_valid].copy()
-        dt = dt.loc[mask_valid]
-
-        # Numéricos
-        df["consumo_kwh"] = pd.to_numeric(df["consumo_kwh"], errors="coerce").fillna(0.0)
-        costo_est = pd.to_numeric(df.get("costo_estimado", np.nan), errors="coerce")
-        costo_mx  = pd.to_numeric(df.get("costo_mx", np.nan),        errors="coerce")
-        costo     = costo_est.fillna(costo_mx).fillna(0.0)
-
-        # Consumo por hora (rápido)
-        h    = dt.dt.hour.values
-        cons = df["consumo_kwh"].values
-        hora_sum += np.bincount(h, weights=cons, minlength=24)
-
-        # Consumo por día
-        dow = normalize_dow(df.get("dia_semana"), dt)
-        dsum = df.groupby(dow, observed=False)["consumo_kwh"].sum()
-        for d, v in dsum.items():
-            if d in dia_sum:
-                dia_sum[d] += float(v)
-
-        # Top municipios
-        if "casa_id" in df.columns:
-            msum = df.groupby("casa_id", observed=False)["consumo_kwh"].sum()
-            for k, v in msum.items():
-                muni_sum[k] = muni_sum.get(k, 0.0) + float(v)
-
-        # Muestra scatter (consumo vs costo)
-        n = len(df)
-        if n:
-            take = min(400, n)
-            idx = rng.choice(n, size=take, replace=False)
-            cons_sample  = cons[idx]
-            costo_sample = costo.iloc[idx].to_numpy(dtype=float, copy=False)
-            scatter.extend({"x": float(x), "y": float(y)} for x, y in zip(cons_sample, costo_sample))
-            if len(scatter) > 5000:
-                scatter = scatter[:5000]
-
-        total_rows += n
-
         dt_chunk = time.time() - t_chunk
         speed    = n / max(dt_chunk, 1e-9)
         elapsed  = time.time() - t0
@@ -254,49 +334,203 @@ def main():
         if MAX_CHUNKS and i >= MAX_CHUNKS:
             print(f"⏭️  Cortando por MAX_CHUNKS={MAX_CHUNKS}")
             break
+    return state
+
+# =========================
+# Modo incremental (checkpoint)
+# =========================
+def _sha1_range(f, start: int, end: int) -> str:
+    f.seek(max(0, start))
+    return hashlib.sha1(f.read(max(0, end - max(0, start)))).hexdigest()
+
+def _fingerprint(csv_path: Path, offset: int) -> dict:
+    """Huella del prefijo ya procesado: encabezado, inicio de los datos y la cola justo antes del offset."""
+    with open(csv_path, "rb") as f:
+        header = f.readline()
+        first = len(header)
+        return {
+            "header": hashlib.sha1(header).hexdigest(),
+            "head": _sha1_range(f, first, min(first + FP_BYTES, offset)),
+            "tail": _sha1_range(f, max(first, offset - FP_BYTES), offset),
+        }
+
+def _data_end(csv_path: Path) -> int:
+    """Fin de la última línea completa: una línea sin '\\n' final puede estar a medio escribir."""
+    size = csv_path.stat().st_size
+    with open(csv_path, "rb") as f:
+        pos = size
+        while pos > 0:
+            step = min(FP_BYTES, pos)
+            f.seek(pos - step)
+            block = f.read(step)
+            k = block.rfind(b"\n")
+            if k >= 0:
+                return pos - step + k + 1
+            pos -= step
+    return 0
+
+def _state_to_json(state: dict) -> dict:
+    return {**state, "hora_sum": state["hora_sum"].tolist(), **{k: state[k].to_json() for k in SKETCHES}}
+
+def _state_from_json(d: dict) -> dict:
+    return {**_new_state(), **d, "hora_sum": np.asarray(d["hora_sum"], dtype=np.float64),
+            **{k: cls.from_json(d[k]) for k, cls in SKETCHES.items()}}
+
+def _load_checkpoint(usecols: list):
+    """(offset, estado) si el checkpoint sigue siendo un prefijo válido del CSV; si no, None."""
+    if not CHECKPOINT.exists() and LEGACY_CHECKPOINT.exists() and "MINERIA_CHECKPOINT" not in os.environ:
+        # ubicación anterior (dentro de lo que se sirve): se mueve una vez para no perder el estado
+        CHECKPOINT.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(LEGACY_CHECKPOINT, CHECKPOINT)
+        print(f"📦 Checkpoint movido de {LEGACY_CHECKPOINT} a {CHECKPOINT}")
+    if not CHECKPOINT.exists():
+        return None
+    try:
+        ck = json.loads(CHECKPOINT.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        print(f"⚠️  Checkpoint ilegible ({e}); reconstrucción completa.")
+        return None
+    offset = int(ck.get("offset", 0))
+    if ck.get("csv_path") != str(CSV_PATH) or ck.get("usecols") != usecols:
+        print("⚠️  Checkpoint de otro CSV/columnas; reconstrucción completa.")
+        return None
+    if CSV_PATH.stat().st_size < offset or _fingerprint(CSV_PATH, offset) != ck.get("fingerprint"):
+        print("⚠️  El CSV fue truncado o reescrito; reconstrucción completa.")
+        return None
+    try:
+        return offset, _state_from_json(ck["state"])
+    except (KeyError, TypeError, ValueError):
+        print("⚠️  Checkpoint con formato anterior; reconstrucción completa.")
+        return None
+
+def _save_checkpoint(state: dict, offset: int, usecols: list):
+    CHECKPOINT.parent.mkdir(parents=True, exist_ok=True)
+    tmp = CHECKPOINT.with_suffix(".tmp")
+    tmp.write_text(json.dumps({
+        "csv_path": str(CSV_PATH), "usecols": usecols, "offset": offset,
+        "fingerprint": _fingerprint(CSV_PATH, offset), "state": _state_to_json(state),
+    }, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, CHECKPOINT)
+
+def _run_incremental(usecols: list, workers: int, t0: float) -> dict:
+    end = _data_end(CSV_PATH)
+    ck = _load_checkpoint(usecols)
+    if ck is not None:
+        start, state = ck
+        print(f"♻️  Incremental desde byte {start:,} ({state['total_rows']:,} filas previas)")
+    else:
+        with open(CSV_PATH, "rb") as f:
+            start = len(f.readline())
+        state = _new_state()
+    if end > start:
+        seed = 42 + state["total_rows"]   # otra semilla para el scatter de las filas nuevas
+        if workers > 1:
+            part = _run_parallel(usecols, workers, t0, start, end, seed)
+        else:
+            part = _process_range(CSV_PATH, start, end, usecols, CHUNKSIZE, 0, seed, verbose=True)[1]
+        print(f"➕ Filas nuevas: {part['total_rows']:,} | {(end - start) / 1e6:0.1f} MB")
+        _merge_state(state, part)
+    else:
+        print("✔️  Sin filas nuevas desde el último checkpoint.")
+    _save_checkpoint(state, end, usecols)
+    return state
+
+# =========================
+# Salidas
+# =========================
+def _write_outputs(state: dict, out_dir: Path = None):
+    out_dir = OUT_DIR if out_dir is None else out_dir
+    out_dir.mkdir(parents=True, exist_ok=True)
+    hora_sum, dia_sum, muni_sum = state["hora_sum"], state["dia_sum"], state["muni_sum"]
+    total_rows = state["total_rows"]
 
     # ===== KPIs y salidas =====
-    arr = np.array([p["x"] for p in scatter], dtype=float)
-    if arr.size >= 30:
-        mu, sd = arr.mean(), arr.std() or 1e-9
-        z = np.abs((arr - mu) / sd)
-        n_anom = int((z >= Z_THRESHOLD).sum())
+    # Anomalías: filas con |z| >= umbral sobre TODO el consumo; media/desv exactas (Welford) y
+    # masa de las colas mu ± thr·sd desde el t-digest.
+    w, td = state["consumo"], state["digest"]
+    if w.n >= 30:
+        mu, sd = w.mean, w.std or 1e-9
+        tails = td.cdf(mu - Z_THRESHOLD * sd) + (1.0 - td.cdf(mu + Z_THRESHOLD * sd))
+        n_anom = int(round(w.n * float(tails)))
     else:
         n_anom = 0
 
-    (OUT_DIR / "resumen.json").write_text(
+    state["cubo"].write(out_dir / "cubo")
+
+    anom = state["anom"].result(ANOM_TOP, ANOM_MIN_N)
+    (out_dir / "anomalias.json").write_text(json.dumps(anom, ensure_ascii=False), encoding="utf-8")
+
+    (out_dir / "resumen.json").write_text(
         json.dumps({
             "n_registros": int(total_rows),
             "n_municipios": int(len(muni_sum)),
             "n_anomalias": int(n_anom),
-            "z_threshold": Z_THRESHOLD
+            "n_anomalias_grupo": anom["total_anomalias"],   # por (casa_id, hora), ver anomalias.json
+            "z_threshold": Z_THRESHOLD,
+            "n_casas_aprox": state["casas"].count(),
+            "consumo_media": round(w.mean, 4),
+            "consumo_desv": round(w.std, 4),
+            "consumo_p50": round(float(td.quantile(0.5)), 4) if w.n else None,
+            "consumo_p99": round(float(td.quantile(0.99)), 4) if w.n else None,
         }, ensure_ascii=False),
         encoding="utf-8"
     )
 
     labels_h = [f"{h:02d}" for h in range(24)]
-    (OUT_DIR / "consumo_hora.json").write_text(
+    (out_dir / "consumo_hora.json").write_text(
         json.dumps({"labels": labels_h, "data": [round(float(v), 3) for v in hora_sum.tolist()]}, ensure_ascii=False),
         encoding="utf-8"
     )
 
-    (OUT_DIR / "consumo_dia.json").write_text(
+    (out_dir / "consumo_dia.json").write_text(
         json.dumps({"labels": [d.capitalize() for d in DIAS_ORDEN],
                     "data": [round(float(dia_sum.get(d, 0.0)), 3) for d in DIAS_ORDEN]}, ensure_ascii=False),
         encoding="utf-8"
     )
 
     top = sorted(muni_sum.items(), key=lambda kv: kv[1], reverse=True)[:10]
-    (OUT_DIR / "top_dispositivos.json").write_text(
+    (out_dir / "top_dispositivos.json").write_text(
         json.dumps([{"municipio": k, "total": round(float(v), 3)} for k, v in top], ensure_ascii=False),
         encoding="utf-8"
     )
 
-    (OUT_DIR / "consumo_vs_costo.json").write_text(
-        json.dumps(scatter[:1200], ensure_ascii=False),
+    (out_dir / "consumo_vs_costo.json").write_text(
+        json.dumps(state["scatter"].points(None if SCATTER_STRATA else SCATTER_MAX), ensure_ascii=False),
         encoding="utf-8"
     )
 
+    if PRECOMPRESS:
+        write_combined(out_dir)
+        precompress(out_dir, [COMBINED, "anomalias.json"])
+    else:
+        remove_combined(out_dir)   # un combinado de un build anterior ya no corresponde a las partes
+
+def main():
+    if COLUMNAR_DIR:
+        print(f"📥 Leyendo store columnar: {COLUMNAR_DIR}")
+        t0 = time.time()
+        _write_outputs(_run_columnar(Path(COLUMNAR_DIR), t0))
+        print(f"✅ Cache listo en {OUT_DIR} | Tiempo total: {time.time()-t0:0.1f}s")
+        return
+
+    if not CSV_PATH.exists():
+        raise FileNotFoundError(f"No se encontró el CSV en: {CSV_PATH}")
+
+    print(f"📥 Leyendo: {CSV_PATH}")
+    t0 = time.time()
+
+    USECOLS = detect_usecols(CSV_PATH)
+    print(f"🔎 Columnas detectadas para uso: {USECOLS}")
+
+    workers = WORKERS if WORKERS > 0 else (os.cpu_count() or 1)
+    if INCREMENTAL:
+        state = _run_incremental(USECOLS, workers, t0)
+    elif workers > 1:
+        state = _run_parallel(USECOLS, workers, t0)
+    else:
+        state = _run_serial(USECOLS, t0)
+
+    _write_outputs(state)
     print(f"✅ Cache listo en {OUT_DIR} | Tiempo total: {time.time()-t0:0.1f}s")
 
 if __name__ == "__main__":
@@ -0,0 +1,265 @@
+# ia_service/tools/build_predicciones.py
+# Predicción del siguiente periodo para el último registro de cada (casa_id, estado) del dataset,
+# calculada fuera de la API (programada junto a build_mineria_cache.py) y servida por /predicciones.
+#   1) lee el CSV por chunks (o por rangos de bytes en paralelo) y se queda con la fila más reciente
+#      de cada (casa_id, estado); empates de fecha -> la que aparece después en el archivo
+#   2) carga el modelo una vez (MODEL_STORE, bosque compilado o .pkl, como la API) y codifica todas
+#      esas filas juntas: el resultado es el mismo que un /predict_batch con todas ellas
+#   3) predice en bloques de PRED_BLOCK filas; con muchas filas los bloques se reparten en procesos
+#   4) escribe predicciones.npy (binario compacto, códigos + diccionarios en el JSON) y al final
+#      predicciones.json (+ .gz/.br), que es lo que la API vigila
+#   python tools/build_predicciones.py      (desde ia_service/)
+import os, io, sys, time, json
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.encoder import FeatureEncoder  # noqa: E402
+from app.forest import CompiledForest, META_FILE  # noqa: E402
+from app.model_store import ModelStore  # noqa: E402
+from parsing import NAT, chunk_datetimes, pick_hour_source  # noqa: E402
+from precompress import precompress  # noqa: E402
+
+# =========================
+# Config y rutas
+# =========================
+CSV_PATH = Path(os.getenv("PRED_CSV_PATH", os.getenv("MINERIA_CSV_PATH", r"C:\Users\joses\OneDrive\Documentos\web_aegis-main\backend\data\consumo_mx_2M.csv"))).resolve()
+OUT_DIR  = Path(os.getenv("PRED_OUT_DIR", str(Path(__file__).resolve().parents[1] / "data_cache"))).resolve()
+
+# Modelo: mismas variables y precedencia que app/main.py
+MODEL_PATH         = os.getenv("MODEL_PATH", "model_assets/modelo_rf_multioutput_ligero.pkl")
+TRAIN_COLUMNS_PATH = os.getenv("TRAIN_COLUMNS_PATH", "model_assets/train_columns.json")
+COMPILED_MODEL_DIR = os.getenv("COMPILED_MODEL_DIR", "model_assets/modelo_rf_compilado")
+MODEL_ENGINE       = os.getenv("MODEL_ENGINE", "auto")
+MODEL_STORE        = os.getenv("MODEL_STORE", "")
+
+CHUNKSIZE    = int(os.getenv("CHUNKSIZE", "500000"))
+WORKERS      = int(os.getenv("PRED_WORKERS", "1"))             # 1 = serial, 0 = todos los núcleos
+PRED_BLOCK   = int(os.getenv("PRED_BLOCK", "50000"))           # filas por model.predict
+PARALLEL_MIN = int(os.getenv("PRED_PARALLEL_MIN", "200000"))   # filas a predecir para usar procesos
+PRECOMPRESS  = os.getenv("CACHE_PRECOMPRESS", "1") == "1"
+
+# Mismas listas que app/main.py
+FEATURES_NUM = ["consumo_kwh", "consumo_pico", "promedio_hora", "costo_estimado"]
+FEATURES_CAT = ["estado", "hora_dia", "dia_semana", "casa_id", "modo_ecologico_activado"]
+ESTADOS = ["activo", "inactivo", "sin conexión", "suministro cortado"]
+DIAS_SEMANA = ["lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo"]
+MUNICIPIOS = [
+    "Puebla","Tehuacán","San Martín Texmelucan","San Pedro Cholula","San Andrés Cholula",
+    "Atlixco","Cuautlancingo","Huejotzingo","Amozoc","Tecamachalco","Xicotepec","Zacatlán","Huauchinango"
+]
+KEYS = ["casa_id", "estado"]
+TIME_COLS = ["timestamp", "fecha", "hora", "hora_dia"]
+
+PRED_DTYPE = np.dtype([("casa_id", "<i4"), ("estado", "<i2"), ("ts", "<i8"),
+                       ("consumo_kwh_next", "<f8"), ("costo_mx_next", "<f8")])
+
+
+def _usecols(csv_path: Path) -> list:
+    return pick_usecols(pd.read_csv(csv_path, nrows=0).columns.tolist())
+
+
+def pick_usecols(cols: list) -> list:
+    if "casa_id" not in cols or "consumo_kwh" not in cols:
+        raise ValueError("El CSV necesita al menos 'casa_id' y 'consumo_kwh'.")
+    if not ("timestamp" in cols or ("fecha" in cols and ("hora_dia" in cols or "hora" in cols))):
+        raise ValueError("Se requiere 'timestamp' o el par 'fecha' + ('hora_dia' o 'hora').")
+    return [c for c in dict.fromkeys(FEATURES_NUM + FEATURES_CAT + TIME_COLS) if c in cols]
+
+
+# =========================
+# Últimos registros por (casa_id, estado)
+# =========================
+def _latest(df: pd.DataFrame) -> pd.DataFrame:
+    """Fila más reciente por llave; el orden estable deja ganar a la posterior en empates."""
+    keys = [k for k in KEYS if k in df.columns]
+    return df.sort_values("ts", kind="stable").drop_duplicates(keys, keep="last")
+
+
+def latest_chunk(df: pd.DataFrame, source_hora: str = None):
+    """(últimos registros del chunk, fuente de hora); la fuente se elige en el primer chunk y se reutiliza."""
+    source_hora = source_hora or pick_hour_source(df.head(20000))
+    ts = chunk_datetimes(df, source_hora) if source_hora else np.full(len(df), NAT, dtype=np.int64)
+    ok = ts != NAT
+    feats = [c for c in FEATURES_NUM + FEATURES_CAT if c in df.columns]
+    part = df.loc[ok, feats].astype({c: object for c in feats if isinstance(df[c].dtype, pd.CategoricalDtype)})
+    for c in FEATURES_NUM:
+        if c in part:
+            part[c] = pd.to_numeric(part[c], errors="coerce").fillna(0.0)   # como _coerce_inputs
+    part["ts"] = ts[ok]
+    return _latest(part), source_hora
+
+
+def merge_latest(acc, part: pd.DataFrame) -> pd.DataFrame:
+    """Une `part` (posterior en el archivo) a lo acumulado."""
+    return part if acc is None else _latest(pd.concat([acc, part], ignore_index=True))
+
+
+def _scan(source, usecols: list, verbose: bool = True) -> pd.DataFrame:
+    """Últimos registros de un archivo (o rango de bytes), chunk por chunk; memoria ~ llaves distintas."""
+    acc, source_hora, t0 = None, None, time.time()
+    parse_dates = ["timestamp"] if "timestamp" in usecols else None
+    reader = pd.read_csv(source, usecols=usecols, chunksize=CHUNKSIZE, parse_dates=parse_dates,
+                         dtype={"casa_id": "category", "estado": "category", "hora_dia": "category",
+                                "dia_semana": "category"}, low_memory=True)
+    for i, df in enumerate(reader, start=1):
+        part, source_hora = latest_chunk(df, source_hora)
+        acc = merge_latest(acc, part)
+        if verbose:
+            print(f"🔹 Chunk {i} | filas: {len(df):,} | llaves: {len(acc):,} | total {time.time() - t0:0.1f}s")
+    return acc
+
+
+def _scan_range(csv_path: Path, start: int, end: int, usecols: list):
+    from build_mineria_cache import _ByteRange
+    with _ByteRange(csv_path, start, end) as src:
+        return _scan(io.BufferedReader(src, 1 << 20), usecols, verbose=False)
+
+
+def latest_records(csv_path: Path, workers: int) -> pd.DataFrame:
+    usecols = _usecols(csv_path)
+    if workers <= 1:
+        out = _scan(csv_path, usecols)
+    else:
+        from build_mineria_cache import _split_ranges
+        ranges = _split_ranges(csv_path, workers)
+        print(f"🧵 Lectura en paralelo: {len(ranges)} rangos | {workers} workers")
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            parts = list(ex.map(_scan_range, [csv_path] * len(ranges), [a for a, _ in ranges],
+                                [b for _, b in ranges], [usecols] * len(ranges)))
+        # los rangos van en orden de archivo: concatenados, los empates siguen favoreciendo al posterior
+        parts = [p for p in parts if p is not None]
+        out = _latest(pd.concat(parts, ignore_index=True)) if parts else None
+    return finish_latest(out)
+
+
+def finish_latest(out) -> pd.DataFrame:
+    if out is None or not len(out):
+        raise ValueError("No quedaron filas con fecha válida.")
+    return out.sort_values([k for k in KEYS if k in out.columns], kind="stable").reset_index(drop=True)
+
+
+# =========================
+# Modelo y scoring
+# =========================
+_model = None
+
+
+def load_model():
+    """(modelo, train_columns, etiqueta) con la misma precedencia que la API."""
+    if MODEL_STORE:
+        version, model = ModelStore(Path(MODEL_STORE)).get()
+        return model, model.train_columns, f"store:{version}"
+    compiled = Path(COMPILED_MODEL_DIR)
+    if MODEL_ENGINE == "compiled" or (MODEL_ENGINE == "auto" and (compiled / META_FILE).exists()):
+        model, label = CompiledForest.load(compiled, mmap=True), f"compilado:{compiled.name}"
+    else:
+        import joblib
+        model, label = joblib.load(MODEL_PATH), f"sklearn:{Path(MODEL_PATH).name}"
+    cols_path = Path(TRAIN_COLUMNS_PATH)
+    cols = json.loads(cols_path.read_text(encoding="utf-8")) if cols_path.exists() else getattr(model, "train_columns", None)
+    return model, cols, label
+
+
+def _init_worker():
+    global _model
+    _model = load_model()[0]
+
+
+def _predict_block(X: np.ndarray) -> np.ndarray:
+    return np.asarray(_model.predict(X), dtype=np.float64)
+
+
+def score(model, X: np.ndarray, workers: int) -> np.ndarray:
+    """Predicción por bloques; con PARALLEL_MIN filas o más y workers > 1, en un pool de procesos."""
+    global _model
+    blocks = [X[s:s + PRED_BLOCK] for s in range(0, len(X), PRED_BLOCK)] or [X]
+    if workers > 1 and len(X) >= PARALLEL_MIN and len(blocks) > 1:
+        print(f"🧵 Scoring en paralelo: {len(blocks)} bloques | {workers} workers")
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as ex:
+            return np.concatenate(list(ex.map(_predict_block, blocks)))
+    _model = model
+    return np.concatenate([_predict_block(b) for b in blocks])
+
+
+# =========================
+# Salidas
+# =========================
+def _write(path: Path, data: bytes):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def predict_latest(latest: pd.DataFrame, workers: int):
+    """(y (n, 2), etiqueta del modelo) para los últimos registros."""
+    model, cols, label = load_model()
+    if cols is None:
+        raise ValueError(f"Sin train_columns ({TRAIN_COLUMNS_PATH}); se necesitan para codificar.")
+    enc = FeatureEncoder(cols, FEATURES_NUM, FEATURES_CAT, ESTADOS, DIAS_SEMANA, MUNICIPIOS)
+    t1 = time.time()
+    X = enc.encode_columns({c: latest[c].tolist() if c in latest else None for c in FEATURES_NUM + FEATURES_CAT},
+                           len(latest))
+    y = score(model, X, workers)
+    t_score = time.time() - t1
+    print(f"🌲 {label} | {len(X):,} filas en {t_score:0.2f}s ({len(X) / max(t_score, 1e-9):,.0f} filas/s)")
+    return y, label
+
+
+def write_outputs(latest: pd.DataFrame, y: np.ndarray, label: str, secs: float, out_dir: Path = None):
+    out_dir = OUT_DIR if out_dir is None else out_dir
+    out_dir.mkdir(parents=True, exist_ok=True)
+    casa_codes, casas = pd.factorize(latest["casa_id"], sort=True)
+    est_codes, estados = pd.factorize(latest["estado"] if "estado" in latest else pd.Series([None] * len(latest)),
+                                      sort=True)
+    arr = np.empty(len(latest), dtype=PRED_DTYPE)
+    arr["casa_id"], arr["estado"], arr["ts"] = casa_codes, est_codes, latest["ts"].to_numpy(np.int64)
+    arr["consumo_kwh_next"], arr["costo_mx_next"] = y[:, 0], y[:, 1]
+    buf = io.BytesIO()
+    np.save(buf, arr)
+    _write(out_dir / "predicciones.npy", buf.getvalue())
+
+    fechas = pd.to_datetime(latest["ts"].to_numpy(np.int64)).strftime("%Y-%m-%dT%H:%M:%S")
+    payload = {
+        "modelo": label,
+        "generado": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "n": int(len(latest)),
+        "segundos": round(secs, 2),
+        "diccionarios": {"casa_id": [str(c) for c in casas], "estado": [str(e) for e in estados]},
+        "predicciones": [{
+            "casa_id": None if pd.isna(c) else str(c),
+            "estado": None if "estado" not in latest or pd.isna(e) else str(e),
+            "fecha_ultimo": f,
+            "consumo_kwh": round(float(k), 4),
+            "consumo_kwh_next": round(float(a), 4),
+            "costo_mx_next": round(float(b), 4),
+        } for c, e, f, k, a, b in zip(latest["casa_id"], latest.get("estado", [None] * len(latest)), fechas,
+                                      latest["consumo_kwh"], y[:, 0], y[:, 1])],
+    }
+    # mismo formato compacto que JSONResponse: la API lo sirve tal cual
+    body = json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+    _write(out_dir / "predicciones.json", body.encode("utf-8"))
+    if PRECOMPRESS:
+        precompress(out_dir, ["predicciones.json"])
+
+
+def main():
+    if not CSV_PATH.exists():
+        raise FileNotFoundError(f"No se encontró el CSV en: {CSV_PATH}")
+    print(f"📥 Leyendo: {CSV_PATH}")
+    t0 = time.time()
+    workers = WORKERS if WORKERS > 0 else (os.cpu_count() or 1)
+
+    latest = latest_records(CSV_PATH, workers)
+    t_scan = time.time() - t0
+    print(f"🔎 Últimos registros: {len(latest):,} llaves ({', '.join(k for k in KEYS if k in latest)}) | {t_scan:0.1f}s")
+
+    y, label = predict_latest(latest, workers)
+    write_outputs(latest, y, label, time.time() - t0)
+    print(f"✅ Predicciones listas en {OUT_DIR} | Tiempo total: {time.time() - t0:0.1f}s")
+
+
+if __name__ == "__main__":
+    main()
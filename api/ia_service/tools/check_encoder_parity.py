@@ -0,0 +1,97 @@
+# ia_service/tools/check_encoder_parity.py
+# Verifica que FeatureEncoder produzca exactamente la misma matriz que _coerce_inputs (pandas),
+# también en modo fixed (pronóstico), y que en ese modo cada fila no dependa del resto del lote.
+#   python tools/check_encoder_parity.py            (desde ia_service/)
+import sys, time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app import main  # noqa: E402
+from app.main import (Registro, FEATURES_NUM, FEATURES_CAT, ESTADOS,  # noqa: E402
+                      DIAS_SEMANA, MUNICIPIOS, _coerce_inputs)
+from app.encoder import FeatureEncoder  # noqa: E402
+
+TRIALS = 300
+rng = np.random.default_rng(7)
+
+
+def _train_columns():
+    """train_columns reales si existen; si no, las que produciría el entrenamiento con todas las categorías."""
+    if main.train_columns is not None:
+        return main.train_columns
+    cats = {
+        "estado": ESTADOS, "hora_dia": [f"{h:02d}:00" for h in range(24)],
+        "dia_semana": DIAS_SEMANA, "casa_id": MUNICIPIOS,
+    }
+    n = max(len(v) for v in cats.values())
+    full = pd.DataFrame({c: [0.0] * n for c in FEATURES_NUM})
+    for c, vals in cats.items():
+        full[c] = [vals[i % len(vals)] for i in range(n)]
+    full["modo_ecologico_activado"] = 0
+    return list(pd.get_dummies(full[FEATURES_NUM + FEATURES_CAT], drop_first=True).columns)
+
+
+def _random_value(col):
+    r = rng.random()
+    if col == "estado":
+        return None if r < 0.02 else rng.choice(ESTADOS + ["ACTIVO", "otro"])
+    if col == "dia_semana":
+        return None if r < 0.02 else rng.choice(DIAS_SEMANA + ["  Martes ", "SÁBADO", "xx"])
+    if col == "hora_dia":
+        return None if r < 0.02 else rng.choice([f"{rng.integers(0, 24):02d}:00", "7:30", "23:59:59", ""])
+    if col == "casa_id":
+        return None if r < 0.02 else rng.choice(MUNICIPIOS + ["Desconocido"])
+    if col == "modo_ecologico_activado":
+        return None if r < 0.02 else int(rng.integers(0, 2))
+    return float(rng.normal(1.0, 2.0))
+
+
+def _random_batch(n):
+    regs = []
+    for _ in range(n):
+        d = {c: _random_value(c) for c in FEATURES_NUM + FEATURES_CAT}
+        regs.append(Registro.model_construct(**d))  # sin validar: permite nulos explícitos
+    return regs
+
+
+def main_check():
+    cols = _train_columns()
+    main.train_columns = cols
+    enc = FeatureEncoder(cols, FEATURES_NUM, FEATURES_CAT, ESTADOS, DIAS_SEMANA, MUNICIPIOS)
+
+    t_pd = t_enc = 0.0
+    for trial in range(TRIALS):
+        n = int(rng.choice([1, 2, 3, 10, 100, 1000]))
+        regs = _random_batch(n)
+
+        t = time.perf_counter()
+        ref = _coerce_inputs(pd.DataFrame([r.__dict__ for r in regs])).to_numpy(dtype=np.float64)
+        t_pd += time.perf_counter() - t
+
+        t = time.perf_counter()
+        got = enc.encode_records(regs)
+        t_enc += time.perf_counter() - t
+
+        if ref.shape != got.shape or not np.array_equal(ref, got):
+            bad = np.argwhere(ref != got)[:5]
+            print(f"❌ Diferencia en trial {trial} (n={n}): {[(int(i), cols[j]) for i, j in bad]}")
+            sys.exit(1)
+
+        # modo fixed: pandas con categorías completas == encoder == fila por fila
+        df = pd.DataFrame([r.__dict__ for r in regs])
+        ref = _coerce_inputs(df, fixed=True).to_numpy(dtype=np.float64)
+        got = enc.encode_columns({c: df[c].tolist() for c in df.columns}, n, fixed=True)
+        solo = np.vstack([enc.encode_columns({c: [v] for c, v in r.__dict__.items()}, 1, fixed=True)
+                          for r in regs[:20]])
+        if not np.array_equal(ref, got) or not np.array_equal(got[:20], solo):
+            print(f"❌ Diferencia en modo fixed, trial {trial} (n={n})")
+            sys.exit(1)
+
+    print(f"✅ Paridad OK en {TRIALS} lotes | pandas {t_pd:0.2f}s | encoder {t_enc:0.2f}s "
+          f"| x{t_pd / max(t_enc, 1e-9):0.1f}")
+
+
+if __name__ == "__main__":
+    main_check()
@@ -0,0 +1,71 @@
+# ia_service/tools/check_executor.py
+# Verifica la contabilidad de lugares de app/executor.py: una tarea cancelada mientras espera en
+# cola (cliente desconectado -> asyncio cancela el Future) libera su lugar aunque nunca corra, y
+# después de llenar y cancelar la cola muchas veces se sigue admitiendo trabajo (sin 429 pegados).
+#   python tools/check_executor.py            (desde ia_service/)
+import asyncio, sys, threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.executor import InferenceExecutor, QueueFull  # noqa: E402
+
+WORKERS, QUEUE, ROUNDS = 2, 3, 10
+
+
+def _check(cond: bool, msg: str):
+    if not cond:
+        raise SystemExit(f"❌ {msg}")
+    print(f"✅ {msg}")
+
+
+def check_cancel_in_queue():
+    ex = InferenceExecutor(WORKERS, QUEUE)
+    gate = threading.Event()
+    try:
+        running = [ex.submit(gate.wait) for _ in range(WORKERS)]      # ocupan los hilos
+        queued = [ex.submit(lambda: None) for _ in range(QUEUE)]     # esperan en cola
+        try:
+            ex.submit(lambda: None)
+            _check(False, "cola llena -> QueueFull")
+        except QueueFull:
+            _check(True, "cola llena -> QueueFull")
+        _check(all(f.cancel() for f in queued), "las tareas en cola se pueden cancelar")
+        st = ex.stats()
+        _check(st["queued"] == 0 and st.get("cancelled") == QUEUE, f"cancelar libera sus lugares ({st})")
+        extra = ex.submit(lambda: 42)                                # hay lugar otra vez
+    finally:
+        gate.set()                                                   # si algo falla, que el proceso pueda salir
+    _check(extra.result(5) == 42 and all(f.result(5) for f in running), "se admite y corre trabajo nuevo")
+    _check(ex.stats()["queued"] == 0 and ex.stats()["running"] == 0, "al terminar no quedan lugares ocupados")
+
+
+async def _cancel_rounds(ex: InferenceExecutor, gate: threading.Event):
+    # como un request de /predict que se cancela mientras su tarea sigue en cola
+    for _ in range(ROUNDS):
+        tasks = [asyncio.ensure_future(ex.run(lambda: None)) for _ in range(QUEUE)]
+        await asyncio.sleep(0)
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    gate.set()
+    return await ex.run(lambda: "ok")
+
+
+def check_cancel_async():
+    ex = InferenceExecutor(WORKERS, QUEUE)
+    gate = threading.Event()
+    blockers = [ex.submit(gate.wait) for _ in range(WORKERS)]
+    try:
+        out = asyncio.run(asyncio.wait_for(_cancel_rounds(ex, gate), 10))
+    finally:
+        gate.set()
+    for f in blockers:
+        f.result(5)
+    st = ex.stats()
+    _check(out == "ok" and st["queued"] == 0 and st.get("cancelled") == ROUNDS * QUEUE,
+           f"{ROUNDS} rondas de cancelaciones async no agotan la cola ({st})")
+
+
+if __name__ == "__main__":
+    check_cancel_in_queue()
+    check_cancel_async()
@@ -0,0 +1,110 @@
+# ia_service/tools/check_stream.py
+# Verifica /predict_stream contra /predict_batch: mismas predicciones para filas válidas (NDJSON y CSV)
+# y {"error": ...} en la posición de cada fila que /predict_batch rechazaría con 422.
+#   python tools/check_stream.py            (desde ia_service/; necesita MODEL_PATH / TRAIN_COLUMNS_PATH)
+import csv, io, json, sys
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from fastapi.testclient import TestClient  # noqa: E402
+from app import main  # noqa: E402
+from app.main import FEATURES_NUM, FEATURES_CAT, ESTADOS, DIAS_SEMANA, MUNICIPIOS  # noqa: E402
+
+N = 500
+rng = np.random.default_rng(11)
+
+# filas que Registro rechaza (422 en /predict_batch) y que el stream debe marcar como error
+INVALIDAS = [
+    {"consumo_kwh": "x", "consumo_pico": 1, "promedio_hora": 1, "costo_estimado": 1},
+    {"consumo_pico": 1, "promedio_hora": 1, "costo_estimado": 1},
+    {"consumo_kwh": None, "consumo_pico": 1, "promedio_hora": 1, "costo_estimado": 1},
+    {"consumo_kwh": 1, "consumo_pico": [1], "promedio_hora": 1, "costo_estimado": 1},
+    {"consumo_kwh": 1, "consumo_pico": 1, "promedio_hora": 1, "costo_estimado": 1, "modo_ecologico_activado": 1.5},
+    {"consumo_kwh": 1, "consumo_pico": 1, "promedio_hora": 1, "costo_estimado": 1, "estado": 5},
+]
+# no finitos: Registro los acepta, pero el stream los rechaza (no hay predicción con sentido)
+NO_FINITAS = ['{"consumo_kwh": NaN, "consumo_pico": 1, "promedio_hora": 1, "costo_estimado": 1}',
+              '{"consumo_kwh": 1, "consumo_pico": Infinity, "promedio_hora": 1, "costo_estimado": 1}']
+
+
+def _random_rows(n):
+    rows = []
+    for _ in range(n):
+        r = {c: round(float(rng.normal(1.0, 2.0)), 4) for c in FEATURES_NUM}
+        r.update(estado=str(rng.choice(ESTADOS)), hora_dia=f"{rng.integers(0, 24):02d}:00",
+                 dia_semana=str(rng.choice(DIAS_SEMANA)), casa_id=str(rng.choice(MUNICIPIOS)),
+                 modo_ecologico_activado=int(rng.integers(0, 2)))
+        rows.append(r)
+    return rows
+
+
+def _stream(c, body: str, formato: str) -> list:
+    r = c.post(f"/predict_stream?formato={formato}", content=body.encode("utf-8"))
+    assert r.status_code == 200, (r.status_code, r.text[:200])
+    return [json.loads(l) for l in r.text.splitlines() if l]
+
+
+def _fail(msg):
+    print(f"❌ {msg}")
+    sys.exit(1)
+
+
+def _same(out: list, ref: list, tag: str):
+    got = np.array([[o["consumo_kwh_next"], o["costo_mx_next"]] for o in out])
+    exp = np.array([[o["consumo_kwh_next"], o["costo_mx_next"]] for o in ref])
+    if got.shape != exp.shape or not np.array_equal(got, exp):
+        _fail(f"{tag}: predicciones distintas a /predict_batch")
+
+
+def main_check():
+    with TestClient(main.app) as c:
+        main.model_ready.wait(120)
+        rows = _random_rows(N)
+        ref = c.post("/predict_batch", json={"registros": rows}).json()["predicciones"]
+
+        # --- paridad: NDJSON y CSV válidos ---
+        out = _stream(c, "\n".join(json.dumps(r) for r in rows), "ndjson")
+        _same(out[:-1], ref, "NDJSON")
+        buf = io.StringIO()
+        w = csv.DictWriter(buf, fieldnames=FEATURES_NUM + FEATURES_CAT)
+        w.writeheader()
+        w.writerows(rows)
+        out = _stream(c, buf.getvalue(), "csv")
+        _same(out[:-1], ref, "CSV")
+
+        # --- filas inválidas intercaladas: error en su lugar, el resto igual que /predict_batch ---
+        for bad in INVALIDAS:
+            if c.post("/predict_batch", json={"registros": [bad]}).status_code != 422:
+                _fail(f"/predict_batch aceptó {bad}")
+        malas = [json.dumps(b) for b in INVALIDAS] + NO_FINITAS
+        lines, pos = [], []
+        for i, r in enumerate(rows[:50]):
+            lines.append(json.dumps(r))
+            if i < len(malas):
+                pos.append(len(lines))
+                lines.append(malas[i])
+        out = _stream(c, "\n".join(lines), "ndjson")[:-1]
+        if len(out) != len(lines):
+            _fail(f"salida de {len(out)} líneas para {len(lines)} de entrada")
+        for p in pos:
+            if "error" not in out[p]:
+                _fail(f"línea {p} ({lines[p]}) no se marcó como error: {out[p]}")
+        _same([o for i, o in enumerate(out) if i not in pos], ref[:50], "NDJSON con inválidas")
+
+        # --- CSV sin una columna obligatoria: todas las filas con error ---
+        buf = io.StringIO()
+        cols = [c_ for c_ in FEATURES_NUM + FEATURES_CAT if c_ != "consumo_pico"]
+        w = csv.DictWriter(buf, fieldnames=cols, extrasaction="ignore")
+        w.writeheader()
+        w.writerows(rows[:20])
+        out = _stream(c, buf.getvalue(), "csv")
+        if not all("error" in o for o in out[:-1]) or out[-1]["resumen"]["errores"] != 20:
+            _fail(f"CSV sin consumo_pico no se rechazó: {out[:2]} {out[-1]}")
+
+    print(f"✅ /predict_stream = /predict_batch en {N} filas (NDJSON y CSV) "
+          f"y {len(malas)} filas inválidas + CSV sin columna rechazados")
+
+
+if __name__ == "__main__":
+    main_check()
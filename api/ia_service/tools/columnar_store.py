@@ -0,0 +1,201 @@
+# ia_service/tools/columnar_store.py
+# Convierte el CSV crudo UNA vez a un dataset columnar tipado, particionado por mes:
+#   <store>/meta.json                 columnas, dtypes, diccionarios de categorías, filas por partición
+#   <store>/<YYYY-MM>/<columna>.bin   arreglo crudo little-endian (se abre con np.memmap)
+# Ambos builders leen de aquí solo las particiones/columnas que necesitan (COLUMNAR_DIR=<store>).
+# Por defecto el store va en data_cache/_state/columnar: es una copia del dataset y no se despliega.
+# Si el CSV de origen cambió (tamaño o mtime distintos a los de meta.json) el store no se lee.
+#   python tools/columnar_store.py [csv] [store]
+import os, sys, json, time, shutil
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+import pandas as pd
+
+CSV_PATH  = Path(sys.argv[1] if len(sys.argv) > 1 else os.getenv("MINERIA_CSV_PATH", r"C:\Users\joses\OneDrive\Documentos\web_aegis-main\backend\data\consumo_mx_2M.csv")).resolve()
+STORE_DIR = Path(sys.argv[2] if len(sys.argv) > 2 else os.getenv("COLUMNAR_DIR", str(Path(__file__).resolve().parents[1] / "data_cache" / "_state" / "columnar"))).resolve()
+CHUNKSIZE = int(os.getenv("CHUNKSIZE", "500000"))
+
+META_FILE = "meta.json"
+NAT = np.iinfo(np.int64).min   # representación int64 de NaT
+
+# Esquema: nombre -> dtype en disco
+METRICS = ["consumo_kwh", "costo_mx", "costo_estimado", "consumo_pico", "promedio_hora", "modo_ecologico_activado"]
+CATEGORIES = ["casa_id", "estado", "dispositivo", "usuario", "hora_dia"]
+SCHEMA = {
+    "ts": "int64",         # timestamp normalizado (misma regla que build_mineria_cache), ns; NaT = int64 min
+    "fecha": "int64",      # columna 'fecha' tal cual la parsea build_dashboard_cache, ns
+    "hora": "int8",        # hora de ts (-1 si NaT)
+    "dia_semana": "int8",  # índice en DIAS_ORDEN, ya normalizado (-1 si no se pudo)
+    **{c: "float32" for c in METRICS},
+    **{c: "int32" for c in CATEGORIES},   # códigos; -1 = nulo
+}
+
+
+class StaleStore(RuntimeError):
+    """El CSV de origen cambió desde la ingesta: hay que volver a correr columnar_store.py."""
+
+
+class ColumnarStore:
+    """
+    Lectura de un store generado por `ingest`. Las columnas se abren con np.memmap (solo lectura).
+    Con check_source (por defecto) lanza StaleStore si el CSV de origen ya no es el que se ingirió.
+    """
+
+    def __init__(self, path: Path, check_source: bool = True):
+        self.path = Path(path)
+        self.meta = json.loads((self.path / META_FILE).read_text(encoding="utf-8"))
+        self.columns: List[str] = list(self.meta["columnas"])
+        if check_source:
+            self._check_source()
+
+    def _check_source(self):
+        src = self.meta.get("fuente") or {}
+        csv = Path(src.get("csv", ""))
+        if not src.get("csv") or not csv.exists():
+            print(f"⚠️  No se encontró el CSV de origen del store ({src.get('csv')}); no se puede verificar si está al día.")
+            return
+        st = csv.stat()
+        if st.st_size != src.get("bytes") or st.st_mtime != src.get("mtime"):
+            raise StaleStore(f"El store {self.path} es de una versión anterior de {csv} "
+                             f"(tamaño/mtime distintos); vuelve a generarlo: python tools/columnar_store.py {csv} {self.path}")
+
+    def partitions(self) -> List[str]:
+        return sorted(self.meta["particiones"])
+
+    def rows(self, part: str) -> int:
+        return int(self.meta["particiones"][part])
+
+    def categories(self, name: str) -> list:
+        return self.meta["categorias"].get(name, [])
+
+    def column(self, part: str, name: str) -> np.ndarray:
+        dtype = np.dtype(SCHEMA[name])
+        n = self.rows(part)
+        if name not in self.columns or n == 0:
+            fill = np.nan if dtype.kind == "f" else (NAT if name in ("ts", "fecha") else -1)
+            return np.full(n, fill, dtype=dtype)
+        return np.memmap(self.path / part / f"{name}.bin", dtype=dtype, mode="r", shape=(n,))
+
+    def frame(self, part: str, columns: Iterable[str]) -> pd.DataFrame:
+        """DataFrame de una partición: categóricas decodificadas (sin copiar textos) y fechas datetime64."""
+        out = {}
+        for c in columns:
+            arr = self.column(part, c)
+            if c in CATEGORIES:
+                out[c] = pd.Categorical.from_codes(np.asarray(arr), categories=self.categories(c))
+            elif c in ("ts", "fecha"):
+                out[c] = np.asarray(arr).view("datetime64[ns]")
+            else:
+                out[c] = np.asarray(arr)
+        return pd.DataFrame(out)
+
+
+# =========================
+# Ingesta CSV -> store
+# =========================
+class _Writer:
+    def __init__(self, tmp_dir: Path, columns: List[str]):
+        self.dir = tmp_dir
+        self.columns = columns
+        self.cats: Dict[str, list] = {c: [] for c in CATEGORIES if c in columns}
+        self._cat_index: Dict[str, Dict[str, int]] = {c: {} for c in self.cats}
+        self.rows: Dict[str, int] = {}
+
+    def codes(self, name: str, values: pd.Series) -> np.ndarray:
+        """Códigos estables entre chunks: las categorías nuevas se agregan al final del diccionario."""
+        index = self._cat_index[name]
+        vals = values.astype("string")
+        for u in pd.unique(vals.dropna()):
+            if u not in index:
+                index[u] = len(self.cats[name])
+                self.cats[name].append(u)
+        return pd.Categorical(vals, categories=self.cats[name]).codes.astype(np.int32)
+
+    def append(self, part: str, arrays: Dict[str, np.ndarray]):
+        d = self.dir / part
+        d.mkdir(exist_ok=True)
+        for c, arr in arrays.items():
+            with open(d / f"{c}.bin", "ab") as f:
+                f.write(np.ascontiguousarray(arr, dtype=SCHEMA[c]).tobytes())
+        self.rows[part] = self.rows.get(part, 0) + len(next(iter(arrays.values())))
+
+
+def _ns(dt: pd.Series) -> np.ndarray:
+    return pd.to_datetime(dt, errors="coerce").to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+
+def ingest(csv_path: Path = CSV_PATH, store_dir: Path = STORE_DIR, chunksize: int = CHUNKSIZE) -> dict:
+    # Reutiliza exactamente las reglas de hora/día del builder de minería
+    import build_mineria_cache as bm
+    from parsing import NS_DAY, NS_HOUR, dow_codes
+
+    st = csv_path.stat()   # antes de leer: si el CSV cambia durante la ingesta, el store queda viejo
+    header = pd.read_csv(csv_path, nrows=0).columns.tolist()
+    usecols = [c for c in dict.fromkeys(bm.CANDIDATE_COLS + ["fecha"] + METRICS + CATEGORIES) if c in header]
+    stored = ["ts", "fecha", "hora", "dia_semana"] + [c for c in METRICS + CATEGORIES if c in header]
+
+    tmp = store_dir.with_name(store_dir.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    w = _Writer(tmp, stored)
+
+    t0 = time.time()
+    reader = pd.read_csv(csv_path, usecols=usecols, chunksize=chunksize,
+                         parse_dates=["timestamp"] if "timestamp" in usecols else None,
+                         dtype={c: "string" for c in CATEGORIES if c in usecols}, low_memory=True)
+    total = 0
+    for i, df in enumerate(reader, start=1):
+        t_chunk = time.time()
+        df = df.reset_index(drop=True)
+        dt = bm._chunk_dt(df, i, verbose=False)
+        ts = np.full(len(df), NAT, dtype=np.int64)
+        if dt is not None:
+            ts[dt.index.to_numpy()] = _ns(dt)
+        fecha = _ns(df["fecha"]) if "fecha" in df.columns else ts.copy()
+
+        dow_code = dow_codes(df.get("dia_semana"), ts)
+        hora = np.where(ts != NAT, (ts % NS_DAY) // NS_HOUR, -1).astype(np.int8)
+
+        arrays = {"ts": ts, "fecha": fecha, "hora": hora, "dia_semana": dow_code}
+        for c in METRICS:
+            if c in df.columns:
+                arrays[c] = pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=np.float32)
+        for c in CATEGORIES:
+            if c in df.columns:
+                arrays[c] = w.codes(c, df[c])
+
+        # partición = mes de 'fecha' (lo que agrupa el dashboard) o, si falta, de ts
+        key = np.where(fecha != NAT, fecha, ts)
+        keep = key != NAT
+        months = key[keep].view("datetime64[ns]").astype("datetime64[M]")
+        for m in np.unique(months):
+            sel = np.flatnonzero(keep)[months == m]
+            w.append(str(m), {c: a[sel] for c, a in arrays.items()})
+        total += int(keep.sum())
+        print(f"🔹 Chunk {i} | filas: {len(df):,} | {time.time() - t_chunk:0.1f}s")
+
+    meta = {
+        "columnas": stored,
+        "dtypes": {c: SCHEMA[c] for c in stored},
+        "categorias": w.cats,
+        "dias_orden": bm.DIAS_ORDEN,
+        "particiones": w.rows,
+        "fuente": {"csv": str(csv_path), "bytes": st.st_size, "mtime": st.st_mtime},
+        "filas": total,
+    }
+    (tmp / META_FILE).write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+    # Reemplazo del store anterior solo si lo es (tiene meta.json)
+    if store_dir.exists():
+        if not (store_dir / META_FILE).exists():
+            raise RuntimeError(f"{store_dir} existe y no es un store columnar; no se reemplaza.")
+        shutil.rmtree(store_dir)
+    tmp.rename(store_dir)
+    print(f"✅ Store columnar en {store_dir} | {total:,} filas | {len(w.rows)} particiones | {time.time() - t0:0.1f}s")
+    return meta
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    ingest()
@@ -0,0 +1,74 @@
+# ia_service/tools/compile_forest.py
+# Exporta el RF multi-salida (.pkl) a arreglos NumPy para app/forest.py, verifica paridad
+# contra model.predict y mide latencia en lotes de 1, 100 y 10k filas.
+#   python tools/compile_forest.py [modelo.pkl] [train_columns.json] [dir_salida]
+import os, sys, json, time
+from pathlib import Path
+import numpy as np
+import joblib
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.forest import CompiledForest, export_forest  # noqa: E402
+
+MODEL_PATH = Path(sys.argv[1] if len(sys.argv) > 1 else os.getenv("MODEL_PATH", "model_assets/modelo_rf_multioutput_ligero.pkl"))
+TRAIN_COLUMNS_PATH = Path(sys.argv[2] if len(sys.argv) > 2 else os.getenv("TRAIN_COLUMNS_PATH", "model_assets/train_columns.json"))
+OUT_DIR = Path(sys.argv[3] if len(sys.argv) > 3 else os.getenv("COMPILED_MODEL_DIR", "model_assets/modelo_rf_compilado"))
+
+PARITY_ROWS = int(os.getenv("PARITY_ROWS", "20000"))
+BENCH_SIZES = [1, 100, 10_000]
+BENCH_REPEAT = int(os.getenv("BENCH_REPEAT", "20"))
+
+
+NUMERIC = {"consumo_kwh", "consumo_pico", "promedio_hora", "costo_estimado"}
+
+
+def _sample_X(n_rows: int, columns, rng) -> np.ndarray:
+    """Numéricas continuas; dummies y modo_ecologico_activado en 0/1."""
+    X = rng.integers(0, 2, size=(n_rows, len(columns))).astype(np.float64)
+    for j, c in enumerate(columns):
+        if c in NUMERIC or c.startswith("f"):
+            X[:, j] = rng.gamma(1.5, 1.0, size=n_rows)
+    return X
+
+
+def _bench(fn, X, repeat) -> float:
+    fn(X)  # calentamiento
+    t = time.perf_counter()
+    for _ in range(repeat):
+        fn(X)
+    return (time.perf_counter() - t) / repeat
+
+
+def main():
+    print(f"📥 Modelo: {MODEL_PATH}")
+    model = joblib.load(MODEL_PATH)
+    cols = json.loads(TRAIN_COLUMNS_PATH.read_text(encoding="utf-8")) if TRAIN_COLUMNS_PATH.exists() else None
+
+    t0 = time.time()
+    meta = export_forest(model, OUT_DIR, cols)
+    print(f"✅ Exportado en {OUT_DIR} | árboles={meta['n_trees']} nodos={meta['n_nodes']:,} "
+          f"prof_max={meta['max_depth']} | {time.time() - t0:0.1f}s")
+
+    forest = CompiledForest.load(OUT_DIR, mmap=True)
+    rng = np.random.default_rng(0)
+    columns = cols or [f"f{j}" for j in range(meta["n_features"])]
+
+    X = _sample_X(PARITY_ROWS, columns, rng)
+    ref = np.asarray(model.predict(X), dtype=np.float64).reshape(len(X), -1)
+    got = forest.predict(X)
+    if not np.array_equal(ref, got):
+        print(f"❌ Paridad: max |dif| = {np.abs(ref - got).max():.3e}")
+        sys.exit(1)
+    print(f"✅ Paridad exacta con model.predict en {PARITY_ROWS:,} filas")
+
+    print("⏱️  Latencia por llamada (ms):")
+    for n in BENCH_SIZES:
+        Xb = _sample_X(n, columns, rng)
+        rep = max(1, BENCH_REPEAT if n < 10_000 else BENCH_REPEAT // 4)
+        t_sk = _bench(model.predict, Xb, rep)
+        t_np = _bench(forest.predict, Xb, rep)
+        print(f"   n={n:>6,} | sklearn {t_sk * 1e3:8.2f} | compilado {t_np * 1e3:8.2f} | x{t_sk / t_np:0.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# ia_service/tools/cubo.py
+# Cubo de consumo / costo por (municipio × día × hora) para /mineria/query.
+# Mientras se lee se acumula disperso (solo celdas con datos) y al final se escribe denso:
+#   <out>/cubo/consumo.npy  float32 (municipios, días, 24)
+#   <out>/cubo/costo.npy    float32 (municipios, días, 24)
+#   <out>/cubo/n.npy        int32   (municipios, días, 24)
+#   <out>/cubo/meta.json    municipios, fecha_inicio, n_dias (se escribe al final: marca de versión)
+# Mismo contrato que tools/sketches.py: update / merge / to_json / from_json.
+import json, os
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+KEYS = ["casa", "dia", "hora"]
+SIN_MUNICIPIO = "(sin municipio)"
+NS_DAY = 24 * 3600 * 10**9
+ARRAYS = {"consumo": np.float32, "costo": np.float32, "n": np.int32}
+
+
+class Cube:
+    """Sumas por (casa, día desde 1970-01-01, hora); disperso en memoria, denso al escribir."""
+
+    def __init__(self):
+        self.cells = pd.DataFrame({"consumo": [], "costo": [], "n": []},
+                                  index=pd.MultiIndex.from_arrays([[], [], []], names=KEYS))
+
+    def _add(self, part: pd.DataFrame):
+        self.cells = pd.concat([self.cells, part]).groupby(level=KEYS, sort=False).sum() if len(self.cells) else part
+
+    def update(self, casa, ts, hora, consumo, costo):
+        """Filas de un chunk: casa_id (o None), timestamp ns int64, hora 0-23, consumo y costo."""
+        n = len(consumo)
+        if not n:
+            return
+        if casa is None:
+            codes, uniq = np.zeros(n, dtype=np.int64), np.array([SIN_MUNICIPIO], dtype=object)
+        else:
+            codes, uniq = pd.factorize(np.asarray(casa, dtype=object))
+            uniq = np.append(np.asarray(uniq, dtype=object).astype(str), SIN_MUNICIPIO).astype(object)
+            codes = np.where(codes < 0, len(uniq) - 1, codes).astype(np.int64)
+        dia = np.asarray(ts, dtype=np.int64) // NS_DAY
+        d0 = int(dia.min())
+        span = int(dia.max()) - d0 + 1
+        # celda como entero: ((casa * span) + día) * 24 + hora
+        u, inv = np.unique((codes * span + (dia - d0)) * 24 + np.asarray(hora, dtype=np.int64), return_inverse=True)
+        part = pd.DataFrame({
+            "consumo": np.bincount(inv, weights=consumo),
+            "costo": np.bincount(inv, weights=costo),
+            "n": np.bincount(inv).astype(float),
+        }, index=pd.MultiIndex.from_arrays([uniq[u // 24 // span], u // 24 % span + d0, u % 24], names=KEYS))
+        self._add(part)
+
+    def merge(self, other: "Cube") -> "Cube":
+        if len(other.cells):
+            self._add(other.cells)
+        return self
+
+    def write(self, out_dir: Path) -> dict:
+        """Escribe el cubo denso; meta.json va último (la API recarga cuando cambia)."""
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        cells = self.cells.reset_index()
+        municipios = sorted(cells["casa"].unique().tolist())
+        d0 = int(cells["dia"].min()) if len(cells) else 0
+        n_dias = int(cells["dia"].max()) - d0 + 1 if len(cells) else 0
+        m = pd.Index(municipios).get_indexer(cells["casa"])
+        d = cells["dia"].to_numpy(dtype=np.int64) - d0
+        h = cells["hora"].to_numpy(dtype=np.int64)
+        for name, dtype in ARRAYS.items():
+            arr = np.zeros((len(municipios), n_dias, 24), dtype=dtype)
+            arr[m, d, h] = cells[name].to_numpy()
+            tmp = out_dir / f"{name}.tmp.npy"
+            np.save(tmp, arr)
+            os.replace(tmp, out_dir / f"{name}.npy")
+        meta = {
+            "municipios": municipios,
+            "fecha_inicio": str(np.datetime64(d0, "D")),
+            "n_dias": n_dias,
+            "variables": list(ARRAYS),
+        }
+        tmp = out_dir / "meta.tmp.json"
+        tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, out_dir / "meta.json")
+        return meta
+
+    def to_json(self) -> dict:
+        c = self.cells.reset_index()
+        return {col: c[col].tolist() for col in c.columns}
+
+    @classmethod
+    def from_json(cls, d: dict) -> "Cube":
+        cube = cls()
+        c = pd.DataFrame(d)
+        if len(c):
+            cube.cells = c.astype({"casa": object, "dia": np.int64, "hora": np.int64}).set_index(KEYS)[
+                ["consumo", "costo", "n"]].astype(float)
+        return cube
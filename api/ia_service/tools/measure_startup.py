@@ -0,0 +1,61 @@
+# ia_service/tools/measure_startup.py
+# Mide el arranque en frío de app.main en procesos nuevos, por modo de arranque / motor:
+#   import, primera respuesta de caché (/dash/cards), modelo listo y primer /predict.
+#   python tools/measure_startup.py [repeticiones]      (desde ia_service/, con MODEL_PATH etc. en el entorno)
+import os, sys, json, subprocess, statistics
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+REPEAT = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+SCENARIOS = [
+    ("eager / sklearn", {"STARTUP_MODE": "eager", "MODEL_ENGINE": "sklearn"}),
+    ("background / sklearn", {"STARTUP_MODE": "background", "MODEL_ENGINE": "sklearn"}),
+    ("eager / compiled", {"STARTUP_MODE": "eager", "MODEL_ENGINE": "compiled"}),
+    ("background / compiled", {"STARTUP_MODE": "background", "MODEL_ENGINE": "compiled"}),
+]
+
+# Se ejecuta en un proceso limpio; imprime una línea JSON con los tiempos (s desde el inicio)
+PROBE = r"""
+import time, json, sys, warnings
+t0 = time.perf_counter()
+warnings.simplefilter("ignore")
+from app import main
+t_import = time.perf_counter() - t0
+heavy = sorted(m for m in ("pandas", "sklearn", "joblib") if m in sys.modules)
+from fastapi.testclient import TestClient
+c = TestClient(main.app)
+r = c.get("/dash/cards")
+t_cache = time.perf_counter() - t0
+main.model_ready.wait(120)
+t_ready = time.perf_counter() - t0
+r2 = c.post("/predict", json={"consumo_kwh": 1, "consumo_pico": 1, "promedio_hora": 1, "costo_estimado": 1})
+t_pred = time.perf_counter() - t0
+print(json.dumps({"import": t_import, "cache": t_cache, "ready": t_ready, "predict": t_pred,
+                  "cache_status": r.status_code, "predict_status": r2.status_code, "heavy_at_import": heavy}))
+"""
+
+
+def _run(env_extra: dict) -> dict:
+    env = {**os.environ, **env_extra, "PYTHONPATH": str(ROOT)}
+    out = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    print(f"{'escenario':<24} {'import':>8} {'1a caché':>9} {'listo':>8} {'1er pred':>9}  estado   pesados al importar")
+    for name, env in SCENARIOS:
+        try:
+            runs = [_run(env) for _ in range(REPEAT)]
+        except subprocess.CalledProcessError as e:
+            print(f"{name:<24} falló: {e.stderr.strip().splitlines()[-1] if e.stderr else e}")
+            continue
+        med = {k: statistics.median(r[k] for r in runs) for k in ("import", "cache", "ready", "predict")}
+        last = runs[-1]
+        print(f"{name:<24} {med['import']:8.3f} {med['cache']:9.3f} {med['ready']:8.3f} {med['predict']:9.3f}"
+              f"  {last['cache_status']}/{last['predict_status']}  {','.join(last['heavy_at_import']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
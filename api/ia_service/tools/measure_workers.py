@@ -0,0 +1,93 @@
+# ia_service/tools/measure_workers.py
+# Memoria por worker con 1, 4 y 8 procesos de app.main vivos a la vez (como uvicorn --workers N o
+# FUNCTIONS_WORKER_PROCESS_COUNT=N): cada copia del .pkl por proceso contra el almacén compartido
+# por mmap (MODEL_STORE). Lee /proc/<pid>/smaps_rollup de cada worker ya caliente:
+#   RSS      lo que reporta el SO por proceso (cuenta páginas compartidas en cada uno)
+#   PSS      RSS con las páginas compartidas repartidas entre quienes las usan (suma = memoria real)
+#   privada  páginas solo de ese proceso (lo que cuesta agregar un worker más)
+#   python tools/measure_workers.py [1,4,8]       (desde ia_service/; solo Linux)
+# Variables: MODEL_PATH + TRAIN_COLUMNS_PATH (escenario sklearn), MODEL_STORE (escenario almacén)
+import os, sys, json, subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+WORKERS = [int(n) for n in (sys.argv[1] if len(sys.argv) > 1 else "1,4,8").split(",")]
+WARM_ROWS = int(os.getenv("WARM_ROWS", "2000"))
+
+SCENARIOS = [
+    ("sklearn (.pkl por worker)", {"MODEL_ENGINE": "sklearn", "MODEL_STORE": ""}),
+    ("almacén (mmap compartido)", {"MODEL_STORE": os.getenv("MODEL_STORE", "model_assets/store")}),
+]
+
+# Worker: carga la app, calienta con un lote, avisa READY y espera a que el padre cierre stdin
+PROBE = r"""
+import sys, warnings
+warnings.simplefilter("ignore")
+from app import main
+from fastapi.testclient import TestClient
+main.model_ready.wait(300)
+if not main.MODEL_OK:
+    sys.exit(f"modelo: {main.MODEL_MSG}")
+n = int(sys.argv[1])
+estados, dias, munis = main.ESTADOS, main.DIAS_SEMANA, main.MUNICIPIOS
+regs = [{"consumo_kwh": (i % 97) / 20, "consumo_pico": (i % 89) / 15, "promedio_hora": (i % 83) / 25,
+         "costo_estimado": (i % 79) / 6, "estado": estados[i % 4], "hora_dia": f"{i % 24:02d}:00",
+         "dia_semana": dias[i % 7], "casa_id": munis[i % 13], "modo_ecologico_activado": i % 2} for i in range(n)]
+r = TestClient(main.app).post("/predict_batch", json={"registros": regs})
+assert r.status_code == 200, r.text[:200]
+print("READY", flush=True)
+sys.stdin.readline()
+"""
+
+FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def _smaps(pid: int) -> dict:
+    """kB por campo de /proc/<pid>/smaps_rollup."""
+    out = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            k, _, rest = line.partition(":")
+            if k in FIELDS:
+                out[k] = int(rest.split()[0])
+    return out
+
+
+def _measure(env_extra: dict, n: int) -> list:
+    env = {**os.environ, **env_extra, "PYTHONPATH": str(ROOT), "STARTUP_MODE": "eager",
+           "METRICS_ENABLED": "0", "INFER_WORKERS": "1"}
+    procs = [subprocess.Popen([sys.executable, "-c", PROBE, str(WARM_ROWS)], cwd=ROOT, env=env, text=True,
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+             for _ in range(n)]
+    try:
+        for p in procs:
+            if p.stdout.readline().strip() != "READY":
+                raise RuntimeError(p.stderr.read().strip().splitlines()[-1])
+        return [_smaps(p.pid) for p in procs]
+    finally:
+        for p in procs:
+            try:
+                p.stdin.close()
+            except OSError:
+                pass
+            p.wait()
+
+
+def main():
+    print(f"{'escenario':<27} {'workers':>7} {'RSS/w':>8} {'PSS/w':>8} {'privada/w':>10} {'compartida/w':>13} {'PSS total':>10}  (MB)")
+    for name, env in SCENARIOS:
+        for n in WORKERS:
+            try:
+                rows = _measure(env, n)
+            except Exception as e:
+                print(f"{name:<27} {n:>7} falló: {e}")
+                continue
+            avg = {k: sum(r[k] for r in rows) / n / 1024 for k in FIELDS}
+            private = avg["Private_Clean"] + avg["Private_Dirty"]
+            shared = avg["Shared_Clean"] + avg["Shared_Dirty"]
+            print(f"{name:<27} {n:>7} {avg['Rss']:8.1f} {avg['Pss']:8.1f} {private:10.1f} {shared:13.1f} "
+                  f"{avg['Pss'] * n:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
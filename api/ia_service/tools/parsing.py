@@ -0,0 +1,148 @@
+# ia_service/tools/parsing.py
+# Parseo vectorizado de hora / día de la semana / fecha para los builders.
+# Las columnas de texto tienen pocos valores distintos (24 horas, 7 días, cientos de fechas por
+# chunk): se factorizan, se parsean SOLO los únicos y el resultado se expande con los códigos.
+import re
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+
+EN_ES = {
+    "monday":"lunes","tuesday":"martes","wednesday":"miércoles","thursday":"jueves",
+    "friday":"viernes","saturday":"sábado","sunday":"domingo"
+}
+DOW_MAP    = {0:"lunes",1:"martes",2:"miércoles",3:"jueves",4:"viernes",5:"sábado",6:"domingo"}
+DIAS_ORDEN = ["lunes","martes","miércoles","jueves","viernes","sábado","domingo"]
+
+HOUR_SOURCES = ["timestamp", "fecha+hora_dia", "fecha+hora"]   # orden de desempate
+
+_time_re = re.compile(r"^\s*(\d{1,2})(?::(\d{1,2}))?")
+NAT = np.iinfo(np.int64).min       # NaT como int64
+NS_MIN  = 60 * 10**9
+NS_HOUR = 60 * NS_MIN
+NS_DAY  = 24 * NS_HOUR
+
+# "HH:MM" para cada minuto del día + NaN al final (índice de los inválidos)
+_HHMM = np.array([f"{h:02d}:{m:02d}" for h in range(24) for m in range(60)] + [np.nan], dtype=object)
+
+
+def _expand(per_unique: np.ndarray, codes: np.ndarray, missing) -> np.ndarray:
+    """Valor por fila a partir del valor por único; código -1 (nulo) -> `missing`."""
+    return np.append(per_unique, np.asarray([missing], dtype=per_unique.dtype))[codes]
+
+
+def parse_hhmm(s: pd.Series):
+    """
+    (hh, mm) int16 por fila; -1 donde no hay hora válida. Mismas reglas que la versión por fila:
+    numéricos 0..23 -> HH:00; texto 'H', 'HH', 'H:MM', 'HH:MM' con ruido al final.
+    """
+    if pd.api.types.is_numeric_dtype(s):
+        v = s.astype("Int64").to_numpy(dtype="float64", na_value=np.nan)
+        ok = (v >= 0) & (v <= 23)
+        return np.where(ok, v, -1).astype(np.int16), np.where(ok, 0, -1).astype(np.int16)
+
+    codes, uniq = pd.factorize(s)
+    uh = np.full(len(uniq), -1, dtype=np.int16)
+    um = np.full(len(uniq), -1, dtype=np.int16)
+    for j, u in enumerate(uniq):
+        m = _time_re.match(str(u))
+        if not m:
+            continue
+        hh = int(m.group(1))
+        mm = int(m.group(2)) if m.group(2) is not None else 0
+        if 0 <= hh <= 23 and 0 <= mm <= 59:
+            uh[j], um[j] = hh, mm
+    return _expand(uh, codes, -1), _expand(um, codes, -1)
+
+
+def coerce_time_str(s: pd.Series) -> pd.Series:
+    """'HH:MM' (o NaN) por fila, vía parse_hhmm."""
+    if s is None:
+        return pd.Series(dtype="object")
+    hh, mm = parse_hhmm(s)
+    idx = np.where(hh >= 0, hh.astype(np.int32) * 60 + mm, 24 * 60)
+    return pd.Series(_HHMM[idx], index=s.index)
+
+
+def parse_fecha(s: pd.Series) -> np.ndarray:
+    """Medianoche de 'fecha' en ns (NAT si no parsea); se parsean solo las fechas distintas."""
+    codes, uniq = pd.factorize(s)
+    if not len(uniq):
+        return np.full(len(s), NAT, dtype=np.int64)
+    # mismo formato que "fecha HH:MM" para que la inferencia de formato sea la del armado por fila
+    txt = pd.Series(uniq).astype(str).str.strip() + " 00:00"
+    base = pd.to_datetime(txt, errors="coerce").to_numpy(dtype="datetime64[ns]").view(np.int64)
+    return _expand(base, codes, NAT)
+
+
+def _ts_ns(ts: pd.Series) -> np.ndarray:
+    return ts.to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+
+def hour_candidates(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Horas por fila (-1 inválida) de cada fuente disponible en df."""
+    out = {}
+    if "timestamp" in df.columns and pd.api.types.is_datetime64_any_dtype(df["timestamp"]):
+        ns = _ts_ns(df["timestamp"])
+        out["timestamp"] = np.where(ns != NAT, (ns % NS_DAY) // NS_HOUR, -1)
+    if "fecha" in df.columns:
+        base = None
+        for col in ("hora_dia", "hora"):
+            if col in df.columns:
+                base = parse_fecha(df["fecha"]) if base is None else base
+                hh, _ = parse_hhmm(df[col])
+                out[f"fecha+{col}"] = np.where((base != NAT) & (hh >= 0), hh, -1)
+    return out
+
+
+def pick_hour_source(df: pd.DataFrame) -> Optional[str]:
+    """Fuente con menor proporción de hora == 00 entre sus horas válidas (None si ninguna tiene)."""
+    best, best_p0 = None, None
+    for name, hrs in hour_candidates(df).items():
+        ok = hrs >= 0
+        if ok.any():
+            p0 = float((hrs[ok] == 0).mean())
+            if best is None or p0 < best_p0:
+                best, best_p0 = name, p0
+    return best
+
+
+def chunk_datetimes(df: pd.DataFrame, source: str) -> np.ndarray:
+    """dt en ns por fila según la fuente (fecha + HH:00 para las fuentes de texto); NAT si inválido."""
+    if source == "timestamp":
+        if "timestamp" not in df.columns or not pd.api.types.is_datetime64_any_dtype(df["timestamp"]):
+            return np.full(len(df), NAT, dtype=np.int64)
+        return _ts_ns(df["timestamp"]).copy()
+    col = source.split("+", 1)[1]
+    if "fecha" not in df.columns or col not in df.columns:
+        return np.full(len(df), NAT, dtype=np.int64)
+    base = parse_fecha(df["fecha"])
+    hh, _ = parse_hhmm(df[col])
+    return np.where((base != NAT) & (hh >= 0), base + hh.astype(np.int64) * NS_HOUR, NAT)
+
+
+def dow_codes(series: Optional[pd.Series], dt_ns: np.ndarray) -> np.ndarray:
+    """
+    Índice en DIAS_ORDEN por fila (-1 si no se puede). Normaliza los textos distintos de
+    'dia_semana' (NFKD, ascii, minúsculas, inglés -> español); lo que no queda válido sale de dt.
+    """
+    fallback = np.where(dt_ns != NAT, (dt_ns // NS_DAY + 3) % 7, -1).astype(np.int8)  # 1970-01-01 = jueves
+    if series is None or not series.notna().any():
+        return fallback
+    codes, uniq = pd.factorize(series)
+    norm = (pd.Series(uniq).astype(str)
+            .str.normalize('NFKD')
+            .str.encode('ascii', errors='ignore')
+            .str.decode('utf-8')
+            .str.strip()
+            .str.lower())
+    pos = {d: k for k, d in enumerate(DIAS_ORDEN)}
+    per_unique = np.array([pos.get(EN_ES.get(x, x), -1) for x in norm], dtype=np.int8)
+    out = _expand(per_unique, codes, -1)
+    return np.where(out >= 0, out, fallback).astype(np.int8)
+
+
+def normalize_dow(series: Optional[pd.Series], dt_col: pd.Series) -> pd.Series:
+    """'dia_semana' normalizado como categórica sobre DIAS_ORDEN; si no está/vale, se infiere de dt_col."""
+    codes = dow_codes(series, _ts_ns(dt_col))
+    return pd.Series(pd.Categorical.from_codes(codes, categories=DIAS_ORDEN), index=dt_col.index)
@@ -0,0 +1,91 @@
+# ia_service/tools/precompress.py
+# Variantes comprimidas de las salidas que la API sirve tal cual (sin parsear ni re-serializar):
+#   <archivo>.gz  siempre (gzip 9, mtime=0: mismo contenido -> mismos bytes)
+#   <archivo>.br  si está instalado el paquete brotli
+# También arma mineria_cache.json: la respuesta completa de /mineria_cache ya serializada, más
+# mineria_cache.stamp con el (mtime, tamaño) de las partes de las que salió; la API solo sirve el
+# combinado si las partes no cambiaron desde entonces.
+# Orden de escritura: archivo plano, luego variantes. La API compara cada variante contra el plano
+# al recargar, así que una variante vieja (build a medias) nunca se sirve.
+import gzip, hashlib, json, os
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:   # opcional: sin brotli solo se genera .gz
+    brotli = None
+
+# Mismas claves que MINERIA_FILES en app/main.py
+MINERIA_FILES = ["resumen", "consumo_hora", "consumo_dia", "top_dispositivos", "consumo_vs_costo"]
+COMBINED = "mineria_cache.json"
+COMBINED_STAMP = "mineria_cache.stamp"
+
+
+def _atomic_write(path: Path, data: bytes):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def write_variants(path: Path) -> dict:
+    """
+    Escribe <path>.gz (y .br) a partir de <path>; devuelve bytes por codificación. Una variante
+    que no achica el archivo (JSON de pocos bytes) no se escribe y se borra la anterior.
+    """
+    path = Path(path)
+    raw = path.read_bytes()
+    sizes = {"identity": len(raw)}
+    variants = {"gzip": (".gz", lambda b: gzip.compress(b, compresslevel=9, mtime=0))}
+    if brotli is not None:
+        variants["br"] = (".br", lambda b: brotli.compress(b, quality=11))
+    for enc, (suffix, compress) in variants.items():
+        target = path.with_name(path.name + suffix)
+        body = compress(raw)
+        if len(body) < len(raw):
+            _atomic_write(target, body)
+            sizes[enc] = len(body)
+        else:
+            target.unlink(missing_ok=True)
+    return sizes
+
+
+def parts_stamp(out_dir: Path, names=MINERIA_FILES) -> str:
+    """Stamp de las partes: mismo cálculo que combine_etags (app/cache.py) sobre "mtime_ns:tamaño"."""
+    h = hashlib.sha1()
+    for k in names:
+        st = (Path(out_dir) / f"{k}.json").stat()
+        h.update(f"{st.st_mtime_ns}:{st.st_size}".encode("ascii"))
+    return f'"{h.hexdigest()}"'
+
+
+def write_combined(out_dir: Path, names=MINERIA_FILES) -> Path:
+    """
+    mineria_cache.json con {nombre: contenido}, con el mismo formato compacto que JSONResponse.
+    El stamp se toma antes de leer las partes: si una cambia a medias, no coincide y la API no
+    sirve el combinado.
+    """
+    out_dir = Path(out_dir)
+    stamp = parts_stamp(out_dir, names)
+    payload = {k: json.loads((out_dir / f"{k}.json").read_text(encoding="utf-8")) for k in names}
+    body = json.dumps(payload, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"))
+    path = out_dir / COMBINED
+    _atomic_write(path, body.encode("utf-8"))
+    _atomic_write(out_dir / COMBINED_STAMP, stamp.encode("ascii"))
+    return path
+
+
+def remove_combined(out_dir: Path):
+    """Borra mineria_cache.json, sus variantes y su stamp (build sin precompresión)."""
+    out_dir = Path(out_dir)
+    for name in (COMBINED, COMBINED + ".gz", COMBINED + ".br", COMBINED_STAMP):
+        (out_dir / name).unlink(missing_ok=True)
+
+
+def precompress(out_dir: Path, files) -> dict:
+    """Variantes de cada archivo de `files` (relativos a out_dir); imprime el resumen."""
+    out_dir = Path(out_dir)
+    sizes = {f: write_variants(out_dir / f) for f in files}
+    for f, s in sizes.items():
+        extra = " | ".join(f"{k} {v:,} B" for k, v in s.items() if k != "identity") or "sin variantes"
+        print(f"🗜️  {f}: {s['identity']:,} B -> {extra}")
+    return sizes
@@ -0,0 +1,61 @@
+# ia_service/tools/publish_model.py
+# Publica un modelo en el almacén versionado que leen los workers con MODEL_STORE (app/model_store.py).
+# Acepta el .pkl de sklearn (se compila con export_forest + paridad) o un directorio ya compilado
+# con tools/compile_forest.py. La versión queda activa al reemplazar CURRENT; los workers la toman
+# en su siguiente revisión (MODEL_STORE_CHECK_S) sin reiniciarse.
+#   python tools/publish_model.py <modelo.pkl | dir_compilado> [dir_store] [version]
+# Variables: MODEL_STORE (dir_store), TRAIN_COLUMNS_PATH (para .pkl), MODEL_STORE_KEEP (versiones a conservar, 3)
+import os, sys, json, tempfile, time
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.forest import META_FILE, CompiledForest, export_forest  # noqa: E402
+from app.model_store import prune, publish, read_current  # noqa: E402
+from compile_forest import _sample_X  # noqa: E402
+
+SRC = Path(sys.argv[1] if len(sys.argv) > 1 else os.getenv("MODEL_PATH", "model_assets/modelo_rf_multioutput_ligero.pkl"))
+STORE = Path(sys.argv[2] if len(sys.argv) > 2 else os.getenv("MODEL_STORE", "model_assets/store"))
+VERSION = sys.argv[3] if len(sys.argv) > 3 else None
+TRAIN_COLUMNS_PATH = Path(os.getenv("TRAIN_COLUMNS_PATH", "model_assets/train_columns.json"))
+KEEP = int(os.getenv("MODEL_STORE_KEEP", "3"))
+PARITY_ROWS = 5000
+
+
+def _compile(pkl: Path, out_dir: Path):
+    import joblib
+    model = joblib.load(pkl)
+    cols = json.loads(TRAIN_COLUMNS_PATH.read_text(encoding="utf-8")) if TRAIN_COLUMNS_PATH.exists() \
+        else getattr(model, "train_columns", None)
+    if cols is None:
+        raise SystemExit(f"❌ Sin train_columns ({TRAIN_COLUMNS_PATH}); el almacén las necesita en meta.json")
+    if len(cols) != getattr(model, "n_features_in_", len(cols)):
+        raise SystemExit(f"❌ {TRAIN_COLUMNS_PATH} trae {len(cols)} columnas y el modelo espera {model.n_features_in_}")
+    meta = export_forest(model, out_dir, cols)
+    X = _sample_X(PARITY_ROWS, cols, np.random.default_rng(0))
+    if not np.array_equal(np.asarray(model.predict(X)).reshape(PARITY_ROWS, -1), CompiledForest.load(out_dir).predict(X)):
+        raise SystemExit("❌ El bosque compilado no reproduce model.predict; no se publica")
+    print(f"✅ Compilado {pkl.name}: árboles={meta['n_trees']} nodos={meta['n_nodes']:,} (paridad en {PARITY_ROWS:,} filas)")
+
+
+def main():
+    t0 = time.time()
+    prev = read_current(STORE)
+    with tempfile.TemporaryDirectory() as tmp:
+        src = SRC
+        if SRC.is_file():
+            src = Path(tmp) / "compilado"
+            _compile(SRC, src)
+        elif not (SRC / META_FILE).exists():
+            raise SystemExit(f"❌ {SRC} no es un .pkl ni un directorio compilado (falta {META_FILE})")
+        elif json.loads((SRC / META_FILE).read_text(encoding="utf-8")).get("train_columns") is None:
+            raise SystemExit(f"❌ {SRC / META_FILE} no trae train_columns; recompila con tools/compile_forest.py")
+        version = publish(STORE, src, VERSION)
+    print(f"📦 {STORE}: {prev or '(vacío)'} -> {version} | {time.time() - t0:0.1f}s")
+    removed = prune(STORE, KEEP)
+    if removed:
+        print(f"🧹 Versiones borradas: {', '.join(removed)}")
+
+
+if __name__ == "__main__":
+    main()
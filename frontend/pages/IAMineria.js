@@ -40,7 +40,7 @@ let chAnom = { current: null };
 async function loadMineria() {
   try {
     log("fetch /mineria_cache …");
-    const res = await fetch(`${API_BASE}/mineria_cache`, { cache: "no-store" });
+    const res = await fetch(`${API_BASE}/mineria_cache`, { cache: "no-cache" });
     if (!res.ok) throw new Error(`GET /mineria_cache -> ${res.status}`);
     const data = await res.json();
     log("minería cache OK", data?.resumen);